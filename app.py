@@ -1,33 +1,65 @@
-import os
+import io
+import csv
 import json
-from datetime import datetime, date
-from flask import Flask, render_template, request, jsonify
+import threading
+from datetime import datetime, date, timedelta
+import click
+from flask import Blueprint, Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
-from sqlalchemy import create_engine, func, desc
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
-import google.generativeai as genai
 
 import config
 from models import Base, Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident
-from tag_models import TagCategory, Tag
-from database import init_db, seed_data
-
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object(config)
-CORS(app)
-
-# Initialize database
-engine = init_db()
-Session = sessionmaker(bind=engine)
-
-# Seed database with sample data
-with Session() as session:
-    seed_data(session)
-
-# Configure Gemini AI
-if config.GEMINI_API_KEY:
-    genai.configure(api_key=config.GEMINI_API_KEY)
+from tag_models import Tag
+from database import create_db_engine, init_db, init_read_engine, seed_data, seed_tags
+from queries import ENTITY_MODELS, get_by_id, filtered_query, fetch_page, parse_limit, parse_fields, project
+from counters import aggregate_counts, read_counters, rebuild_counters, install_counters
+from versions import install_versions, bump as bump_versions
+from chat_context import get_snapshot, render_shared, render_focus
+from chat_sessions import SessionStore, PrefixCache, compact, estimate_tokens, response_usage
+from chat_router import ChatRouter
+from chat_cache import AnswerCache
+from bulk import BULK_ENTITIES, NDJSON_MIMETYPES, bulk_upsert, iter_ndjson
+from chat_worker import ChatPool, ChatBusy, TimeoutError as ChatTimeout
+from response_cache import ResponseCache, cached_response
+import tag_registry
+from tag_usage import install_usage, rebuild_usage, usage_count, usage_by_value
+from integration_summary import DIMENSIONS as SUMMARY_DIMENSIONS, install_summary, rebuild_summary, read_summary, funnel
+from search import SEARCH_ENTITIES, search
+from sync import sync, prune_change_log, current_token
+from metrics import Metrics, install_metrics, metrics_response
+from serializers import JSONProvider, row_query, serialize_rows, dumps as dumps_json
+
+# All routes and CLI commands; create_app() registers them on an app
+bp = Blueprint('crm', __name__, cli_group=None)
+
+# Engines and session factories, set by create_app()
+engine = None
+Session = None
+read_engine = None
+ReadSession = None
+
+# Model calls run on a bounded pool so slow chats cannot tie up request handling
+chat_pool = ChatPool(
+    max_workers=config.CHAT_MAX_WORKERS,
+    max_queue=config.CHAT_MAX_QUEUE,
+    per_user_limit=config.CHAT_PER_USER_LIMIT
+)
+
+# Serialized GET responses, reused until a table they read is written
+response_cache = ResponseCache(
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+    ttl=config.RESPONSE_CACHE_TTL
+)
+
+# Per-route latency, SQL and serialization metrics, served at /metrics
+metrics = Metrics(slow_query_ms=config.SLOW_QUERY_MS, slow_query_log_size=config.SLOW_QUERY_LOG_SIZE)
+metrics.add_collector('crm_response_cache', response_cache.stats)
+metrics.add_collector('crm_chat_pool', lambda: chat_pool.stats())
 
 
 # ==================== HELPER FUNCTIONS ====================
@@ -37,6 +69,68 @@ def get_db_session():
     return Session()
 
 
+def get_read_session():
+    """Create a session on the read-only engine (for GET routes)."""
+    return ReadSession()
+
+
+def get_tag_registry(session):
+    """Current tag registry, rebuilt after tag writes."""
+    return tag_registry.get_registry(session, ttl=config.TAG_REGISTRY_TTL)
+
+
+def validate_tags(session, entity_type, data, current=None):
+    """400 response if a tag-backed field holds an unknown or inactive tag value, else None.
+    
+    Values the cached registry rejects are rechecked in the database, so tags
+    another process has just created are accepted.
+    """
+    errors = get_tag_registry(session).validate(entity_type, data, current, session=session)
+    if errors:
+        return jsonify({'error': '; '.join(errors), 'errors': errors}), 400
+    return None
+
+
+def cached(*tables):
+    """Cache a GET route's responses until one of the given tables changes."""
+    return cached_response(response_cache, *tables, enabled=config.RESPONSE_CACHE)
+
+
+def list_response(session, model):
+    """Serialize a list endpoint, honouring filter, pagination and fields= params.
+    
+    Without limit/after the full filtered list is returned as a JSON array;
+    with either, the response is {"items": [...], "next_cursor": ...}.
+    """
+    args = request.args
+    paginated = 'limit' in args or 'after' in args
+    fields = parse_fields(args.get('fields'))
+    try:
+        query, keys = row_query(session, model, fields)
+        query = filtered_query(session, model, args, query)
+        if paginated:
+            limit = parse_limit(args.get('limit'), config.DEFAULT_PAGE_SIZE, config.MAX_PAGE_SIZE)
+            rows, next_cursor = fetch_page(query, model, limit, args.get('after'))
+        else:
+            rows, next_cursor = query.all(), None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    items = serialize_rows(model, rows, keys)
+    if fields is not None:
+        items = [project(item, fields) for item in items]
+    if paginated:
+        return jsonify({'items': items, 'next_cursor': next_cursor})
+    return jsonify(items)
+
+
+def stage_order(session):
+    """Integration stage values in their tag order, for sorting pipeline summaries."""
+    entry = get_tag_registry(session).category('integration_stage', include_inactive=True)
+    tags = sorted(entry['tags'], key=lambda tag: (tag['sort_order'], tag['tag_id'])) if entry else []
+    return [tag['value'] for tag in tags]
+
+
 def parse_date(date_str):
     """Parse a date string into a date object."""
     if not date_str:
@@ -49,7 +143,7 @@ def parse_date(date_str):
 
 # ==================== MAIN PAGE ====================
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Render the main CRM page."""
     return render_template('index.html')
@@ -57,28 +151,17 @@ def index():
 
 # ==================== DASHBOARD API ====================
 
-@app.route('/api/dashboard')
+@bp.route('/api/dashboard')
+@cached('departments', 'applications', 'integration_status', 'incidents', 'engagement_activities', 'tag_categories', 'tags')
 def get_dashboard():
     """Get dashboard statistics."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        # Count departments by status
-        total_departments = session.query(Department).count()
-        active_departments = session.query(Department).filter_by(status='active').count()
-        critical_departments = session.query(Department).filter_by(tier='critical').count()
-        
-        # Count applications by status
-        total_applications = session.query(Application).count()
-        live_applications = session.query(Application).filter_by(status='live').count()
-        integrating_applications = session.query(Application).filter_by(status='integrating').count()
-        
-        # Count integrations by risk level
-        high_risk = session.query(IntegrationStatus).filter_by(risk_level='high').count()
-        blocked = session.query(IntegrationStatus).filter_by(status='blocked').count()
-        delayed = session.query(IntegrationStatus).filter_by(status='delayed').count()
-        
-        # Count open incidents
-        open_incidents = session.query(Incident).filter(Incident.status.in_(['open', 'investigating'])).count()
+        # Served from the counter table when enabled, otherwise one aggregate per table
+        if config.DASHBOARD_COUNTERS:
+            counts = read_counters(session)
+        else:
+            counts = aggregate_counts(session)
         
         # Recent activities count (last 30 days)
         thirty_days_ago = date.today().replace(day=1) if date.today().day <= 30 else date.today()
@@ -88,26 +171,28 @@ def get_dashboard():
         
         return jsonify({
             'departments': {
-                'total': total_departments,
-                'active': active_departments,
-                'critical': critical_departments
+                'total': counts['departments.total'],
+                'active': counts['departments.active'],
+                'critical': counts['departments.critical']
             },
             'applications': {
-                'total': total_applications,
-                'live': live_applications,
-                'integrating': integrating_applications
+                'total': counts['applications.total'],
+                'live': counts['applications.live'],
+                'integrating': counts['applications.integrating']
             },
             'risk': {
-                'high_risk': high_risk,
-                'blocked': blocked,
-                'delayed': delayed
+                'high_risk': counts['risk.high_risk'],
+                'blocked': counts['risk.blocked'],
+                'delayed': counts['risk.delayed']
             },
             'incidents': {
-                'open': open_incidents
+                'open': counts['incidents.open']
             },
             'engagement': {
                 'recent_activities': recent_activities
-            }
+            },
+            # Read from the maintained integration summary table
+            'pipeline': funnel(session, stage_order(session))
         })
     finally:
         session.close()
@@ -115,23 +200,23 @@ def get_dashboard():
 
 # ==================== DEPARTMENTS API ====================
 
-@app.route('/api/departments', methods=['GET'])
+@bp.route('/api/departments', methods=['GET'])
+@cached('departments', 'applications')
 def get_departments():
     """Get all departments."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        departments = session.query(Department).order_by(Department.name).all()
-        return jsonify([d.to_dict() for d in departments])
+        return list_response(session, Department)
     finally:
         session.close()
 
 
-@app.route('/api/departments/<int:department_id>', methods=['GET'])
+@bp.route('/api/departments/<int:department_id>', methods=['GET'])
 def get_department(department_id):
     """Get a specific department."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        department = session.query(Department).get(department_id)
+        department = get_by_id(session, Department, department_id)
         if not department:
             return jsonify({'error': 'Department not found'}), 404
         return jsonify(department.to_dict())
@@ -139,12 +224,15 @@ def get_department(department_id):
         session.close()
 
 
-@app.route('/api/departments', methods=['POST'])
+@bp.route('/api/departments', methods=['POST'])
 def create_department():
     """Create a new department."""
     session = get_db_session()
     try:
         data = request.json
+        invalid = validate_tags(session, 'department', data)
+        if invalid:
+            return invalid
         department = Department(
             name=data.get('name'),
             acronym=data.get('acronym'),
@@ -159,7 +247,7 @@ def create_department():
         session.close()
 
 
-@app.route('/api/departments/<int:department_id>', methods=['PUT'])
+@bp.route('/api/departments/<int:department_id>', methods=['PUT'])
 def update_department(department_id):
     """Update a department."""
     session = get_db_session()
@@ -169,6 +257,9 @@ def update_department(department_id):
             return jsonify({'error': 'Department not found'}), 404
         
         data = request.json
+        invalid = validate_tags(session, 'department', data, department)
+        if invalid:
+            return invalid
         if 'name' in data:
             department.name = data['name']
         if 'acronym' in data:
@@ -186,7 +277,7 @@ def update_department(department_id):
         session.close()
 
 
-@app.route('/api/departments/<int:department_id>', methods=['DELETE'])
+@bp.route('/api/departments/<int:department_id>', methods=['DELETE'])
 def delete_department(department_id):
     """Delete a department."""
     session = get_db_session()
@@ -203,23 +294,23 @@ def delete_department(department_id):
 
 # ==================== APPLICATIONS API ====================
 
-@app.route('/api/applications', methods=['GET'])
+@bp.route('/api/applications', methods=['GET'])
+@cached('applications', 'departments')
 def get_applications():
     """Get all applications."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        applications = session.query(Application).order_by(Application.app_name).all()
-        return jsonify([a.to_dict() for a in applications])
+        return list_response(session, Application)
     finally:
         session.close()
 
 
-@app.route('/api/applications/<int:app_id>', methods=['GET'])
+@bp.route('/api/applications/<int:app_id>', methods=['GET'])
 def get_application(app_id):
     """Get a specific application."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        application = session.query(Application).get(app_id)
+        application = get_by_id(session, Application, app_id)
         if not application:
             return jsonify({'error': 'Application not found'}), 404
         return jsonify(application.to_dict())
@@ -227,11 +318,16 @@ def get_application(app_id):
         session.close()
 
 
-@app.route('/api/applications', methods=['POST'])
+@bp.route('/api/applications', methods=['POST'])
 def create_application():
     """Create a new application."""
     session = get_db_session()
     try:
+        data = request.json
+        invalid = validate_tags(session, 'application', data)
+        if invalid:
+            return invalid
+        
         # Handle auth_type as list or string
         auth_type_input = data.get('auth_type', 'GC Key')
         if isinstance(auth_type_input, list):
@@ -264,7 +360,7 @@ def create_application():
         session.close()
 
 
-@app.route('/api/applications/<int:app_id>', methods=['PUT'])
+@bp.route('/api/applications/<int:app_id>', methods=['PUT'])
 def update_application(app_id):
     """Update an application."""
     session = get_db_session()
@@ -274,6 +370,9 @@ def update_application(app_id):
             return jsonify({'error': 'Application not found'}), 404
         
         data = request.json
+        invalid = validate_tags(session, 'application', data, application)
+        if invalid:
+            return invalid
         if 'department_id' in data:
             application.department_id = data['department_id']
         if 'app_name' in data:
@@ -297,7 +396,7 @@ def update_application(app_id):
         session.close()
 
 
-@app.route('/api/applications/<int:app_id>', methods=['DELETE'])
+@bp.route('/api/applications/<int:app_id>', methods=['DELETE'])
 def delete_application(app_id):
     """Delete an application."""
     session = get_db_session()
@@ -314,18 +413,46 @@ def delete_application(app_id):
 
 # ==================== INTEGRATION STATUS API ====================
 
-@app.route('/api/integrations', methods=['GET'])
+@bp.route('/api/integrations', methods=['GET'])
+@cached('integration_status', 'applications', 'departments')
 def get_integrations():
     """Get all integration statuses."""
-    session = get_db_session()
+    session = get_read_session()
+    try:
+        return list_response(session, IntegrationStatus)
+    finally:
+        session.close()
+
+
+@bp.route('/api/integrations/summary', methods=['GET'])
+@cached('integration_status', 'applications', 'departments', 'tag_categories', 'tags')
+def get_integration_summary():
+    """Integration counts by department tier, stage, status and risk level.
+    
+    Served from the maintained summary table. group_by=stage,status limits the
+    breakdown to those dimensions (default: all four); tier, stage, status and
+    risk_level filter it (comma-separated values match any of them).
+    """
+    args = request.args
+    group_by = parse_fields(args.get('group_by')) or list(SUMMARY_DIMENSIONS)
+    unknown = [name for name in group_by if name not in SUMMARY_DIMENSIONS]
+    if unknown:
+        return jsonify({'error': f"Unknown group_by dimension: {', '.join(unknown)}"}), 400
+    filters = {name: args[name].split(',') for name in SUMMARY_DIMENSIONS if args.get(name)}
+    
+    session = get_read_session()
     try:
-        integrations = session.query(IntegrationStatus).all()
-        return jsonify([i.to_dict() for i in integrations])
+        rows = read_summary(session, group_by, filters, stage_order(session))
+        return jsonify({
+            'group_by': group_by,
+            'total': sum(row['count'] for row in rows),
+            'rows': rows
+        })
     finally:
         session.close()
 
 
-@app.route('/api/integrations/<int:integration_id>', methods=['PUT'])
+@bp.route('/api/integrations/<int:integration_id>', methods=['PUT'])
 def update_integration(integration_id):
     """Update an integration status."""
     session = get_db_session()
@@ -335,6 +462,9 @@ def update_integration(integration_id):
             return jsonify({'error': 'Integration not found'}), 404
         
         data = request.json
+        invalid = validate_tags(session, 'integration', data, integration)
+        if invalid:
+            return invalid
         if 'stage' in data:
             integration.stage = data['stage']
         if 'status' in data:
@@ -352,23 +482,26 @@ def update_integration(integration_id):
 
 # ==================== CONTACTS API ====================
 
-@app.route('/api/contacts', methods=['GET'])
+@bp.route('/api/contacts', methods=['GET'])
+@cached('contacts', 'departments')
 def get_contacts():
     """Get all contacts."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        contacts = session.query(Contact).order_by(Contact.name).all()
-        return jsonify([c.to_dict() for c in contacts])
+        return list_response(session, Contact)
     finally:
         session.close()
 
 
-@app.route('/api/contacts', methods=['POST'])
+@bp.route('/api/contacts', methods=['POST'])
 def create_contact():
     """Create a new contact."""
     session = get_db_session()
     try:
         data = request.json
+        invalid = validate_tags(session, 'contact', data)
+        if invalid:
+            return invalid
         contact = Contact(
             department_id=data.get('department_id'),
             name=data.get('name'),
@@ -384,7 +517,7 @@ def create_contact():
         session.close()
 
 
-@app.route('/api/contacts/<int:contact_id>', methods=['PUT'])
+@bp.route('/api/contacts/<int:contact_id>', methods=['PUT'])
 def update_contact(contact_id):
     """Update a contact."""
     session = get_db_session()
@@ -394,6 +527,9 @@ def update_contact(contact_id):
             return jsonify({'error': 'Contact not found'}), 404
         
         data = request.json
+        invalid = validate_tags(session, 'contact', data, contact)
+        if invalid:
+            return invalid
         if 'name' in data:
             contact.name = data['name']
         if 'role' in data:
@@ -411,7 +547,7 @@ def update_contact(contact_id):
         session.close()
 
 
-@app.route('/api/contacts/<int:contact_id>', methods=['DELETE'])
+@bp.route('/api/contacts/<int:contact_id>', methods=['DELETE'])
 def delete_contact(contact_id):
     """Delete a contact."""
     session = get_db_session()
@@ -428,23 +564,26 @@ def delete_contact(contact_id):
 
 # ==================== ENGAGEMENT ACTIVITIES API ====================
 
-@app.route('/api/activities', methods=['GET'])
+@bp.route('/api/activities', methods=['GET'])
+@cached('engagement_activities', 'departments', 'applications')
 def get_activities():
     """Get all engagement activities."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        activities = session.query(EngagementActivity).order_by(desc(EngagementActivity.date)).all()
-        return jsonify([a.to_dict() for a in activities])
+        return list_response(session, EngagementActivity)
     finally:
         session.close()
 
 
-@app.route('/api/activities', methods=['POST'])
+@bp.route('/api/activities', methods=['POST'])
 def create_activity():
     """Create a new engagement activity."""
     session = get_db_session()
     try:
         data = request.json
+        invalid = validate_tags(session, 'activity', data)
+        if invalid:
+            return invalid
         activity = EngagementActivity(
             department_id=data.get('department_id'),
             app_id=data.get('app_id'),
@@ -461,7 +600,7 @@ def create_activity():
         session.close()
 
 
-@app.route('/api/activities/<int:activity_id>', methods=['DELETE'])
+@bp.route('/api/activities/<int:activity_id>', methods=['DELETE'])
 def delete_activity(activity_id):
     """Delete an engagement activity."""
     session = get_db_session()
@@ -478,18 +617,18 @@ def delete_activity(activity_id):
 
 # ==================== INCIDENTS API ====================
 
-@app.route('/api/incidents', methods=['GET'])
+@bp.route('/api/incidents', methods=['GET'])
+@cached('incidents', 'applications', 'departments')
 def get_incidents():
     """Get all incidents."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        incidents = session.query(Incident).order_by(desc(Incident.created_at)).all()
-        return jsonify([i.to_dict() for i in incidents])
+        return list_response(session, Incident)
     finally:
         session.close()
 
 
-@app.route('/api/incidents', methods=['POST'])
+@bp.route('/api/incidents', methods=['POST'])
 def create_incident():
     """Create a new incident."""
     session = get_db_session()
@@ -509,7 +648,7 @@ def create_incident():
         session.close()
 
 
-@app.route('/api/incidents/<int:incident_id>', methods=['PUT'])
+@bp.route('/api/incidents/<int:incident_id>', methods=['PUT'])
 def update_incident(incident_id):
     """Update an incident."""
     session = get_db_session()
@@ -536,82 +675,249 @@ def update_incident(incident_id):
         session.close()
 
 
+# ==================== BULK IMPORT API ====================
+
+@bp.route('/api/bulk/<entity>', methods=['POST'])
+def bulk_import(entity):
+    """Bulk create/upsert departments, applications or contacts.
+    
+    Accepts a JSON array or an NDJSON stream (one object per line). Rows with a
+    primary key are upserted; rows without one are inserted. Invalid rows are
+    reported individually and do not stop the rest of the import.
+    """
+    if entity not in BULK_ENTITIES:
+        return jsonify({'error': f'Unsupported entity: {entity}'}), 404
+    
+    if request.mimetype in NDJSON_MIMETYPES:
+        rows = iter_ndjson(request.stream)
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({'error': 'Expected a JSON array or an NDJSON body'}), 400
+    
+    session = get_db_session()
+    try:
+        results = bulk_upsert(session, entity, rows, config.BULK_CHUNK_SIZE, get_tag_registry(session),
+                              maintain_counters=config.DASHBOARD_COUNTERS)
+        
+        summary = {'created': 0, 'updated': 0, 'error': 0}
+        for result in results:
+            summary[result['status']] += 1
+        return jsonify({'summary': summary, 'results': results})
+    finally:
+        # Chunks commit as they go, each with its counter, usage and summary
+        # updates, so even a failed import leaves those consistent with its rows;
+        # Core statements bypass the write listeners that bump versions, though.
+        session.rollback()
+        bump_versions(*BULK_ENTITIES[entity]['tables'])
+        session.close()
+
+
+# ==================== EXPORT API ====================
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Flush the output buffer once it reaches this many characters
+EXPORT_FLUSH_SIZE = 64 * 1024
+
+
+def _export_ndjson(rows):
+    for row in rows:
+        yield dumps_json(row) + '\n'
+
+
+def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row.keys()))
+            writer.writeheader()
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+@bp.route('/api/export/<entity>', methods=['GET'])
+def export_entity(entity):
+    """Stream every row of an entity as NDJSON or CSV.
+    
+    Rows are fetched with yield_per and written as they arrive, so memory stays
+    flat regardless of table size. Accepts the same filters as the list endpoints.
+    """
+    model = ENTITY_MODELS.get(entity)
+    if model is None:
+        return jsonify({'error': f'Unsupported entity: {entity}'}), 404
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+    
+    session = get_read_session()
+    try:
+        query, keys = row_query(session, model)
+        statement = filtered_query(session, model, request.args, query).statement
+    except ValueError as e:
+        session.close()
+        return jsonify({'error': str(e)}), 400
+    
+    encode = _export_csv if export_format == 'csv' else _export_ndjson
+    # CSV cells need date strings; the JSON encoder formats dates itself
+    iso_dates = export_format == 'csv'
+    
+    def generate():
+        try:
+            pending = []
+            pending_size = 0
+            first = True
+            result = session.execute(statement.execution_options(yield_per=config.EXPORT_BATCH_SIZE))
+            rows = (item for batch in result.partitions() for item in serialize_rows(model, batch, keys, iso_dates))
+            for chunk in encode(rows):
+                pending.append(chunk)
+                pending_size += len(chunk)
+                # Send the first row straight away, then in buffer-sized writes
+                if first or pending_size >= EXPORT_FLUSH_SIZE:
+                    yield ''.join(pending)
+                    pending, pending_size, first = [], 0, False
+            if pending:
+                yield ''.join(pending)
+        finally:
+            session.close()
+    
+    return Response(generate(), mimetype=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename={entity}.{export_format}'
+    })
+
+
+# ==================== SYNC API ====================
+
+@bp.route('/api/sync', methods=['GET'])
+@cached('departments', 'applications', 'integration_status', 'contacts', 'engagement_activities', 'incidents')
+def sync_entities():
+    """Rows of every list entity inserted, updated or deleted since a change token.
+    
+    Pass the token from the previous response as since=. Without it (or when the
+    change log no longer reaches back that far) every row is returned with
+    reset set, and the client should replace its data rather than merge.
+    """
+    since = request.args.get('since')
+    if since is not None:
+        if not since.isdigit():
+            return jsonify({'error': 'since must be a token from a previous sync'}), 400
+        since = int(since)
+    
+    session = get_read_session()
+    try:
+        return jsonify(sync(session, since))
+    finally:
+        session.close()
+
+
+# ==================== SEARCH API ====================
+
+@bp.route('/api/search', methods=['GET'])
+@cached('departments', 'applications', 'integration_status', 'engagement_activities', 'incidents')
+def search_entities():
+    """Ranked full-text search across departments, applications, integrations, activities and incidents.
+    
+    Query parameters: q (required), types (comma-separated subset of the entity
+    types), limit and offset. Snippets are HTML-escaped with matches in <mark>.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query (q)'}), 400
+    
+    types = request.args.get('types')
+    entities = [t for t in types.split(',') if t] if types else None
+    unknown = [t for t in entities or [] if t not in SEARCH_ENTITIES]
+    if unknown:
+        return jsonify({'error': f"Unknown search type: {', '.join(unknown)}"}), 400
+    
+    try:
+        limit = parse_limit(request.args.get('limit'), config.SEARCH_PAGE_SIZE, config.SEARCH_MAX_PAGE_SIZE)
+        offset = int(request.args.get('offset') or 0)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if offset < 0 or offset > config.SEARCH_MAX_OFFSET:
+        return jsonify({'error': f'offset must be between 0 and {config.SEARCH_MAX_OFFSET}'}), 400
+    
+    session = get_read_session()
+    try:
+        results, has_more = search(session, query, entities, limit, offset, config.SEARCH_RANK_WINDOW)
+        return jsonify({
+            'query': query,
+            'results': results,
+            'next_offset': offset + limit if has_more else None
+        })
+    finally:
+        session.close()
+
+
 # ==================== TAG MANAGEMENT API ====================
 
-@app.route('/api/tags', methods=['GET'])
+@bp.route('/api/tags', methods=['GET'])
+@cached('tag_categories', 'tags')
 def get_all_tags():
     """Get all tag categories with their tags."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        categories = session.query(TagCategory).all()
-        result = []
-        for category in categories:
-            cat_dict = category.to_dict()
-            cat_dict['tags'] = [tag.to_dict() for tag in category.tags if tag.is_active]
-            result.append(cat_dict)
-        return jsonify(result)
+        return jsonify(get_tag_registry(session).all_categories())
     finally:
         session.close()
 
 
-@app.route('/api/tags/<category_name>', methods=['GET'])
+@bp.route('/api/tags/<category_name>', methods=['GET'])
+@cached('tag_categories', 'tags')
 def get_tags_by_category(category_name):
     """Get tags for a specific category."""
-    session = get_db_session()
+    session = get_read_session()
     try:
-        category = session.query(TagCategory).filter_by(name=category_name).first()
+        category = get_tag_registry(session).category(category_name)
         if not category:
             return jsonify({'error': 'Category not found'}), 404
-        
-        tags = [tag.to_dict() for tag in category.tags if tag.is_active]
-        return jsonify({
-            'category': category.to_dict(),
-            'tags': tags
-        })
+        return jsonify(category)
     finally:
         session.close()
 
 
-@app.route('/api/tags/<category_name>', methods=['POST'])
+@bp.route('/api/tags/<category_name>', methods=['POST'])
 def create_tag(category_name):
     """Create a new tag in a category."""
     session = get_db_session()
     try:
-        category = session.query(TagCategory).filter_by(name=category_name).first()
-        if not category:
+        entry = get_tag_registry(session).category(category_name)
+        if not entry:
             return jsonify({'error': 'Category not found'}), 404
+        category_id = entry['category']['category_id']
         
         data = request.json
+        if not data.get('value') or not data.get('label'):
+            return jsonify({'error': 'Tag value and label are required'}), 400
         
-        # Check if tag value already exists in this category
-        existing_tag = session.query(Tag).filter_by(
-            category_id=category.category_id,
-            value=data.get('value')
-        ).first()
-        
-        if existing_tag:
-            return jsonify({'error': 'Tag value already exists in this category'}), 400
-        
-        # Get max sort order
-        max_sort = session.query(func.max(Tag.sort_order)).filter_by(
-            category_id=category.category_id
-        ).scalar() or 0
+        # Next sort order, computed inside the INSERT
+        next_sort = select(func.coalesce(func.max(Tag.sort_order), 0) + 1).where(
+            Tag.category_id == category_id
+        ).scalar_subquery()
         
         tag = Tag(
-            category_id=category.category_id,
-            value=data.get('value'),
-            label=data.get('label'),
+            category_id=category_id,
+            value=data['value'],
+            label=data['label'],
             color=data.get('color', '#3498DB'),
-            sort_order=data.get('sort_order', max_sort + 1)
+            sort_order=data.get('sort_order', next_sort)
         )
         session.add(tag)
-        session.commit()
+        if not commit_tag(session):
+            return jsonify({'error': 'Tag value already exists in this category'}), 400
         return jsonify(tag.to_dict()), 201
     finally:
         session.close()
 
 
-@app.route('/api/tags/<int:tag_id>', methods=['PUT'])
+@bp.route('/api/tags/<int:tag_id>', methods=['PUT'])
 def update_tag(tag_id):
     """Update an existing tag."""
     session = get_db_session()
@@ -622,14 +928,7 @@ def update_tag(tag_id):
         
         data = request.json
         
-        # Check for duplicate value if value is being changed
-        if 'value' in data and data['value'] != tag.value:
-            existing_tag = session.query(Tag).filter_by(
-                category_id=tag.category_id,
-                value=data['value']
-            ).first()
-            if existing_tag:
-                return jsonify({'error': 'Tag value already exists in this category'}), 400
+        if 'value' in data:
             tag.value = data['value']
         
         if 'label' in data:
@@ -641,13 +940,14 @@ def update_tag(tag_id):
         if 'is_active' in data:
             tag.is_active = data['is_active']
         
-        session.commit()
+        if not commit_tag(session):
+            return jsonify({'error': 'Tag value already exists in this category'}), 400
         return jsonify(tag.to_dict())
     finally:
         session.close()
 
 
-@app.route('/api/tags/<int:tag_id>', methods=['DELETE'])
+@bp.route('/api/tags/<int:tag_id>', methods=['DELETE'])
 def delete_tag(tag_id):
     """Delete a tag (with validation)."""
     session = get_db_session()
@@ -657,75 +957,112 @@ def delete_tag(tag_id):
             return jsonify({'error': 'Tag not found'}), 404
         
         category = tag.category
+        was_active = tag.is_active
+        
+        # Delete first: the write lock it takes makes a concurrent delete in
+        # another process wait, so the checks below see every committed delete
+        session.delete(tag)
+        session.flush()
         
         # Check if this is the last active tag in the category
-        active_tags_count = session.query(Tag).filter_by(
+        remaining = session.query(func.count(Tag.tag_id)).filter_by(
             category_id=category.category_id,
             is_active=True
-        ).count()
-        
-        if active_tags_count <= 1:
+        ).scalar()
+        if remaining + (1 if was_active else 0) <= 1:
+            session.rollback()
             return jsonify({'error': 'Cannot delete the last tag in a category'}), 400
         
-        # Check if tag is in use based on category
-        in_use = False
-        entity_type = category.entity_type
-        field_name = category.field_name
-        
-        if entity_type == 'department':
-            in_use = session.query(Department).filter(
-                getattr(Department, field_name) == tag.value
-            ).first() is not None
-        elif entity_type == 'application':
-            in_use = session.query(Application).filter(
-                getattr(Application, field_name) == tag.value
-            ).first() is not None
-        elif entity_type == 'integration':
-            in_use = session.query(IntegrationStatus).filter(
-                getattr(IntegrationStatus, field_name) == tag.value
-            ).first() is not None
-        elif entity_type == 'contact':
-            in_use = session.query(Contact).filter(
-                getattr(Contact, field_name) == tag.value
-            ).first() is not None
-        elif entity_type == 'activity':
-            in_use = session.query(EngagementActivity).filter(
-                getattr(EngagementActivity, field_name) == tag.value
-            ).first() is not None
+        # Check if tag is in use, from the maintained usage counts
+        in_use = usage_count(session, category.entity_type, category.field_name, tag.value) > 0
         
         if in_use:
+            session.rollback()
             return jsonify({
                 'error': 'Cannot delete tag that is currently in use',
                 'suggestion': 'Consider deactivating the tag instead'
             }), 400
         
-        session.delete(tag)
         session.commit()
         return jsonify({'message': 'Tag deleted successfully'})
     finally:
         session.close()
 
 
-# ==================== AI CHAT API ====================
+@bp.route('/api/tags/<category_name>/usage', methods=['GET'])
+@cached('tag_categories', 'tags', 'departments', 'applications', 'integration_status', 'contacts', 'engagement_activities')
+def get_tag_usage(category_name):
+    """Number of records using each tag in a category."""
+    session = get_read_session()
+    try:
+        entry = get_tag_registry(session).category(category_name, include_inactive=True)
+        if not entry:
+            return jsonify({'error': 'Category not found'}), 404
+        
+        category = entry['category']
+        counts = usage_by_value(session, category['entity_type'], category['field_name'])
+        tag_values = {tag['value'] for tag in entry['tags']}
+        return jsonify({
+            'category': category,
+            'usage': [
+                {
+                    'tag_id': tag['tag_id'],
+                    'value': tag['value'],
+                    'label': tag['label'],
+                    'is_active': tag['is_active'],
+                    'count': counts.get(tag['value'], 0)
+                }
+                for tag in entry['tags']
+            ],
+            # Values in use that no tag defines (e.g. written before validation existed)
+            'untagged': {value: count for value, count in counts.items() if value not in tag_values}
+        })
+    finally:
+        session.close()
 
 
-def get_database_context(session):
-    """Get current database state for AI context."""
-    departments = session.query(Department).all()
-    applications = session.query(Application).all()
-    integrations = session.query(IntegrationStatus).all()
-    contacts = session.query(Contact).all()
-    activities = session.query(EngagementActivity).order_by(desc(EngagementActivity.date)).limit(20).all()
-    incidents = session.query(Incident).all()
+def commit_tag(session):
+    """Commit a tag write; False (rolled back) if its value is already used in the category.
     
-    return {
-        'departments': [d.to_dict() for d in departments],
-        'applications': [a.to_dict() for a in applications],
-        'integrations': [i.to_dict() for i in integrations],
-        'contacts': [c.to_dict() for c in contacts],
-        'recent_activities': [a.to_dict() for a in activities],
-        'incidents': [i.to_dict() for i in incidents]
-    }
+    The unique (category_id, value) index is the duplicate check, so values
+    added by other processes are caught too.
+    """
+    try:
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        if 'UNIQUE' not in str(e.orig):
+            raise
+        return False
+    return True
+
+
+# ==================== CACHE API ====================
+
+@bp.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Response cache size and hit/miss counters."""
+    return jsonify({'enabled': config.RESPONSE_CACHE, **response_cache.stats()})
+
+
+# ==================== METRICS API ====================
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, SQL and cache metrics in Prometheus text format."""
+    return metrics_response(metrics)
+
+
+@bp.route('/api/metrics/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Most recent statements slower than SLOW_QUERY_MS, newest first."""
+    return jsonify({
+        'threshold_ms': config.SLOW_QUERY_MS,
+        'queries': list(reversed(metrics.slow_queries)),
+    })
+
+
+# ==================== AI CHAT API ====================
 
 
 SYSTEM_PROMPT = """You are an AI assistant for the CanadaLogin CRM system. 
@@ -736,10 +1073,16 @@ You have access to current database state that includes:
 - Departments: Government customers with tier (critical/standard), status, and owner team
 - Applications: Software systems that integrate with the sign-in service
 - Integration Status: Progress tracking with stages (intake, design, implementation, testing, production)
+- Pipeline: Integration counts by department tier, stage, status and risk (the integration funnel)
 - Contacts: People at departments with roles (business, technical, security)
 - Engagement Activities: Meetings, emails, workshops, and incidents
 - Incidents: Issues with applications (severity levels: critical, high, medium, low)
 
+The database state is given as compact pipe-separated tables. Each "## section (columns)" line
+names the columns of the rows that follow. "dept" and "app" columns hold ids from the departments
+and applications tables. The "## stats" block counts the whole database, even when a table lists
+only some rows; use it for totals and breakdowns.
+
 Answer questions concisely and accurately based on the provided data. 
 If you need to reference specific entities, use their names.
 Format your responses clearly with bullet points when listing multiple items.
@@ -781,82 +1124,495 @@ Always include a text explanation along with the chart.
 """
 
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    """AI chat endpoint using Gemini with conversation history support."""
-    if not config.GEMINI_API_KEY:
-        return jsonify({'error': 'Gemini API key not configured. Please set GEMINI_API_KEY in .env file.'}), 500
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def load_genai():
+    """Import and configure the Gemini SDK on first use; the import alone takes seconds."""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=config.GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+
+# Opens every conversation, after SYSTEM_PROMPT: the database context and the model's reply to it
+PREFIX_TEMPLATE = """[Database Context - Do not repeat this]
+Current Database State:
+{context}
+"""
+PREFIX_REPLY = "I'm ready to help you query and analyze your CanadaLogin CRM data. I can answer questions about departments, applications, integration statuses, contacts, activities, and incidents. I can also generate charts and visualizations when you ask. What would you like to know?"
+
+SUMMARY_PROMPT = """Summarize this conversation between a user and the CanadaLogin CRM assistant so it can continue without the full transcript.
+Keep the questions asked, the departments, applications and figures mentioned, and any conclusions.
+Use at most {words} words.
+
+{text}"""
+
+
+def prefix_contents(text):
+    return [
+        {'role': 'user', 'parts': [text]},
+        {'role': 'model', 'parts': [PREFIX_REPLY]},
+    ]
+
+
+def _cache_prefix(text):
+    """Store the prefix with Gemini context caching; raises if the model or prefix size does not allow it."""
+    return load_genai().caching.CachedContent.create(
+        model=config.GEMINI_MODEL,
+        system_instruction=SYSTEM_PROMPT,
+        contents=prefix_contents(text),
+        ttl=timedelta(seconds=config.CHAT_PREFIX_CACHE_TTL)
+    )
+
+
+# Conversations held on the server, and the prefix they share
+chat_sessions = SessionStore(max_sessions=config.CHAT_MAX_SESSIONS, ttl=config.CHAT_SESSION_TTL)
+chat_prefix = PrefixCache(
+    create=_cache_prefix if config.CHAT_CONTEXT_CACHING else None,
+    release=lambda cached: cached.delete(),
+    ttl=config.CHAT_PREFIX_CACHE_TTL
+)
+metrics.add_collector('crm_chat_sessions', chat_sessions.stats)
+metrics.add_collector('crm_chat_prefix', chat_prefix.stats)
+
+# Common questions (counts, breakdowns, charts, short lists) answered with SQL, without the model
+chat_router = ChatRouter()
+metrics.add_collector('crm_chat_router', chat_router.stats)
+
+# Model answers to questions that open a conversation, for the current data version
+chat_answers = AnswerCache(
+    max_entries=config.CHAT_ANSWER_CACHE_SIZE,
+    ttl=config.CHAT_ANSWER_CACHE_TTL,
+    threshold=config.CHAT_ANSWER_CACHE_SIMILARITY
+)
+metrics.add_collector('crm_chat_answer_cache', chat_answers.stats)
+
+SYSTEM_PROMPT_TOKENS = estimate_tokens(SYSTEM_PROMPT)
+
+
+def get_chat_model(prefix=None):
+    """Gemini model used by the chat endpoints; reads the prefix from the provider's cache when it is held there."""
+    genai = load_genai()
+    if prefix is not None and prefix.cached is not None:
+        return genai.GenerativeModel.from_cached_content(prefix.cached)
+    return genai.GenerativeModel(config.GEMINI_MODEL, system_instruction=SYSTEM_PROMPT)
+
+
+def get_chat_prefix(snapshot):
+    """The shared prefix for a context snapshot, rebuilt only when the snapshot is."""
+    return chat_prefix.get(
+        (snapshot.version, snapshot.built_at),
+        lambda: PREFIX_TEMPLATE.format(context=render_shared(snapshot, config.CHAT_CONTEXT_MAX_ROWS))
+    )
+
+
+def summarize_turns(session, summary, turns):
+    """Fold turns into a session's running summary with one model call."""
+    text = '\n\n'.join(f'{role}: {message}' for role, message in turns)
+    if summary:
+        text = f'Summary so far:\n{summary}\n\n{text}'
+    words = config.CHAT_HISTORY_TOKEN_BUDGET // 4
+    response = get_chat_model().generate_content(
+        SUMMARY_PROMPT.format(words=words, text=text), request_options=_chat_request_options()
+    )
+    new_summary = response.text.strip()
+    usage = response_usage(response)
+    if usage:
+        chat_sessions.record(session, *usage)
+    else:
+        chat_sessions.record(session, SYSTEM_PROMPT_TOKENS + estimate_tokens(text), 0,
+                             estimate_tokens(new_summary), estimated=True)
+    return new_summary
+
+
+def start_chat_session(session, user_message):
+    """Start a model chat for the session's next message.
+
+    Returns (chat, message to send, (prompt, cached) token estimates, whether
+    the history was compacted).
+
+    The model gets the shared prefix (SYSTEM_PROMPT and render_shared()), the
+    session's summary and recent turns, and the message with the rest of the
+    context it needs (render_focus()), which is not kept in the history. Old
+    turns are compacted first if the history is over its token budget. The
+    database session is closed before returning.
+    """
+    db_session = get_read_session()
+    try:
+        snapshot = get_snapshot(db_session, config.CHAT_CONTEXT_TTL)
+    finally:
+        db_session.close()
+    prefix = get_chat_prefix(snapshot)
+
+    compacted = compact(
+        session, config.CHAT_HISTORY_TOKEN_BUDGET, 2 * config.CHAT_KEEP_RECENT_EXCHANGES,
+        summarize=lambda summary, turns: summarize_turns(session, summary, turns)
+    )
+
+    # Earlier questions help resolve follow-ups like "what about their contacts?"
+    recent_questions = ' '.join(text for role, text in session.turns[-4:] if role == 'user')
+    focus = render_focus(snapshot, f'{recent_questions} {user_message}', config.CHAT_CONTEXT_MAX_ROWS)
+    message = f'{user_message}\n\n[Context for this question - Do not repeat this]\n{focus}' if focus else user_message
+
+    history = session.messages()
+    if prefix.cached is None:
+        history = prefix_contents(prefix.text) + history
+    chat = get_chat_model(prefix).start_chat(history=history)
+
+    estimate = (
+        SYSTEM_PROMPT_TOKENS + prefix.tokens + estimate_tokens(PREFIX_REPLY)
+        + session.history_tokens() + estimate_tokens(message),
+        prefix.tokens if prefix.cached is not None else 0
+    )
+    return chat, message, estimate, compacted
+
+
+def record_chat_usage(session, response, estimate, answer, compacted):
+    usage = response_usage(response)
+    if usage:
+        chat_sessions.record(session, *usage, compactions=int(compacted))
+    else:
+        prompt, cached = estimate
+        chat_sessions.record(session, prompt, cached, estimate_tokens(answer),
+                             estimated=True, compactions=int(compacted))
+
+
+def answer_directly(session, user_message):
+    """Answer a chat question without the model, if possible.
+
+    Returns (answer, source, cache_key). The router answers from the database
+    ("query"); a question that opens a conversation may have a cached answer
+    ("cache"). Otherwise answer is None, and a cache_key means the model's
+    answer can be cached with remember_answer().
+    """
+    db_session = get_read_session()
+    try:
+        snapshot = get_snapshot(db_session, config.CHAT_CONTEXT_TTL)
+        registry = get_tag_registry(db_session)
+        if config.CHAT_ROUTER:
+            answer = chat_router.answer(db_session, snapshot, user_message, registry)
+            if answer is not None:
+                return answer, 'query', None
+        # Later answers depend on the conversation too
+        if chat_answers.max_entries <= 0 or not session.is_empty():
+            return None, None, None
+        terms = chat_router.key_terms(snapshot, user_message, registry) if chat_answers.threshold > 0 else frozenset()
+        # change_log's sequence moves on writes from every process; the snapshot
+        # part drops answers given a context built before the latest writes
+        version = (current_token(db_session), snapshot.version, snapshot.built_at)
+        cache_key = (version, terms)
+        answer = chat_answers.get(user_message, *cache_key)
+        return answer, 'cache' if answer is not None else None, cache_key
+    finally:
+        db_session.close()
+
+
+def remember_answer(cache_key, user_message, answer):
+    """Cache the model's answer to a conversation's first question, unless the data changed meanwhile."""
+    version, terms = cache_key
+    db_session = get_read_session()
+    try:
+        unchanged = current_token(db_session) == version[0]
+    finally:
+        db_session.close()
+    if unchanged:
+        chat_answers.put(user_message, answer, version, terms)
+
+
+def open_chat_session(data):
+    """The session a chat request continues, or a new one seeded from the request's history."""
+    session, created = chat_sessions.get_or_create(data.get('session_id'))
+    if created:
+        # Clients without a session (or whose session expired) may send the turns so far
+        for msg in data.get('history') or []:
+            role = 'user' if msg.get('role') == 'user' else 'model'
+            session.turns.append((role, msg.get('content', '')))
+    return session
+
+
+def chat_user():
+    """Key for per-user chat limits (the app has no accounts, so the client address).
     
-    db_session = get_db_session()
+    Behind a reverse proxy this is the proxy's address unless TRUSTED_PROXIES is set.
+    """
+    return request.remote_addr or 'unknown'
+
+
+def _chat_request_options():
+    # Bound the model call itself so a hung request eventually frees its worker
+    return {'timeout': config.CHAT_TIMEOUT_SECONDS}
+
+
+def _run_chat(session, user_message, cache_key=None):
+    """Worker-side chat call; returns the full response text."""
+    with session.lock:
+        standalone = session.is_empty()
+        chat, message, estimate, compacted = start_chat_session(session, user_message)
+        response = chat.send_message(message, request_options=_chat_request_options())
+        answer = response.text
+        session.add_exchange(user_message, answer)
+        record_chat_usage(session, response, estimate, answer, compacted)
+        if cache_key and standalone:
+            remember_answer(cache_key, user_message, answer)
+        return answer
+
+
+def _stream_chat(session, user_message, emit, cache_key=None):
+    """Worker-side streaming chat call; emits each text chunk."""
+    with session.lock:
+        standalone = session.is_empty()
+        chat, message, estimate, compacted = start_chat_session(session, user_message)
+        response = chat.send_message(message, stream=True, request_options=_chat_request_options())
+        parts = []
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # chunk without text parts, e.g. a finish or safety marker
+            if text:
+                parts.append(text)
+                emit(text)
+        answer = ''.join(parts)
+        session.add_exchange(user_message, answer)
+        record_chat_usage(session, response, estimate, answer, compacted)
+        if cache_key and standalone:
+            remember_answer(cache_key, user_message, answer)
+
+
+@bp.route('/api/chat', methods=['POST'])
+def chat():
+    """AI chat endpoint using Gemini, continuing a server-side conversation.
+
+    Send {"message", "session_id"}; the response carries the session_id to use
+    for the next message. A missing or expired session_id starts a new one.
+    Questions the router understands are answered from the database directly
+    ("source": "query"), repeats of a question answered earlier from the answer
+    cache ("source": "cache"), the rest by the model ("source": "model").
+    """
     try:
         data = request.json
         user_message = data.get('message', '')
-        conversation_history = data.get('history', [])  # List of {role, content} messages
         
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
         
-        # Get current database context
-        db_context = get_database_context(db_session)
-        context_str = json.dumps(db_context, indent=2)
-        
-        # Build conversation for Gemini
-        model = genai.GenerativeModel(config.GEMINI_MODEL)
-        
-        # Create the initial context message
-        system_context = f"""{SYSTEM_PROMPT}
-
-Current Database State:
-{context_str}
-"""
-        
-        # Build chat history for multi-turn conversation
-        chat_messages = []
-        
-        # Add system context as first user message (Gemini doesn't have system role)
-        chat_messages.append({
-            'role': 'user',
-            'parts': [f"[System Context - Do not repeat this]\n{system_context}\n\nI understand. I'll help you with questions about the CRM data. What would you like to know?"]
-        })
-        chat_messages.append({
-            'role': 'model',
-            'parts': ["I'm ready to help you query and analyze your CanadaLogin CRM data. I can answer questions about departments, applications, integration statuses, contacts, activities, and incidents. I can also generate charts and visualizations when you ask. What would you like to know?"]
-        })
-        
-        # Add conversation history
-        for msg in conversation_history:
-            role = 'user' if msg.get('role') == 'user' else 'model'
-            chat_messages.append({
-                'role': role,
-                'parts': [msg.get('content', '')]
+        session = open_chat_session(data)
+        response_text, source, cache_key = answer_directly(session, user_message)
+        if response_text is not None:
+            with session.lock:
+                session.add_exchange(user_message, response_text)
+            return jsonify({
+                'response': response_text,
+                'session_id': session.id,
+                'source': source,
+                'status': 'success'
             })
         
-        # Add current user message
-        chat_messages.append({
-            'role': 'user',
-            'parts': [user_message]
-        })
+        if not config.GEMINI_API_KEY:
+            return jsonify({'error': 'Gemini API key not configured. Please set GEMINI_API_KEY in .env file.'}), 500
         
-        # Start chat and send all messages
-        chat = model.start_chat(history=chat_messages[:-1])
-        response = chat.send_message(user_message)
+        response_text = chat_pool.run(
+            chat_user(), _run_chat, session, user_message, cache_key,
+            timeout=config.CHAT_TIMEOUT_SECONDS
+        )
         
         return jsonify({
-            'response': response.text,
+            'response': response_text,
+            'session_id': session.id,
+            'source': 'model',
             'status': 'success'
         })
+    except ChatBusy as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 429, {'Retry-After': str(config.CHAT_RETRY_AFTER)}
+    except ChatTimeout:
+        return jsonify({'error': 'The assistant took too long to respond.', 'status': 'error'}), 504
     except Exception as e:
         return jsonify({
             'error': str(e),
             'status': 'error'
         }), 500
-    finally:
-        db_session.close()
+
+
+def _sse_event(data, event=None):
+    """Format one Server-Sent Events message with a JSON payload."""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(data)}\n\n'
+
+
+def _sse_response(events):
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@bp.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """AI chat endpoint that streams the response as Server-Sent Events.
+
+    Takes the same body as /api/chat. Each text chunk is sent as a default
+    "message" event with {"text": ...}; the stream ends with a "done" event
+    carrying the session_id and source, or an "error" event with {"error": ...}.
+    An answer from the router or the answer cache arrives as a single chunk.
+    """
+    data = request.json or {}
+    user_message = data.get('message', '')
+    
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    session = open_chat_session(data)
+    answer, source, cache_key = answer_directly(session, user_message)
+    if answer is not None:
+        with session.lock:
+            session.add_exchange(user_message, answer)
+        return _sse_response([
+            _sse_event({'text': answer}),
+            _sse_event({'status': 'success', 'session_id': session.id, 'source': source}, event='done'),
+        ])
+    
+    if not config.GEMINI_API_KEY:
+        return jsonify({'error': 'Gemini API key not configured. Please set GEMINI_API_KEY in .env file.'}), 500
+    
+    # Admission is decided before the response starts, so a full pool is a plain 429
+    try:
+        chunks = chat_pool.stream(
+            chat_user(),
+            lambda emit: _stream_chat(session, user_message, emit, cache_key),
+            timeout=config.CHAT_TIMEOUT_SECONDS
+        )
+    except ChatBusy as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 429, {'Retry-After': str(config.CHAT_RETRY_AFTER)}
+    
+    def generate():
+        # Padding comment pushes the headers and first bytes through any buffering proxy
+        yield ': stream open\n\n'
+        try:
+            for text in chunks:
+                yield _sse_event({'text': text})
+            yield _sse_event({'status': 'success', 'session_id': session.id, 'source': 'model'}, event='done')
+        except ChatTimeout:
+            yield _sse_event({'error': 'The assistant took too long to respond.', 'status': 'error'}, event='error')
+        except Exception as e:
+            yield _sse_event({'error': str(e), 'status': 'error'}, event='error')
+        finally:
+            chunks.close()
+    
+    return _sse_response(generate())
+
+
+@bp.route('/api/chat/sessions/<session_id>', methods=['GET'])
+def get_chat_session(session_id):
+    """Length, summary state and token usage of a chat session."""
+    session = chat_sessions.get(session_id)
+    if not session:
+        return jsonify({'error': 'Chat session not found'}), 404
+    return jsonify(session.to_dict())
+
+
+@bp.route('/api/chat/sessions/<session_id>', methods=['DELETE'])
+def delete_chat_session(session_id):
+    """End a chat session (the Clear/New Chat buttons)."""
+    if not chat_sessions.drop(session_id):
+        return jsonify({'error': 'Chat session not found'}), 404
+    return jsonify({'message': 'Chat session deleted'})
+
+
+# ==================== APPLICATION FACTORY ====================
+
+def create_app(overrides=None):
+    """Create the Flask app.
+    
+    Only builds the engines and installs the write listeners: no connection is
+    opened, so workers start quickly. The schema must already exist (run
+    `flask --app app init-db`). overrides are applied on top of config.py, e.g.
+    {'SQLALCHEMY_DATABASE_URI': ...} to point the app at another database.
+    The engines are module globals, so create one app per process.
+    """
+    global engine, Session, read_engine, ReadSession
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.update(overrides or {})
+    app.json = JSONProvider(app)
+    CORS(app)
+    if config.TRUSTED_PROXIES:
+        # request.remote_addr is then the client's address from X-Forwarded-For
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.TRUSTED_PROXIES)
+    
+    engine = create_db_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    Session = sessionmaker(bind=engine)
+    read_engine = init_read_engine(engine)
+    ReadSession = sessionmaker(bind=read_engine)
+    
+    # Track per-table data versions for the caches, and keep the dashboard
+    # counters, tag usage counts and integration summary in step with writes
+    install_versions(Session)
+    if config.DASHBOARD_COUNTERS:
+        install_counters(Session)
+    install_usage(Session)
+    install_summary(Session)
+    
+    app.register_blueprint(bp)
+    if config.METRICS:
+        install_metrics(app, metrics, engines=(engine, read_engine))
+    return app
+
+
+def init_database(sample_data=False):
+    """Create tables, apply migrations and seed tag categories, rebuild derived tables and prune the change log.
+    
+    With sample_data, the sample departments, applications and activities are
+    loaded too (only into an empty database). Safe to run repeatedly.
+    """
+    init_db(engine)
+    with Session() as session:
+        if sample_data:
+            seed_data(session)
+        else:
+            seed_tags(session)
+        if config.DASHBOARD_COUNTERS:
+            rebuild_counters(session)
+        rebuild_usage(session)
+        rebuild_summary(session)
+        prune_change_log(session, config.SYNC_LOG_RETENTION_DAYS)
+
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database schema and rebuild derived tables."""
+    init_database()
+    click.echo(f"Database ready: {engine.url.database}")
+
+
+@bp.cli.command('seed')
+def seed_command():
+    """Load the sample data into an empty database."""
+    init_database(sample_data=True)
+    click.echo(f"Database ready: {engine.url.database}")
+
+
+@bp.cli.command('prune-changes')
+def prune_changes_command():
+    """Drop sync change log entries older than SYNC_LOG_RETENTION_DAYS."""
+    with Session() as session:
+        removed = prune_change_log(session, config.SYNC_LOG_RETENTION_DAYS)
+    click.echo(f"Removed {removed} change log entries")
+
+
+app = create_app()
 
 
 # ==================== RUN APPLICATION ====================
 
 if __name__ == '__main__':
+    # The development server sets up and seeds the database itself
+    init_database(sample_data=True)
     print("=" * 60)
     print("CanadaLogin CRM")
     print("=" * 60)
@@ -0,0 +1 @@
+"""Performance benchmarks for the CRM. Run modules with ``python -m benchmarks.<name>``."""
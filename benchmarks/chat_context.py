@@ -0,0 +1,78 @@
+"""
+Size and build time of the AI chat context: the original full JSON dump versus
+the compact, cached context from chat_context.py, as a conversation gets it (the
+shared prefix once, then the focus sections for each question).
+
+    python -m benchmarks.chat_context --database path/to/crm.db
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+
+import chat_context
+import versions
+from database import create_db_engine
+from models import Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident
+from queries import eager_query, list_query
+
+
+QUESTIONS = [
+    'How many applications are live?',
+    'Which integrations are blocked or high risk?',
+    'Who is the technical contact for CRA?',
+    'Show me a chart of incidents by severity',
+]
+
+
+def legacy_context(session):
+    """The context app.py built before the compact builder: every row, indented JSON."""
+    context = {
+        'departments': [d.to_dict() for d in eager_query(session, Department).all()],
+        'applications': [a.to_dict() for a in eager_query(session, Application).all()],
+        'integrations': [i.to_dict() for i in eager_query(session, IntegrationStatus).all()],
+        'contacts': [c.to_dict() for c in eager_query(session, Contact).all()],
+        'recent_activities': [a.to_dict() for a in list_query(session, EngagementActivity).limit(20).all()],
+        'incidents': [i.to_dict() for i in eager_query(session, Incident).all()],
+    }
+    return json.dumps(context, indent=2)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite database file to read')
+    parser.add_argument('--max-rows', type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_db_engine(f'sqlite:///{os.path.abspath(args.database)}', readonly=True)
+    Session = sessionmaker(bind=engine)
+
+    with Session() as session:
+        legacy, legacy_ms = timed(lambda: legacy_context(session))
+        print(f"{'legacy json dump':<48}{len(legacy.encode()):>14,} bytes {legacy_ms:>10.1f} ms")
+
+        chat_context.invalidate()
+        versions.bump(*chat_context.CONTEXT_TABLES)
+        snapshot, cold_ms = timed(lambda: chat_context.get_snapshot(session))
+        print(f"{'compact snapshot build (cache miss)':<48}{'':>20} {cold_ms:>10.1f} ms")
+
+        text, ms = timed(lambda: chat_context.render_shared(snapshot, args.max_rows))
+        print(f"{'shared prefix':<48}{len(text.encode()):>14,} bytes {ms:>10.1f} ms")
+        for question in QUESTIONS:
+            text, ms = timed(lambda: chat_context.render_focus(snapshot, question, args.max_rows))
+            print(f"{question[:46]:<48}{len(text.encode()):>14,} bytes {ms:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
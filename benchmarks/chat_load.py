@@ -0,0 +1,202 @@
+"""
+CRUD latency while chat traffic saturates the server.
+
+Serves the app from a WSGI server with a fixed number of request threads (like a
+gunicorn gthread worker) and a stand-in model that sleeps instead of calling
+Gemini. CRUD clients measure latency on dashboard, list, detail and update
+requests, first alone and then alongside a flood of chat clients, once with an
+effectively unbounded chat pool and once with the configured bounds.
+
+    python -m benchmarks.chat_load --threads 16 --chat-clients 48 --seconds 10
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import BaseWSGIServer
+
+import config
+from chat_worker import ChatPool
+
+
+class FakeChat:
+    """Stands in for a Gemini chat session: waits, then answers in a few chunks."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def send_message(self, message, stream=False, **kwargs):
+        parts = ['There are ', 'several ', 'departments.']
+        if not stream:
+            time.sleep(self.latency)
+            return type('Response', (), {'text': ''.join(parts)})()
+        return self._stream(parts)
+
+    def _stream(self, parts):
+        for part in parts:
+            time.sleep(self.latency / len(parts))
+            yield type('Chunk', (), {'text': part})()
+
+
+class FakeModel:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def start_chat(self, history):
+        return FakeChat(self.latency)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server handling requests on a fixed-size thread pool."""
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def request(base, method, path, body=None, timeout=120):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    return status, (time.perf_counter() - started) * 1000
+
+
+def crud_client(base, stop, latencies, lock):
+    department_ids = [d['department_id'] for d in json.loads(urllib.request.urlopen(base + '/api/departments').read())]
+    while not stop.is_set():
+        choice = random.random()
+        dept_id = random.choice(department_ids)
+        if choice < 0.3:
+            result = request(base, 'GET', '/api/dashboard')
+        elif choice < 0.6:
+            result = request(base, 'GET', '/api/applications')
+        elif choice < 0.9:
+            result = request(base, 'GET', f'/api/departments/{dept_id}')
+        else:
+            result = request(base, 'PUT', f'/api/departments/{dept_id}', {'status': 'active'})
+        with lock:
+            latencies.append(result[1])
+
+
+def chat_client(base, stop, statuses, lock, stream, backoff):
+    path = '/api/chat/stream' if stream else '/api/chat'
+    while not stop.is_set():
+        status, _ = request(base, 'POST', path, {'message': 'Which departments need attention this quarter?', 'history': []})
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+        if status == 429:
+            time.sleep(backoff)
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run_scenario(crm, base, name, pool, crud_clients, chat_clients, seconds, stream, backoff):
+    if pool is not None:
+        crm.chat_pool = pool
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+    threads = [threading.Thread(target=crud_client, args=(base, stop, latencies, lock)) for _ in range(crud_clients)]
+    threads += [threading.Thread(target=chat_client, args=(base, stop, statuses, lock, stream, backoff))
+                for _ in range(chat_clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        'scenario': name,
+        'crud_requests': len(latencies),
+        'crud_p50_ms': round(percentile(latencies, 50), 1),
+        'crud_p99_ms': round(percentile(latencies, 99), 1),
+        'crud_max_ms': round(max(latencies, default=0), 1),
+        'chat_statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help='server request threads')
+    parser.add_argument('--crud-clients', type=int, default=4)
+    parser.add_argument('--chat-clients', type=int, default=48)
+    parser.add_argument('--chat-latency', type=float, default=2.0, help='seconds per fake model call')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--backoff', type=float, default=0.5, help='seconds a chat client waits after a 429')
+    parser.add_argument('--stream', action='store_true', help='use /api/chat/stream for chat clients')
+    args = parser.parse_args()
+
+    # app.py opens the database when imported, so configure it first
+    config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='crm-chat-load-'), 'crm.db')}"
+    config.GEMINI_API_KEY = config.GEMINI_API_KEY or 'benchmark'
+    config.CHAT_ANSWER_CACHE_SIZE = 0  # every request waits on the model
+    crm = importlib.import_module('app')
+    crm.init_database(sample_data=True)
+    crm.get_chat_model = lambda prefix=None: FakeModel(args.chat_latency)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = PooledWSGIServer('127.0.0.1', 0, crm.app, args.threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    # All benchmark clients share one address, so the per-user limit is lifted
+    unbounded = ChatPool(max_workers=10_000, max_queue=0, per_user_limit=10_000)
+    bounded = ChatPool(max_workers=config.CHAT_MAX_WORKERS, max_queue=config.CHAT_MAX_QUEUE,
+                       per_user_limit=10_000)
+
+    results = [
+        run_scenario(crm, base, 'crud only', None, args.crud_clients, 0, args.seconds, args.stream, args.backoff),
+        run_scenario(crm, base, 'chat flood, unbounded pool', unbounded, args.crud_clients, args.chat_clients,
+                     args.seconds, args.stream, args.backoff),
+        run_scenario(crm, base, 'chat flood, bounded pool', bounded, args.crud_clients, args.chat_clients,
+                     args.seconds, args.stream, args.backoff),
+    ]
+    server.shutdown()
+
+    print(f"{args.threads} server threads, {args.crud_clients} CRUD clients, {args.chat_clients} chat clients, "
+          f"{args.chat_latency:.1f}s model latency, bounded pool = {config.CHAT_MAX_WORKERS} workers "
+          f"+ {config.CHAT_MAX_QUEUE} queued")
+    print(f"{'scenario':<30} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  chat responses")
+    for r in results:
+        print(f"{r['scenario']:<30} {r['crud_requests']:>9} {r['crud_p50_ms']:>8} {r['crud_p99_ms']:>8} "
+              f"{r['crud_max_ms']:>8}  {r['chat_statuses']}")
+
+
+if __name__ == '__main__':
+    main()
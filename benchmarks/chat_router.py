@@ -0,0 +1,96 @@
+"""
+How many chat questions the SQL router answers without a model call, and how
+long it takes, for a set of typical questions (some answerable, some that must
+go to the model). Misses matter too: every question the router gives up on pays
+its parsing time before the model call.
+
+    python -m benchmarks.chat_router --database path/to/crm.db --verbose
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+
+import chat_context
+import tag_registry
+from chat_router import ChatRouter
+from database import create_db_engine
+
+# {dept} is replaced by the acronym of a department in the database
+QUESTIONS = [
+    'How many applications are live?',
+    'How many high-risk integrations are there?',
+    'Show me a chart of applications by status',
+    'Create a pie chart of departments by tier',
+    'Visualize integration risk levels as a bar chart',
+    'How many incidents by severity?',
+    'Open incidents for {dept}',
+    'Who is the technical contact for {dept}?',
+    'Which departments are critical?',
+    'Show me delayed integrations',
+    'Which integrations are blocked or delayed?',
+    'How many critical incidents are open?',
+    'How many applications per department?',
+    'Number of meetings',
+    'Chart of integrations by stage',
+    'Which integrations are blocked or high risk?',
+    'What applications are currently in testing?',
+    'How many applications do they have?',
+    'Summarize recent activities for {dept}',
+    'Which departments have the most incidents?',
+    'What is the root cause of the latest outage?',
+    'Which integrations are at risk of missing their go-live date?',
+    'What should we prioritize with {dept} this quarter?',
+    'Tell me about {dept}',
+]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite database file to read')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--verbose', action='store_true', help='print each answer')
+    args = parser.parse_args()
+
+    engine = create_db_engine(f'sqlite:///{os.path.abspath(args.database)}', readonly=True)
+    Session = sessionmaker(bind=engine)
+    router = ChatRouter()
+
+    with Session() as session:
+        snapshot = chat_context.get_snapshot(session)
+        registry = tag_registry.get_registry(session)
+        department = next(iter(snapshot.departments.values()))[1]
+        questions = [question.format(dept=department) for question in QUESTIONS]
+
+        hits, misses = [], []
+        for question in questions:
+            times = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                answer = router.answer(session, snapshot, question, registry)
+                times.append((time.perf_counter() - started) * 1000)
+            (hits if answer is not None else misses).append(percentile(times, 50))
+            status = 'answered' if answer is not None else 'model'
+            print(f'{question[:60]:<62}{status:>10}{percentile(times, 50):>10.2f} ms')
+            if args.verbose and answer is not None:
+                print('    ' + answer[:300].replace('\n', '\n    '))
+
+    stats = router.stats()
+    print(f"\nanswered {len(hits)} of {len(questions)} questions ({len(hits) / len(questions):.0%}); "
+          f"by intent: count {stats['answered_count'] // args.repeat}, chart {stats['answered_chart'] // args.repeat}, "
+          f"list {stats['answered_list'] // args.repeat}")
+    print(f'answer time p50 {percentile(hits, 50):.2f} ms, max {max(hits, default=0):.2f} ms; '
+          f'time to give up p50 {percentile(misses, 50):.2f} ms, max {max(misses, default=0):.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Prompt tokens per chat turn over a long conversation: the previous requests
+(system prompt and database context rebuilt into the first message, then the
+whole client-side history replayed every turn) versus server-side sessions
+(a shared prefix, a summary of older turns and only the recent ones).
+
+Uses a stand-in model that answers with a fixed-length reply and reports token
+usage the way Gemini does, counting about four characters per token. With
+--provider-cache the stand-in also accepts the prefix into a context cache, so
+those tokens are reported as cached.
+
+    python -m benchmarks.chat_sessions --turns 40 --answer-words 150
+"""
+import argparse
+import importlib
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from chat_context import get_snapshot, render_focus, render_shared
+from chat_sessions import estimate_tokens
+
+QUESTIONS = [
+    'How many applications are live?',
+    'Which integrations are blocked or high risk?',
+    'Who is the technical contact for CRA?',
+    'What about their open incidents?',
+    'Show me a chart of applications by status',
+    'Which departments are critical?',
+    'How many applications do they have?',
+    'Summarize recent activities for ESDC',
+]
+
+
+class Usage:
+    def __init__(self, prompt, cached, output):
+        self.prompt_token_count = prompt
+        self.cached_content_token_count = cached
+        self.candidates_token_count = output
+
+
+class Response:
+    def __init__(self, text, prompt, cached):
+        self.text = text
+        self.usage_metadata = Usage(prompt, cached, estimate_tokens(text))
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.tokens = model.base_tokens + sum(estimate_tokens(m['parts'][0]) for m in history)
+
+    def send_message(self, message, stream=False, **kwargs):
+        self.model.prompts.append(self.tokens + estimate_tokens(message))
+        return Response(self.model.answer, self.tokens + estimate_tokens(message), self.model.cached_tokens)
+
+
+class FakeModel:
+    """Stand-in for GenerativeModel; records the prompt tokens of each call."""
+
+    def __init__(self, answer, prompts, system_instruction=None, cached=None):
+        self.answer = answer
+        self.prompts = prompts
+        self.cached_tokens = cached.tokens if cached else 0
+        self.base_tokens = estimate_tokens(system_instruction or '') + self.cached_tokens
+
+    def start_chat(self, history):
+        return FakeChat(self, history)
+
+    def generate_content(self, prompt, **kwargs):
+        summary = ' '.join(self.answer.split()[:config.CHAT_HISTORY_TOKEN_BUDGET // 8])
+        return Response(summary, self.base_tokens + estimate_tokens(prompt), 0)
+
+
+class FakeCached:
+    """Stand-in for a CachedContent: the system prompt plus the prefix messages."""
+
+    def __init__(self, crm, text):
+        self.tokens = estimate_tokens(crm.SYSTEM_PROMPT) + estimate_tokens(text) + estimate_tokens(crm.PREFIX_REPLY)
+
+    def delete(self):
+        pass
+
+
+def previous_prompt(crm, question, history):
+    """Prompt tokens of the previous start_chat_session() for this turn."""
+    db_session = crm.get_read_session()
+    try:
+        snapshot = get_snapshot(db_session, config.CHAT_CONTEXT_TTL)
+    finally:
+        db_session.close()
+    # The whole context went into every request: the shared part and the question's sections
+    recent = ' '.join(m['content'] for m in history[-6:] if m['role'] == 'user')
+    context = '\n'.join(filter(None, (
+        render_shared(snapshot, config.CHAT_CONTEXT_MAX_ROWS),
+        render_focus(snapshot, f'{recent} {question}', config.CHAT_CONTEXT_MAX_ROWS),
+    )))
+    first = f"[System Context - Do not repeat this]\n{crm.SYSTEM_PROMPT}\n\nCurrent Database State:\n{context}\n"
+    return (estimate_tokens(first) + estimate_tokens(crm.PREFIX_REPLY)
+            + sum(estimate_tokens(m['content']) for m in history) + estimate_tokens(question))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=40)
+    parser.add_argument('--answer-words', type=int, default=150)
+    parser.add_argument('--provider-cache', action='store_true', help='the stand-in model accepts context caches')
+    args = parser.parse_args()
+
+    # app.py opens the database when imported, so configure it first
+    config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='crm-chat-sessions-'), 'crm.db')}"
+    config.GEMINI_API_KEY = config.GEMINI_API_KEY or 'benchmark'
+    config.CHAT_ROUTER = False  # every turn goes to the model
+    crm = importlib.import_module('app')
+    crm.init_database(sample_data=True)
+    logging.getLogger('metrics').setLevel(logging.ERROR)
+
+    answer = ' '.join(['word'] * args.answer_words)
+    prompts = []
+    def get_chat_model(prefix=None):
+        # A cached prefix carries the system prompt, like GenerativeModel.from_cached_content()
+        if prefix is not None and prefix.cached is not None:
+            return FakeModel(answer, prompts, cached=prefix.cached)
+        return FakeModel(answer, prompts, crm.SYSTEM_PROMPT)
+
+    crm.get_chat_model = get_chat_model
+    crm.chat_prefix.create = (lambda text: FakeCached(crm, text)) if args.provider_cache else None
+    client = crm.app.test_client()
+
+    history = []
+    previous = []
+    session_id = None
+    for turn in range(args.turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        previous.append(previous_prompt(crm, question, history))
+        history += [{'role': 'user', 'content': question}, {'role': 'assistant', 'content': answer}]
+
+        response = client.post('/api/chat', json={'message': question, 'session_id': session_id}).get_json()
+        session_id = response['session_id']
+
+    usage = client.get(f'/api/chat/sessions/{session_id}').get_json()
+    print(f'{args.turns} turns, {args.answer_words}-word answers, history budget {config.CHAT_HISTORY_TOKEN_BUDGET:,} tokens, '
+          f"provider cache {'on' if args.provider_cache else 'off'}")
+    print(f"{'turn':<12}{'previous':>12}{'sessions':>12}")
+    # prompts has one entry per turn; summary calls are counted in the session's usage only
+    for turn in sorted({1, 5, 10, 20, args.turns} & set(range(1, args.turns + 1))):
+        print(f'{turn:<12}{previous[turn - 1]:>12,}{prompts[turn - 1]:>12,}')
+    print(f"{'total':<12}{sum(previous):>12,}{usage['usage']['prompt_tokens']:>12,}")
+    print(f"{'cached':<12}{0:>12,}{usage['usage']['cached_tokens']:>12,}")
+    print(f"model calls {usage['usage']['model_calls']} ({usage['usage']['compactions']} compactions), "
+          f"session history now {usage['history_tokens']:,} tokens")
+
+
+if __name__ == '__main__':
+    main()
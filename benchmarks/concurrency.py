@@ -0,0 +1,113 @@
+"""
+Read throughput under concurrent writes, for the default and tuned SQLite profiles.
+
+Readers repeatedly serialize the applications list through the read-only
+engine while writers insert engagement activities through the write engine.
+
+    python -m benchmarks.concurrency --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import config
+from database import create_db_engine, seed_data
+from models import Base, Application, EngagementActivity
+from queries import list_query
+
+
+# SQLite/SQLAlchemy defaults before the tuning profile was introduced
+DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 0}
+
+PROFILES = {
+    'default': DEFAULT_PRAGMAS,
+    'tuned': config.SQLITE_PRAGMAS,
+}
+
+
+def run_profile(name, pragmas, readers, writers, seconds):
+    """Run one profile against a fresh database and return its counters."""
+    workdir = tempfile.mkdtemp(prefix=f'crm-bench-{name}-')
+    url = f"sqlite:///{os.path.join(workdir, 'crm.db')}"
+    
+    write_engine = create_db_engine(url, pragmas=pragmas)
+    Base.metadata.create_all(write_engine)
+    WriteSession = sessionmaker(bind=write_engine)
+    with WriteSession() as session:
+        seed_data(session)
+    
+    # The default profile has no separate read pool; readers share the write engine
+    read_engine = create_db_engine(url, pragmas=pragmas, readonly=True) if name == 'tuned' else write_engine
+    ReadSession = sessionmaker(bind=read_engine)
+    
+    stats = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+    
+    def reader():
+        while not stop.is_set():
+            session = ReadSession()
+            try:
+                [a.to_dict() for a in list_query(session, Application).all()]
+                key = 'reads'
+            except OperationalError:
+                key = 'read_errors'
+            finally:
+                session.close()
+            with lock:
+                stats[key] += 1
+    
+    def writer():
+        while not stop.is_set():
+            session = WriteSession()
+            try:
+                session.add(EngagementActivity(department_id=1, type='email', date=date.today(), summary='benchmark'))
+                session.commit()
+                key = 'writes'
+            except OperationalError:
+                session.rollback()
+                key = 'write_errors'
+            finally:
+                session.close()
+            with lock:
+                stats[key] += 1
+    
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    write_engine.dispose()
+    read_engine.dispose()
+    return {key: value / seconds if key in ('reads', 'writes') else value for key, value in stats.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+    
+    print(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'read errors':>14}{'write errors':>14}")
+    for name, pragmas in PROFILES.items():
+        result = run_profile(name, pragmas, args.readers, args.writers, args.seconds)
+        print(f"{name:<10}{result['reads']:>12.1f}{result['writes']:>12.1f}"
+              f"{result['read_errors']:>14}{result['write_errors']:>14}")
+
+
+if __name__ == '__main__':
+    main()
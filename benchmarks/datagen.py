@@ -0,0 +1,242 @@
+"""
+Generate a synthetic CRM database of a chosen size.
+
+Creates the schema (with migrations and tag categories) and bulk-loads
+departments, applications with one integration each, contacts, engagement
+activities and incidents. Tag-backed fields only use seeded tag values, and
+the same --seed always produces the same data.
+
+    python -m benchmarks.datagen --database bench.db --departments 200 --apps-per-department 10 \\
+        --activities 500000 --incidents 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+
+from counters import rebuild_counters
+from integration_summary import rebuild_summary
+from database import create_db_engine, run_migrations, seed_tags
+from models import Base, Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident
+from tag_models import TagCategory
+from tag_usage import rebuild_usage
+
+
+DEFAULT_SIZES = {
+    'departments': 50,
+    'apps_per_department': 5,
+    'contacts_per_department': 3,
+    'activities': 50_000,
+    'incidents': 5_000,
+}
+
+# Rows per INSERT batch
+BATCH_SIZE = 5000
+
+# Untagged fields
+SEVERITIES = ('critical', 'high', 'medium', 'low')
+INCIDENT_STATUSES = ('open', 'investigating', 'resolved', 'closed')
+
+WORDS = (
+    'login', 'credential', 'federation', 'partner', 'onboarding', 'migration', 'review', 'security',
+    'roadmap', 'kickoff', 'testing', 'production', 'outage', 'timeout', 'certificate', 'renewal',
+    'workshop', 'escalation', 'budget', 'planning', 'sprint', 'demo', 'training', 'contract',
+    'session', 'redirect', 'metadata', 'assertion', 'mfa', 'password', 'reset', 'account',
+)
+NAME_WORDS = (
+    'Canada', 'Revenue', 'Health', 'Immigration', 'Employment', 'Veterans', 'Environment',
+    'Transport', 'Justice', 'Heritage', 'Fisheries', 'Innovation', 'Services', 'Safety', 'Agency',
+)
+APP_WORDS = ('Portal', 'Online', 'Account', 'Benefits', 'Permits', 'Tracker', 'Payments', 'Registry')
+FIRST_NAMES = ('Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn')
+LAST_NAMES = ('Tremblay', 'Roy', 'Martin', 'Singh', 'Chen', 'Wilson', 'Gagnon', 'Brown', 'Lee', 'Smith')
+
+
+def tag_values(session):
+    """{(entity_type, field_name): [values]} from the seeded tag categories."""
+    values = {}
+    for category in session.query(TagCategory).all():
+        values[(category.entity_type, category.field_name)] = [tag.value for tag in category.tags if tag.is_active]
+    return values
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def insert_rows(connection, model, rows):
+    """Insert rows in batches; returns the number inserted."""
+    table = model.__table__
+    batch, count = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            connection.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        connection.execute(table.insert(), batch)
+        count += len(batch)
+    return count
+
+
+def generate(url, departments, apps_per_department, contacts_per_department, activities, incidents,
+             seed=1, verbose=True):
+    """Create and fill a database at url; returns the number of rows per table."""
+    rng = random.Random(seed)
+    engine = create_db_engine(url)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        seed_tags(session)
+        tags = tag_values(session)
+
+    def pick(entity_type, field_name, fallback):
+        return rng.choice(tags.get((entity_type, field_name)) or fallback)
+
+    now = datetime.utcnow()
+    today = date.today()
+    app_count = departments * apps_per_department
+    counts = {}
+
+    def department_rows():
+        for i in range(1, departments + 1):
+            words = rng.sample(NAME_WORDS, 3)
+            yield {
+                'department_id': i,
+                'name': f"{' '.join(words)} {i}",
+                'acronym': ''.join(word[0] for word in words) + str(i),
+                'tier': pick('department', 'tier', ['standard']),
+                'status': pick('department', 'status', ['active']),
+                'owner_team': pick('department', 'owner_team', [None]),
+                'created_at': now,
+                'updated_at': now,
+            }
+
+    def application_rows():
+        for i in range(1, app_count + 1):
+            auth = rng.sample(tags.get(('application', 'auth_type')) or ['GC Key'], rng.randint(1, 2))
+            yield {
+                'app_id': i,
+                'department_id': (i - 1) // apps_per_department + 1,
+                'app_name': f"{rng.choice(NAME_WORDS)} {rng.choice(APP_WORDS)} {i}",
+                'environment': pick('application', 'environment', ['prod']),
+                'auth_type': ', '.join(auth),
+                'go_live_date': today - timedelta(days=rng.randint(0, 2000)),
+                'status': pick('application', 'status', ['integrating']),
+                'created_at': now,
+                'updated_at': now,
+            }
+
+    def integration_rows():
+        for i in range(1, app_count + 1):
+            yield {
+                'app_id': i,
+                'stage': pick('integration', 'stage', ['intake']),
+                'status': rng.choice(('on_track', 'on_track', 'on_track', 'blocked', 'delayed')),
+                'risk_level': rng.choice(('low', 'low', 'medium', 'high')),
+                'last_updated': now - timedelta(hours=rng.randint(0, 5000)),
+                'notes': sentence(rng, 10),
+            }
+
+    def contact_rows():
+        for department_id in range(1, departments + 1):
+            for _ in range(contacts_per_department):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                yield {
+                    'department_id': department_id,
+                    'name': f'{first} {last}',
+                    'role': pick('contact', 'role', ['technical']),
+                    'email': f'{first}.{last}{department_id}@example.gc.ca'.lower(),
+                    'phone': f'613-555-{rng.randint(0, 9999):04d}',
+                    'active_flag': rng.random() < 0.9,
+                    'created_at': now,
+                }
+
+    def activity_rows():
+        # Spread over the last few years, oldest first, like real insert order
+        days = max(1, min(3 * 365, activities // 10 or 1))
+        for i in range(activities):
+            app_id = rng.randint(1, app_count) if app_count and rng.random() < 0.8 else None
+            department_id = (app_id - 1) // apps_per_department + 1 if app_id else rng.randint(1, departments)
+            yield {
+                'department_id': department_id,
+                'app_id': app_id,
+                'type': pick('activity', 'type', ['meeting']),
+                'date': today - timedelta(days=days - 1 - i * days // activities),
+                'summary': sentence(rng, 14),
+                'next_action': sentence(rng, 6) if rng.random() < 0.6 else None,
+                'owner': rng.choice(FIRST_NAMES),
+                'created_at': now,
+            }
+
+    def incident_rows():
+        for _ in range(incidents if app_count else 0):
+            created = now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+            status = rng.choice(INCIDENT_STATUSES)
+            yield {
+                'app_id': rng.randint(1, app_count),
+                'severity': rng.choice(SEVERITIES),
+                'status': status,
+                'description': sentence(rng, 16),
+                'root_cause': sentence(rng, 8) if status in ('resolved', 'closed') else None,
+                'created_at': created,
+                'resolved_at': created + timedelta(hours=rng.randint(1, 72)) if status in ('resolved', 'closed') else None,
+            }
+
+    steps = [
+        (Department, department_rows),
+        (Application, application_rows),
+        (IntegrationStatus, integration_rows),
+        (Contact, contact_rows),
+        (EngagementActivity, activity_rows),
+        (Incident, incident_rows),
+    ]
+    for model, rows in steps:
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            counts[model.__tablename__] = insert_rows(connection, model, rows())
+        if verbose:
+            print(f"{model.__tablename__:<24}{counts[model.__tablename__]:>10,} rows {time.perf_counter() - started:>8.1f} s")
+
+    # Derived tables are rebuilt the way `flask init-db` does
+    with Session() as session:
+        rebuild_counters(session)
+        rebuild_usage(session)
+        rebuild_summary(session)
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file to create (must not exist)')
+    parser.add_argument('--departments', type=int, default=DEFAULT_SIZES['departments'])
+    parser.add_argument('--apps-per-department', type=int, default=DEFAULT_SIZES['apps_per_department'])
+    parser.add_argument('--contacts-per-department', type=int, default=DEFAULT_SIZES['contacts_per_department'])
+    parser.add_argument('--activities', type=int, default=DEFAULT_SIZES['activities'])
+    parser.add_argument('--incidents', type=int, default=DEFAULT_SIZES['incidents'])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.database)
+    if os.path.exists(path):
+        parser.error(f'{path} already exists')
+    if args.departments < 1:
+        parser.error('--departments must be at least 1')
+
+    started = time.perf_counter()
+    generate(f'sqlite:///{path}', args.departments, args.apps_per_department, args.contacts_per_department,
+             args.activities, args.incidents, seed=args.seed)
+    print(f"Generated {path} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
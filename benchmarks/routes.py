@@ -0,0 +1,356 @@
+"""
+Latency, throughput and memory for every route, through the Flask test client.
+
+Runs against a copy of --database (so write routes leave it untouched), or
+against a database generated with benchmarks.datagen at its default size.
+Each route is warmed up, then timed until --requests responses or --seconds
+have elapsed; peak Python memory for one request is measured afterwards
+under tracemalloc. Chat routes use a stand-in model that answers at once.
+
+Results can be saved as JSON and compared with an earlier run; the script
+exits with status 1 when any route's median latency regressed by more than
+--threshold percent.
+
+    python -m benchmarks.datagen --database bench.db --activities 200000
+    python -m benchmarks.routes --database bench.db --output before.json
+    python -m benchmarks.routes --database bench.db --compare before.json
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime
+from itertools import count
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from benchmarks import datagen
+
+
+# One benchmarked request: path and body may be callables, evaluated per request
+# (write routes need fresh values); setup, if given, runs untimed and returns the path
+Case = namedtuple('Case', 'name method rule path body setup', defaults=(None, None, None))
+
+MEMORY_SAMPLES = 1
+
+
+class FakeChat:
+    """Stands in for a Gemini chat session and answers immediately."""
+
+    def send_message(self, message, stream=False, **kwargs):
+        parts = ['There are ', 'several live ', 'applications.']
+        if stream:
+            return iter([type('Chunk', (), {'text': part})() for part in parts])
+        return type('Response', (), {'text': ''.join(parts)})()
+
+
+class FakeModel:
+    def start_chat(self, history):
+        return FakeChat()
+
+
+def copy_database(source, target):
+    """Consistent copy of a SQLite database, including pages still in its WAL."""
+    with sqlite3.connect(f'file:{source}?mode=ro', uri=True) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def first_ids(session):
+    """Ids of existing rows used in detail, update and delete paths."""
+    from models import Department, Application, IntegrationStatus, Contact, Incident
+    from tag_models import Tag
+    ids = {}
+    for key, model in (('department', Department), ('application', Application), ('integration', IntegrationStatus),
+                       ('contact', Contact), ('incident', Incident), ('tag', Tag)):
+        column = model.__table__.primary_key.columns.values()[0]
+        ids[key] = session.query(column).order_by(column).limit(1).scalar()
+    from sync import current_token
+    ids['sync_token'] = current_token(session)
+    return ids
+
+
+def build_cases(ids):
+    unique = count(1)
+    department, application = ids['department'], ids['application']
+
+    def created(path, body, key, prefix=None):
+        """Setup for delete routes: create a record and return its path (prefix/id)."""
+        def setup(client):
+            response = client.post(path, json=body() if callable(body) else body)
+            return f"{prefix or path}/{response.get_json()[key]}"
+        return setup
+
+    sync = {'token': ids['sync_token']}
+
+    def one_change(client):
+        """Setup for delta sync: catch up, edit one contact, and return the path since that token."""
+        sync['token'] = client.get(f"/api/sync?since={sync['token']}").get_json()['token']
+        client.put(f"/api/contacts/{ids['contact']}", json={'phone': f'613-555-{next(unique) % 10000:04d}'})
+        return f"/api/sync?since={sync['token']}"
+
+    def chat_session(client):
+        """Setup for the chat session routes: start a conversation and return its path."""
+        response = client.post('/api/chat', json={'message': 'How many applications are live?'})
+        return f"/api/chat/sessions/{response.get_json()['session_id']}"
+
+    new_department = lambda: {'name': f'Benchmark department {next(unique)}', 'tier': 'standard'}
+    new_application = lambda: {'department_id': department, 'app_name': f'Benchmark app {next(unique)}'}
+    new_contact = lambda: {'department_id': department, 'name': f'Benchmark contact {next(unique)}'}
+    new_activity = lambda: {'department_id': department, 'date': '2024-01-15', 'summary': 'Benchmark activity'}
+    new_tag = lambda: {'value': f'bench-{next(unique)}', 'label': 'Benchmark'}
+    # A new question each time, so the answer cache does not serve it
+    model_question = lambda: {'message': f'Which applications need attention in week {next(unique)}?'}
+
+    return [
+        Case('index', 'GET', '/', '/'),
+        Case('dashboard', 'GET', '/api/dashboard', '/api/dashboard'),
+        Case('departments list', 'GET', '/api/departments', '/api/departments'),
+        Case('departments page', 'GET', '/api/departments', '/api/departments?limit=100'),
+        Case('department', 'GET', '/api/departments/<int:department_id>', f'/api/departments/{department}'),
+        Case('department create', 'POST', '/api/departments', '/api/departments', new_department),
+        Case('department update', 'PUT', '/api/departments/<int:department_id>', f'/api/departments/{department}',
+             {'owner_team': None}),
+        Case('department delete', 'DELETE', '/api/departments/<int:department_id>',
+             setup=created('/api/departments', new_department, 'department_id')),
+        Case('applications list', 'GET', '/api/applications', '/api/applications'),
+        Case('applications page', 'GET', '/api/applications', '/api/applications?limit=100'),
+        Case('application', 'GET', '/api/applications/<int:app_id>', f'/api/applications/{application}'),
+        Case('application create', 'POST', '/api/applications', '/api/applications', new_application),
+        Case('application update', 'PUT', '/api/applications/<int:app_id>', f'/api/applications/{application}',
+             {'go_live_date': '2024-04-01'}),
+        Case('application delete', 'DELETE', '/api/applications/<int:app_id>',
+             setup=created('/api/applications', new_application, 'app_id')),
+        Case('integrations list', 'GET', '/api/integrations', '/api/integrations'),
+        Case('integration summary', 'GET', '/api/integrations/summary', '/api/integrations/summary?group_by=stage,tier'),
+        Case('integration update', 'PUT', '/api/integrations/<int:integration_id>',
+             f"/api/integrations/{ids['integration']}", {'notes': 'Benchmark update'}),
+        Case('contacts list', 'GET', '/api/contacts', '/api/contacts'),
+        Case('contact create', 'POST', '/api/contacts', '/api/contacts', new_contact),
+        Case('contact update', 'PUT', '/api/contacts/<int:contact_id>', f"/api/contacts/{ids['contact']}",
+             {'phone': '613-555-0100'}),
+        Case('contact delete', 'DELETE', '/api/contacts/<int:contact_id>',
+             setup=created('/api/contacts', new_contact, 'contact_id')),
+        Case('activities list', 'GET', '/api/activities', '/api/activities'),
+        Case('activities page', 'GET', '/api/activities', '/api/activities?limit=100'),
+        Case('activities filtered', 'GET', '/api/activities', f'/api/activities?department_id={department}&limit=100'),
+        Case('activity create', 'POST', '/api/activities', '/api/activities', new_activity),
+        Case('activity delete', 'DELETE', '/api/activities/<int:activity_id>',
+             setup=created('/api/activities', new_activity, 'activity_id')),
+        Case('incidents list', 'GET', '/api/incidents', '/api/incidents'),
+        Case('incident create', 'POST', '/api/incidents', '/api/incidents',
+             {'app_id': application, 'severity': 'low', 'description': 'Benchmark incident'}),
+        Case('incident update', 'PUT', '/api/incidents/<int:incident_id>', f"/api/incidents/{ids['incident']}",
+             {'description': 'Benchmark update'}),
+        Case('bulk contacts', 'POST', '/api/bulk/<entity>', '/api/bulk/contacts',
+             lambda: [{'department_id': department, 'name': f'Bulk contact {next(unique)}'} for _ in range(100)]),
+        Case('export activities', 'GET', '/api/export/<entity>', '/api/export/activities'),
+        Case('sync full', 'GET', '/api/sync', '/api/sync'),
+        Case('sync one change', 'GET', '/api/sync', setup=one_change),
+        Case('search', 'GET', '/api/search', '/api/search?q=login review'),
+        Case('tags', 'GET', '/api/tags', '/api/tags'),
+        Case('tag category', 'GET', '/api/tags/<category_name>', '/api/tags/department_tier'),
+        Case('tag create', 'POST', '/api/tags/<category_name>', '/api/tags/department_owner_team', new_tag),
+        Case('tag update', 'PUT', '/api/tags/<int:tag_id>', f"/api/tags/{ids['tag']}", {'color': '#3498DB'}),
+        Case('tag delete', 'DELETE', '/api/tags/<int:tag_id>',
+             setup=created('/api/tags/department_owner_team', new_tag, 'tag_id', '/api/tags')),
+        Case('tag usage', 'GET', '/api/tags/<category_name>/usage', '/api/tags/application_status/usage'),
+        Case('cache stats', 'GET', '/api/cache/stats', '/api/cache/stats'),
+        Case('metrics', 'GET', '/metrics', '/metrics'),
+        Case('slow queries', 'GET', '/api/metrics/slow-queries', '/api/metrics/slow-queries'),
+        Case('chat', 'POST', '/api/chat', '/api/chat', model_question),
+        Case('chat stream', 'POST', '/api/chat/stream', '/api/chat/stream', model_question),
+        Case('chat direct answer', 'POST', '/api/chat', '/api/chat', {'message': 'How many applications are live?'}),
+        Case('chat cached answer', 'POST', '/api/chat', '/api/chat',
+             {'message': 'Which applications need attention this quarter?'}),
+        Case('chat session', 'GET', '/api/chat/sessions/<session_id>', setup=chat_session),
+        Case('chat session delete', 'DELETE', '/api/chat/sessions/<session_id>', setup=chat_session),
+    ]
+
+
+def uncovered_routes(app, cases):
+    """(method, rule) pairs served by the app that no case exercises."""
+    covered = {(case.method, case.rule) for case in cases}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            if (method, rule.rule) not in covered:
+                missing.append((method, rule.rule))
+    return missing
+
+
+def send(client, case):
+    """Issue one request; returns (seconds, status, body bytes)."""
+    path = case.setup(client) if case.setup else (case.path() if callable(case.path) else case.path)
+    body = case.body() if callable(case.body) else case.body
+    started = time.perf_counter()
+    response = client.open(path, method=case.method, json=body)
+    size = len(response.get_data())
+    elapsed = time.perf_counter() - started
+    response.close()
+    return elapsed, response.status_code, size
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run_case(client, case, requests, seconds, warmup):
+    for _ in range(warmup):
+        send(client, case)
+
+    latencies, statuses, size = [], {}, 0
+    deadline = time.perf_counter() + seconds
+    while len(latencies) < requests and (not latencies or time.perf_counter() < deadline):
+        elapsed, status, size = send(client, case)
+        latencies.append(elapsed)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    # Peak traced allocation per request, measured apart from the timings
+    peaks = []
+    tracemalloc.start()
+    for _ in range(MEMORY_SAMPLES):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        send(client, case)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        'name': case.name,
+        'method': case.method,
+        'rule': case.rule,
+        'requests': len(latencies),
+        'rps': round(len(latencies) / sum(latencies), 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'peak_kib': round(max(peaks) / 1024, 1),
+        'bytes': size,
+        'statuses': statuses,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def table_sizes(session):
+    from models import Department, Application, Contact, EngagementActivity, Incident
+    return {model.__tablename__: session.query(model).count()
+            for model in (Department, Application, Contact, EngagementActivity, Incident)}
+
+
+def compare(results, baseline, threshold):
+    """Print p50/p99 changes against a baseline run; returns the regressed route names."""
+    previous = {route['name']: route for route in baseline['routes']}
+    regressed = []
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} "
+          f"({baseline['meta'].get('generated_at', '?')}):")
+    print(f"{'route':<24}{'p50 ms':>10}{'was':>10}{'change':>9}{'p99 ms':>10}{'was':>10}")
+    for route in results:
+        before = previous.get(route['name'])
+        if before is None:
+            print(f"{route['name']:<24}{route['p50_ms']:>10}{'-':>10}{'new':>9}{route['p99_ms']:>10}{'-':>10}")
+            continue
+        change = (route['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        flag = '  REGRESSION' if change > threshold else ''
+        if flag:
+            regressed.append(route['name'])
+        print(f"{route['name']:<24}{route['p50_ms']:>10}{before['p50_ms']:>10}{change:>+8.1f}%"
+              f"{route['p99_ms']:>10}{before['p99_ms']:>10}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='SQLite database to copy (default: generate one with benchmarks.datagen)')
+    parser.add_argument('--requests', type=int, default=100, help='timed requests per route')
+    parser.add_argument('--seconds', type=float, default=5, help='time limit per route')
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--routes', help='only run routes whose name contains this text')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache on (off by default, '
+                                                               'so repeated GETs measure the route itself)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=20, help='p50 increase (percent) reported as a regression')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='crm-bench-routes-')
+    path = os.path.join(workdir, 'crm.db')
+    if args.database:
+        copy_database(os.path.abspath(args.database), path)
+    else:
+        datagen.generate(f'sqlite:///{path}', seed=1, verbose=False, **datagen.DEFAULT_SIZES)
+
+    # app.py opens the database when imported, so configure it first
+    config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config.RESPONSE_CACHE = args.cache
+    config.GEMINI_API_KEY = config.GEMINI_API_KEY or 'benchmark'
+    crm = importlib.import_module('app')
+    crm.init_database()
+    crm.get_chat_model = lambda prefix=None: FakeModel()
+    # Slow statements are expected on large tables; the timings report them
+    logging.getLogger('metrics').setLevel(logging.ERROR)
+
+    with crm.Session() as session:
+        ids = first_ids(session)
+        sizes = table_sizes(session)
+
+    cases = build_cases(ids)
+    for method, rule in uncovered_routes(crm.app, cases):
+        print(f"warning: {method} {rule} has no benchmark case")
+    if args.routes:
+        cases = [case for case in cases if args.routes in case.name]
+
+    client = crm.app.test_client()
+    print(f"{'route':<24}{'requests':>9}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>10}{'bytes':>12}  statuses")
+    results = []
+    for case in cases:
+        result = run_case(client, case, args.requests, args.seconds, args.warmup)
+        results.append(result)
+        print(f"{result['name']:<24}{result['requests']:>9}{result['rps']:>10}{result['p50_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['peak_kib']:>10}{result['bytes']:>12,}  {result['statuses']}")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'response_cache': args.cache,
+            'tables': sizes,
+        },
+        'routes': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('tables') != sizes:
+            print(f"\nwarning: baseline was measured on different table sizes: {baseline['meta'].get('tables')}")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
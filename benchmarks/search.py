@@ -0,0 +1,56 @@
+"""
+Latency of /api/search queries against an existing database.
+
+Runs each query through search.search() and reports the median and worst time,
+with the configured rank window and with every match ranked.
+
+    python -m benchmarks.search --database path/to/crm.db "meeting" "roadmap kick" "term42"
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+
+import config
+from database import create_db_engine
+from search import search
+
+
+DEFAULT_QUERIES = ['CRA', 'meeting', 'security review', 'roadmap kick', 'outage', 'zzzz']
+
+
+def time_query(session, query, rank_window, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results, _ = search(session, query, limit=config.SEARCH_PAGE_SIZE, rank_window=rank_window)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings), len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite database file to read')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+    args = parser.parse_args()
+
+    engine = create_db_engine(f'sqlite:///{os.path.abspath(args.database)}', readonly=True)
+    Session = sessionmaker(bind=engine)
+
+    print(f"{'query':<20} {'window':>8} {'median ms':>10} {'max ms':>8} {'hits':>5}")
+    with Session() as session:
+        for query in args.queries:
+            for window in (config.SEARCH_RANK_WINDOW, 0):
+                median, worst, hits = time_query(session, query, window, args.repeat)
+                label = window or 'all'
+                print(f"{query:<20} {label:>8} {median:>10.1f} {worst:>8.1f} {hits:>5}")
+
+
+if __name__ == '__main__':
+    main()
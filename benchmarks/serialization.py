@@ -0,0 +1,103 @@
+"""
+List serialization cost: ORM instances with to_dict() and the stdlib JSON
+encoder, versus column-projected rows (serializers.py) with the stdlib encoder
+and with orjson.
+
+Times the query plus dict building and the JSON encoding separately, for every
+row of one entity. Without --database, a database with --rows activities is
+generated first.
+
+    python -m benchmarks.serialization --rows 100000
+    python -m benchmarks.serialization --database bench.db --entity incidents
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MultiDict
+from sqlalchemy.orm import sessionmaker
+
+import serializers
+from benchmarks import datagen
+from database import create_db_engine
+from queries import ENTITY_MODELS, filtered_query
+
+
+class StdlibProvider(DefaultJSONProvider):
+    default = staticmethod(serializers._default)
+
+
+def legacy_rows(session, model):
+    return [row.to_dict() for row in filtered_query(session, model, MultiDict())]
+
+
+def projected_rows(session, model):
+    query, keys = serializers.row_query(session, model)
+    return serializers.serialize_rows(model, filtered_query(session, model, MultiDict(), query).all(), keys)
+
+
+def measure(fn, repeat):
+    """Median seconds over repeat runs, and the last result."""
+    timings, result = [], None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='SQLite database to read (default: generate one)')
+    parser.add_argument('--rows', type=int, default=100_000, help='activities to generate without --database')
+    parser.add_argument('--entity', default='activities', choices=sorted(ENTITY_MODELS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--indent', action='store_true', help='indent JSON as the app does in debug mode')
+    args = parser.parse_args()
+
+    if args.database:
+        path = os.path.abspath(args.database)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix='crm-bench-serialize-'), 'crm.db')
+        sizes = {**datagen.DEFAULT_SIZES, 'activities': args.rows}
+        datagen.generate(f'sqlite:///{path}', seed=1, verbose=False, **sizes)
+
+    engine = create_db_engine(f'sqlite:///{path}', readonly=True)
+    Session = sessionmaker(bind=engine)
+    model = ENTITY_MODELS[args.entity]
+
+    app = Flask(__name__)
+    app.debug = args.indent
+    providers = {'stdlib': StdlibProvider(app), 'orjson': serializers.JSONProvider(app)}
+    if serializers.orjson is None:
+        del providers['orjson']
+        print('orjson is not installed; only the stdlib encoder is measured')
+
+    cases = [('to_dict()', legacy_rows, 'stdlib')]
+    cases += [('projected rows', projected_rows, name) for name in providers]
+
+    print(f"{args.entity}, {'indented' if args.indent else 'compact'} JSON, median of {args.repeat}")
+    print(f"{'rows':<16}{'encoder':<10}{'count':>10}{'build ms':>12}{'encode ms':>12}{'total ms':>12}{'MB':>8}")
+    baseline = None
+    with app.app_context():
+        for label, build, encoder in cases:
+            with Session() as session:
+                build_s, rows = measure(lambda: build(session, model), args.repeat)
+            encode_s, response = measure(lambda: providers[encoder].response(rows), args.repeat)
+            total = build_s + encode_s
+            baseline = baseline or total
+            print(f"{label:<16}{encoder:<10}{len(rows):>10,}{build_s * 1000:>12.1f}{encode_s * 1000:>12.1f}"
+                  f"{total * 1000:>12.1f}{len(response.get_data()) / 1e6:>8.1f}   {baseline / total:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
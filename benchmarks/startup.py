@@ -0,0 +1,58 @@
+"""
+Process startup time: importing app.py, serving the first request, and the
+work importing app.py did before the app factory (schema creation, seeding
+checks, derived-table rebuilds and the Gemini SDK import).
+
+Each scenario runs in a fresh interpreter against a temporary copy of a seeded
+database (or of --database); the median wall time of --repeat runs is shown.
+
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --database bench.db
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = [
+    ('interpreter only', 'pass'),
+    ('import app', 'import app'),
+    ('import app + first request', "import app; app.app.test_client().get('/api/dashboard')"),
+    ('previous import-time work', 'import app; app.init_database(sample_data=True); app.load_genai()'),
+    ('google.generativeai import', 'import google.generativeai'),
+]
+
+
+def run(code, env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='SQLite database to copy (default: a freshly seeded one)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='crm-bench-startup-'), 'crm.db')
+    env = {**os.environ, 'DATABASE_PATH': path, 'GEMINI_API_KEY': os.environ.get('GEMINI_API_KEY') or 'benchmark'}
+    if args.database:
+        shutil.copyfile(args.database, path)
+    run('import app; app.init_database(sample_data=True)', env)
+
+    print(f"{'scenario':<32}{'median ms':>12}{'max ms':>10}")
+    for name, code in SCENARIOS:
+        timings = [run(code, env) for _ in range(args.repeat)]
+        print(f"{name:<32}{statistics.median(timings) * 1000:>12.0f}{max(timings) * 1000:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+List-table rendering in headless Chromium: the activities and contacts views
+rendered the previous way (every filtered row written into the table) and
+through VirtualTable (only the rows in view), for opening a view, changing a
+filter, typing into a search box, scrolling, and paging through a
+server-paginated list with PagedSource.
+
+The page is the real templates/index.html and static files, loaded from a local
+fixture: a database generated with benchmarks.datagen, served to the browser
+through the Flask test client by Playwright request routing (no server is
+started and external requests are blocked). Times are script, style and layout
+time with layout forced before the clock stops; medians of --repeat runs.
+tests/test_tables.py runs the same measurement on a smaller database. Needs
+Playwright and its Chromium build:
+
+    pip install playwright && python -m playwright install chromium
+    python -m benchmarks.tables --activities 50000 --contacts 10000
+"""
+import argparse
+import importlib
+import logging
+import os
+import sys
+import tempfile
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from benchmarks import datagen
+
+ORIGIN = 'http://crm.test'
+
+# Contacts search text, typed one character every TYPE_DELAY_MS
+TYPED = 'alex.chen'
+TYPE_DELAY_MS = 60
+
+# Runs in the page once the data has synced. The previous rendering is restored by
+# swapping showRows() for one that writes every row into a plain copy of the table.
+MEASURE_JS = """
+async ({ repeat, typed, typeDelay, pagedRows }) => {
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+    const median = values => [...values].sort((a, b) => a - b)[Math.floor(values.length / 2)];
+    const timed = fn => {
+        const start = performance.now();
+        fn();
+        document.body.getBoundingClientRect();
+        return performance.now() - start;
+    };
+    const results = {};
+    const record = (name, mode, value) => { (results[name] = results[name] || {})[mode] = value; };
+
+    const virtualShowRows = window.showRows;
+    const copies = [];
+    const previousShowRows = (tableId, rows, renderRow) => {
+        const table = document.getElementById(tableId);
+        let copy = document.getElementById(`${tableId}-previous`);
+        if (!copy) {
+            const container = document.createElement('div');
+            container.className = 'table-container';
+            container.innerHTML = `<table class="data-table" id="${tableId}-previous">${table.tHead.outerHTML}<tbody></tbody></table>`;
+            table.parentElement.style.display = 'none';
+            table.parentElement.after(container);
+            copies.push(container);
+            copy = container.firstChild;
+        }
+        copy.tBodies[0].innerHTML = rows.map(row => `<tr>${renderRow(row)}</tr>`).join('');
+    };
+
+    for (const mode of ['previous', 'virtual']) {
+        window.showRows = mode === 'previous' ? previousShowRows : virtualShowRows;
+
+        switchView('activities');
+        record('render all activities (ms)', mode,
+               median(Array.from({ length: repeat }, () => timed(renderActivities))));
+        record('activity rows in the DOM', mode, mode === 'previous'
+            ? document.getElementById('activities-table-previous').tBodies[0].rows.length
+            : virtualTables['activities-table'].visible.size);
+
+        const type = document.getElementById('filter-act-type');
+        const filterTimes = [];
+        for (let i = 0; i < repeat; i++) {
+            type.value = 'email';
+            filterTimes.push(timed(renderActivities));
+            type.value = '';
+            renderActivities();
+        }
+        record('filter activities by type (ms)', mode, median(filterTimes));
+
+        // Typing: the previous search box re-rendered on every input event
+        switchView('contacts');
+        const search = document.getElementById('filter-con-search');
+        if (mode === 'previous') search.setAttribute('oninput', 'renderContacts()');
+        let renders = 0, busy = 0;
+        const render = window.showRows;
+        window.showRows = (...args) => {
+            renders++;
+            busy += timed(() => render(...args));
+        };
+        for (const char of typed) {
+            search.value += char;
+            search.dispatchEvent(new Event('input'));
+            await sleep(typeDelay);
+        }
+        await sleep(FILTER_DEBOUNCE_MS + 50);
+        record(`contact renders typing "${typed}"`, mode, renders);
+        record(`contact render time typing "${typed}" (ms)`, mode, busy);
+        window.showRows = render;
+        search.setAttribute('oninput', 'searchContacts()');
+        search.value = '';
+        renderContacts();
+
+        copies.splice(0).forEach(container => {
+            container.previousElementSibling.style.display = '';
+            container.remove();
+        });
+    }
+
+    // Scrolling the virtual table: the work done for each step of half a screen
+    switchView('activities');
+    const table = virtualTables['activities-table'];
+    const container = table.container;
+    const steps = [];
+    for (let top = 0; top < Math.min(container.scrollHeight, 2000 * table.rowHeight); top += container.clientHeight / 2) {
+        container.scrollTop = top;
+        steps.push(timed(() => table.render()));
+    }
+    record('scroll step, median (ms)', 'virtual', median(steps));
+    record('scroll step, max (ms)', 'virtual', Math.max(...steps));
+
+    // A server-paginated source: first page, then scrolling until pagedRows rows have loaded
+    let fetches = 0;
+    const fetchPage = window.fetch;
+    window.fetch = (...args) => { fetches++; return fetchPage(...args); };
+    const source = new PagedSource('activities', {}, 200);
+    const start = performance.now();
+    table.setSource(source, { scrollToTop: true });
+    while (source.pending || !source.length) await sleep(1);
+    document.body.getBoundingClientRect();
+    record('paged: first page shown (ms)', 'virtual', performance.now() - start);
+    while (source.length < pagedRows && source.hasMore) {
+        container.scrollTop = container.scrollHeight;
+        table.render();
+        while (source.pending) await sleep(1);
+    }
+    record(`paged: requests to load ${pagedRows} rows`, 'virtual', fetches);
+    window.fetch = fetchPage;
+    renderActivities();
+    return results;
+}
+"""
+
+
+def forward(client, route):
+    """Answer a browser request for ORIGIN through the Flask test client; block anything else."""
+    request = route.request
+    url = urlsplit(request.url)
+    if f'{url.scheme}://{url.netloc}' != ORIGIN:
+        return route.abort()
+    response = client.open(url.path, query_string=url.query, method=request.method,
+                           data=request.post_data_buffer, headers={'Content-Type': request.headers.get('content-type', '')})
+    route.fulfill(status=response.status_code, headers=dict(response.headers), body=response.get_data())
+
+
+def measure(browser, client, repeat, paged_rows=2000):
+    """{scenario: {'previous': value, 'virtual': value}} for the app behind client, measured in browser."""
+    page = browser.new_page(viewport={'width': 1440, 'height': 900})
+    try:
+        page.route('**/*', lambda route: forward(client, route))
+        page.goto(f'{ORIGIN}/')
+        page.wait_for_function('activities.length > 0 && contacts.length > 0', timeout=120_000)
+        return page.evaluate(MEASURE_JS, {
+            'repeat': repeat, 'typed': TYPED, 'typeDelay': TYPE_DELAY_MS, 'pagedRows': paged_rows
+        })
+    finally:
+        page.close()
+
+
+def format_value(value):
+    if value is None:
+        return '-'
+    return f'{value:.1f}' if isinstance(value, float) else f'{value:,}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--activities', type=int, default=50_000)
+    parser.add_argument('--contacts', type=int, default=10_000)
+    parser.add_argument('--paged-rows', type=int, default=2000, help='rows to page through with PagedSource')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        from playwright.sync_api import Error as PlaywrightError, sync_playwright
+    except ImportError:
+        sys.exit('Playwright is not installed: pip install playwright && python -m playwright install chromium')
+
+    path = os.path.join(tempfile.mkdtemp(prefix='crm-bench-tables-'), 'crm.db')
+    sizes = {**datagen.DEFAULT_SIZES, 'activities': args.activities,
+             'contacts_per_department': max(1, args.contacts // datagen.DEFAULT_SIZES['departments'])}
+    datagen.generate(f'sqlite:///{path}', seed=1, verbose=False, **sizes)
+
+    # app.py opens the database when imported, so configure it first
+    config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config.GEMINI_API_KEY = config.GEMINI_API_KEY or 'benchmark'
+    crm = importlib.import_module('app')
+    crm.init_database()
+    logging.getLogger('metrics').setLevel(logging.ERROR)
+    client = crm.app.test_client()
+
+    with sync_playwright() as playwright:
+        try:
+            browser = playwright.chromium.launch()
+        except PlaywrightError as error:
+            sys.exit(f'Could not start Chromium ({error.message.splitlines()[0]}): python -m playwright install chromium')
+        results = measure(browser, client, args.repeat, args.paged_rows)
+        browser.close()
+
+    print(f"{args.activities:,} activities, {sizes['contacts_per_department'] * sizes['departments']:,} contacts")
+    print(f"{'scenario':<44}{'previous':>12}{'virtual':>12}")
+    for name, values in results.items():
+        print(f"{name:<44}{format_value(values.get('previous')):>12}{format_value(values.get('virtual')):>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+import counters
+import integration_summary
+import tag_usage
+from models import Department, Application, IntegrationStatus, Contact
+
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def _to_str(value):
+    if not isinstance(value, str):
+        raise ValueError('must be a string')
+    return value
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        raise ValueError('must be an integer')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('must be an integer')
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, str)) and str(value).lower() in ('1', 'true', 'yes', '0', 'false', 'no'):
+        return str(value).lower() in ('1', 'true', 'yes')
+    raise ValueError('must be a boolean')
+
+
+def _to_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError('must be a date in YYYY-MM-DD format')
+
+
+def _to_auth_type(value):
+    # Same list-or-string handling as create_application
+    if isinstance(value, list):
+        return ','.join(_to_str(v) for v in value)
+    return _to_str(value)
+
+
+# Importable entities: tables written, field converters, required fields,
+# insert defaults, foreign keys that must reference existing rows, and the
+# entity type their tag categories are registered under.
+BULK_ENTITIES = {
+    'departments': {
+        'tables': ['departments'],
+        'model': Department,
+        'fields': {
+            'department_id': _to_int,
+            'name': _to_str,
+            'acronym': _to_str,
+            'tier': _to_str,
+            'status': _to_str,
+            'owner_team': _to_str,
+        },
+        'required': ['name'],
+        'defaults': {'tier': 'standard', 'status': 'active'},
+        'references': {},
+        'entity_type': 'department',
+    },
+    'applications': {
+        'tables': ['applications', 'integration_status'],
+        'model': Application,
+        'fields': {
+            'app_id': _to_int,
+            'department_id': _to_int,
+            'app_name': _to_str,
+            'environment': _to_str,
+            'auth_type': _to_auth_type,
+            'go_live_date': _to_date,
+            'status': _to_str,
+        },
+        'required': ['department_id', 'app_name'],
+        'defaults': {'environment': 'prod', 'auth_type': 'GC Key', 'status': 'integrating'},
+        'references': {'department_id': Department.department_id},
+        'entity_type': 'application',
+    },
+    'contacts': {
+        'tables': ['contacts'],
+        'model': Contact,
+        'fields': {
+            'contact_id': _to_int,
+            'department_id': _to_int,
+            'name': _to_str,
+            'role': _to_str,
+            'email': _to_str,
+            'phone': _to_str,
+            'active_flag': _to_bool,
+        },
+        'required': ['department_id', 'name'],
+        'defaults': {'active_flag': True},
+        'references': {'department_id': Department.department_id},
+        'entity_type': 'contact',
+    },
+}
+
+
+class InvalidRow:
+    """Placeholder for an input line that could not be parsed as JSON."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def iter_ndjson(stream):
+    """Yield one parsed object per non-blank line of an NDJSON stream."""
+    if isinstance(stream, io.RawIOBase):
+        # The WSGI request stream is unbuffered, so readline() would go byte by byte
+        stream = io.BufferedReader(stream, buffer_size=64 * 1024)
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidRow(f'Invalid JSON: {e}')
+
+
+def validate_row(spec, row):
+    """Convert a raw row into column values; returns (values, errors).
+
+    An explicit null is rejected for required and NOT NULL fields, on updates
+    as well as inserts; a null primary key means the row is new.
+    """
+    if isinstance(row, InvalidRow):
+        return None, [row.message]
+    if not isinstance(row, dict):
+        return None, ['Row must be a JSON object']
+
+    columns = spec['model'].__table__.c
+    values, errors = {}, []
+    for field, value in row.items():
+        convert = spec['fields'].get(field)
+        if convert is None:
+            errors.append(f'{field}: unknown field')
+        elif value is None:
+            column = columns[field]
+            if field in spec['required'] or not (column.nullable or column.primary_key):
+                errors.append(f'{field}: cannot be null')
+            else:
+                values[field] = None
+        else:
+            try:
+                values[field] = convert(value)
+            except ValueError as e:
+                errors.append(f'{field}: {e}')
+    return values, errors
+
+
+def missing_required(spec, values):
+    """Errors for required fields absent from a row that will be inserted."""
+    return [f'{field}: required' for field in spec['required'] if values.get(field) in (None, '')]
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _existing(session, column, values):
+    """Subset of values present in a column, in one IN query."""
+    values = {v for v in values if v is not None}
+    if not values:
+        return set()
+    return set(session.execute(select(column).where(column.in_(values))).scalars())
+
+
+def _upsert_chunk(session, spec, rows, existing_ids):
+    """Write one chunk of validated rows; returns {index: (status, id)}."""
+    model = spec['model']
+    table = model.__table__
+    pk = table.primary_key.columns.values()[0]
+    has_updated_at = 'updated_at' in table.c
+    outcomes = {}
+
+    # New rows without an id: multi-row INSERT ... RETURNING, in input order
+    new_rows = [(index, {**spec['defaults'], **values}) for index, values in rows if values.get(pk.key) is None]
+    for group in _group_by_keys(new_rows):
+        ids = session.execute(
+            insert(table).returning(pk, sort_by_parameter_order=True),
+            [values for _, values in group]
+        ).scalars().all()
+        for (index, _), new_id in zip(group, ids):
+            outcomes[index] = ('created', new_id)
+
+    # Rows with an id: complete rows are upserted on the primary key; partial rows
+    # can only be updates (INSERT would fail NOT NULL before reaching ON CONFLICT).
+    # An id repeated in the chunk is written in a later pass, after its earlier
+    # rows, and counts as an update.
+    passes = []
+    seen = set(existing_ids)
+    occurrences = {}
+    for index, values in rows:
+        row_id = values.get(pk.key)
+        if row_id is None:
+            continue
+        exists = row_id in seen
+        seen.add(row_id)
+        outcomes[index] = ('updated' if exists else 'created', row_id)
+        occurrence = occurrences.get(row_id, 0)
+        occurrences[row_id] = occurrence + 1
+        if occurrence == len(passes):
+            passes.append(([], []))
+        keyed_rows, partial_rows = passes[occurrence]
+        if missing_required(spec, values):
+            partial_rows.append((index, values))
+        else:
+            keyed_rows.append((index, values if exists else {**spec['defaults'], **values}))
+
+    for keyed_rows, partial_rows in passes:
+        for group in _group_by_keys(keyed_rows):
+            stmt = insert(table)
+            update_columns = {key: stmt.excluded[key] for key in group[0][1] if key != pk.key}
+            if has_updated_at:
+                update_columns['updated_at'] = datetime.utcnow()
+            stmt = stmt.on_conflict_do_update(index_elements=[pk], set_=update_columns)
+            session.execute(stmt, [values for _, values in group])
+
+        for group in _group_by_keys(partial_rows):
+            if len(group[0][1]) == 1:
+                continue  # only the id was supplied; nothing to change
+            session.execute(
+                update(table).where(pk == bindparam('_pk')),
+                [{**{key: value for key, value in values.items() if key != pk.key}, '_pk': values[pk.key]}
+                 for _, values in group]
+            )
+
+    # Every new application gets its initial integration status, as in create_application
+    if model is Application:
+        new_app_ids = [app_id for status, app_id in outcomes.values() if status == 'created']
+        if new_app_ids:
+            session.execute(
+                insert(IntegrationStatus.__table__).on_conflict_do_nothing(index_elements=['app_id']),
+                [{'app_id': app_id, 'stage': 'intake', 'status': 'on_track', 'risk_level': 'low'}
+                 for app_id in new_app_ids]
+            )
+
+    return outcomes
+
+
+def _derived_counts(session, model, ids, maintain_counters):
+    """Counter, tag usage and integration summary counts of some rows and their integrations."""
+    rows = [(model, model.__table__.primary_key.columns.values()[0].in_(ids))]
+    if model is Application:
+        rows.append((IntegrationStatus, IntegrationStatus.app_id.in_(ids)))
+    counter_counts, usage_counts = {}, {}
+    for row_model, condition in rows:
+        if maintain_counters:
+            counter_counts.update(counters.count_rows(session, row_model, condition))
+        usage_counts.update(tag_usage.count_rows(session, row_model, condition))
+    affected = {IntegrationStatus: set(), Application: set(), Department: set()}
+    if model in affected:
+        affected[model] = set(ids)
+    return counter_counts, usage_counts, integration_summary.count_affected(session, affected)
+
+
+def _refresh_derived(session, before, after):
+    """Apply the differences between two _derived_counts() to the maintained tables."""
+    connection = session.connection()
+    for module, old, new in zip((counters, tag_usage, integration_summary), before, after):
+        module.apply_deltas(connection, {key: new.get(key, 0) - old.get(key, 0) for key in set(old) | set(new)})
+
+
+def _group_by_keys(rows):
+    """Group rows by their key set so each executemany has a uniform parameter shape."""
+    groups = {}
+    for index, values in rows:
+        groups.setdefault(frozenset(values), []).append((index, values))
+    return list(groups.values())
+
+
+def bulk_upsert(session, entity, rows, chunk_size=1000, registry=None, maintain_counters=True):
+    """Validate and upsert rows in chunks, committing after each chunk.
+
+    When a tag registry is given, tag-backed fields must hold active tag values.
+    Core statements bypass the ORM flush listeners, so each chunk updates the
+    dashboard counters (unless maintain_counters is False), tag usage and
+    integration summary for the rows it wrote, in its own transaction.
+
+    Returns one result per input row, in input order:
+    {'index': n, 'status': 'created' | 'updated' | 'error', 'id': ..., 'errors': [...]}.
+    """
+    spec = BULK_ENTITIES[entity]
+    pk = spec['model'].__table__.primary_key.columns.values()[0]
+    results = []
+
+    for chunk in _chunks(enumerate(rows), chunk_size):
+        valid = []
+        errors_by_index = {}
+        for index, row in chunk:
+            values, errors = validate_row(spec, row)
+            if not errors and registry is not None:
+                errors = registry.validate(spec['entity_type'], values, session=session)
+            if errors:
+                errors_by_index[index] = errors
+            else:
+                valid.append((index, values))
+
+        # Foreign keys must point at existing rows
+        for field, column in spec['references'].items():
+            found = _existing(session, column, [values.get(field) for _, values in valid])
+            still_valid = []
+            for index, values in valid:
+                if values.get(field) is not None and values[field] not in found:
+                    errors_by_index[index] = [f'{field}: {values[field]} does not exist']
+                else:
+                    still_valid.append((index, values))
+            valid = still_valid
+
+        # Required fields only apply to rows that will be inserted, not to partial
+        # updates, including updates of a row created earlier in the chunk
+        existing_ids = _existing(session, pk, [values.get(pk.key) for _, values in valid])
+        known_ids = set(existing_ids)
+        still_valid = []
+        for index, values in valid:
+            errors = [] if values.get(pk.key) in known_ids else missing_required(spec, values)
+            if errors:
+                errors_by_index[index] = errors
+            else:
+                still_valid.append((index, values))
+                if values.get(pk.key) is not None:
+                    known_ids.add(values[pk.key])
+        valid = still_valid
+
+        outcomes = {}
+        if valid:
+            # Rows without an id are new, so only the supplied ids had counts before
+            supplied_ids = [values[pk.key] for _, values in valid if values.get(pk.key) is not None]
+            before = _derived_counts(session, spec['model'], supplied_ids, maintain_counters)
+            outcomes = _upsert_chunk(session, spec, valid, existing_ids)
+            written_ids = {row_id for _, row_id in outcomes.values()}
+            _refresh_derived(session, before, _derived_counts(session, spec['model'], written_ids, maintain_counters))
+        session.commit()
+
+        for index, _ in chunk:
+            if index in errors_by_index:
+                results.append({'index': index, 'status': 'error', 'errors': errors_by_index[index]})
+            else:
+                status, row_id = outcomes[index]
+                results.append({'index': index, 'status': status, pk.key: row_id})
+
+    return results
@@ -0,0 +1,202 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+# Model answers to standalone chat questions, reused when the same question is
+# asked again before the data changes. Questions are compared after
+# normalization (case, punctuation and polite filler removed); optionally a
+# question that reads almost the same as a cached one, by cosine similarity of
+# hashed word features, gets its answer too. The cache holds answers for one
+# data version at a time and empties when the version moves on.
+
+# Dropped before comparing questions; none of them changes what is asked
+FILLER = set('''
+a an the please pls can could would you tell me i want to know hi hey thanks thank
+'''.split())
+
+# Words that flip or narrow a question while reading almost the same; questions
+# that differ in any of them never match by similarity
+ANCHOR_WORDS = set('''
+not no without except never none only most least top bottom latest oldest newest earliest
+first last highest lowest more less fewer before after over under above below
+'''.split())
+
+DIMENSIONS = 1024
+
+
+def _words(text):
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+
+def normalize(question):
+    """The question's words, lowercase and without punctuation or filler."""
+    return ' '.join(word for word in _words(question) if word not in FILLER)
+
+
+def _stem(word):
+    # Crude, but enough for "integration"/"integrations" and "blocked"/"block"
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix) and not word.endswith('ss'):
+            return word[:-len(suffix)]
+    return word
+
+
+def embed(normalized):
+    """Unit vector {bucket: weight} of hashed word stems and word pairs."""
+    stems = [_stem(word) for word in normalized.split()]
+    features = [(stem, 1.0) for stem in stems]
+    features += [(f'{a} {b}', 0.5) for a, b in zip(stems, stems[1:])]
+    vector = {}
+    for feature, weight in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+        bucket = digest % DIMENSIONS
+        sign = 1.0 if digest >> 63 else -1.0
+        vector[bucket] = vector.get(bucket, 0.0) + sign * weight
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {bucket: weight / norm for bucket, weight in vector.items() if weight} if norm else {}
+
+
+def similarity(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
+
+
+def anchors(normalized, terms=frozenset()):
+    """Numbers and ANCHOR_WORDS in the question, plus the caller's key terms for it."""
+    words = normalized.split()
+    return frozenset(terms) | {word for word in words if word in ANCHOR_WORDS or word.isdigit()}
+
+
+class CachedAnswer:
+    __slots__ = ('question', 'answer', 'vector', 'anchors', 'stored_at')
+
+    def __init__(self, question, answer, vector, anchors):
+        self.question = question
+        self.answer = answer
+        self.vector = vector
+        self.anchors = anchors
+        self.stored_at = time.monotonic()
+
+
+class AnswerCache:
+    """LRU cache of chat answers for the current data version, bounded by entry count and age.
+
+    get() and put() take the data version the answer depends on; a different
+    version than the cache holds empties it. With a similarity threshold
+    (0 to 1, 0 is exact matches only), a miss is retried against the cached
+    questions with the same anchors, and the closest at or above the threshold
+    is returned.
+    """
+
+    def __init__(self, max_entries=500, ttl=3600, threshold=0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._version = None
+        self._entries = OrderedDict()
+        self._by_anchors = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, question, version, terms=frozenset()):
+        """The cached answer to question at this data version, or None."""
+        key = normalize(question)
+        with self._lock:
+            self._advance(version)
+            entry = self._live(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer
+            if self.threshold > 0:
+                entry = self._similar(key, anchors(key, terms))
+                if entry is not None:
+                    self._entries.move_to_end(entry.question)
+                    self.similar_hits += 1
+                    return entry.answer
+            self.misses += 1
+            return None
+
+    def put(self, question, answer, version, terms=frozenset()):
+        if not answer or self.max_entries <= 0:
+            return
+        key = normalize(question)
+        if not key:
+            return
+        entry = CachedAnswer(key, answer, embed(key) if self.threshold > 0 else None, anchors(key, terms))
+        with self._lock:
+            self._advance(version)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._by_anchors.setdefault(entry.anchors, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_anchors.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'similar_hits': self.similar_hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.similar_hits) / lookups, 4) if lookups else None,
+            }
+
+    def _advance(self, version):
+        if version == self._version:
+            return
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._by_anchors.clear()
+        self._version = version
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry.stored_at >= self.ttl:
+            self._remove(key)
+            return None
+        return entry
+
+    def _similar(self, key, question_anchors):
+        candidates = self._by_anchors.get(question_anchors)
+        if not candidates:
+            return None
+        vector = embed(key)
+        best, best_score = None, self.threshold
+        for candidate in list(candidates):
+            entry = self._live(candidate)
+            if entry is None:
+                continue
+            score = similarity(vector, entry.vector)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        keys = self._by_anchors.get(entry.anchors)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_anchors[entry.anchors]
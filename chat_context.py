@@ -0,0 +1,319 @@
+import re
+import threading
+import time
+
+from sqlalchemy import select, func, desc
+
+import versions
+from models import Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident, IntegrationSummary
+
+
+# Tables the chat context reads; their versions key the cache
+CONTEXT_TABLES = (
+    'departments', 'applications', 'integration_status',
+    'contacts', 'engagement_activities', 'incidents'
+)
+
+# Compact tables: (section, columns) in the order they are rendered.
+# Rows reference departments and applications by id, so each name appears once.
+SECTIONS = {
+    'departments': (
+        ('id', Department.department_id),
+        ('acronym', Department.acronym),
+        ('name', Department.name),
+        ('tier', Department.tier),
+        ('status', Department.status),
+        ('owner_team', Department.owner_team),
+    ),
+    'applications': (
+        ('id', Application.app_id),
+        ('dept', Application.department_id),
+        ('name', Application.app_name),
+        ('env', Application.environment),
+        ('auth', Application.auth_type),
+        ('status', Application.status),
+        ('go_live', Application.go_live_date),
+    ),
+    'integrations': (
+        ('app', IntegrationStatus.app_id),
+        ('stage', IntegrationStatus.stage),
+        ('status', IntegrationStatus.status),
+        ('risk', IntegrationStatus.risk_level),
+        ('updated', IntegrationStatus.last_updated),
+        ('notes', IntegrationStatus.notes),
+    ),
+    'pipeline': (
+        ('tier', IntegrationSummary.tier),
+        ('stage', IntegrationSummary.stage),
+        ('status', IntegrationSummary.status),
+        ('risk', IntegrationSummary.risk_level),
+        ('count', IntegrationSummary.count),
+    ),
+    'contacts': (
+        ('dept', Contact.department_id),
+        ('name', Contact.name),
+        ('role', Contact.role),
+        ('email', Contact.email),
+        ('phone', Contact.phone),
+        ('active', Contact.active_flag),
+    ),
+    'incidents': (
+        ('id', Incident.incident_id),
+        ('app', Incident.app_id),
+        ('severity', Incident.severity),
+        ('status', Incident.status),
+        ('created', Incident.created_at),
+        ('resolved', Incident.resolved_at),
+        ('description', Incident.description),
+        ('root_cause', Incident.root_cause),
+    ),
+    'recent_activities': (
+        ('date', EngagementActivity.date),
+        ('dept', EngagementActivity.department_id),
+        ('app', EngagementActivity.app_id),
+        ('type', EngagementActivity.type),
+        ('summary', EngagementActivity.summary),
+        ('next_action', EngagementActivity.next_action),
+        ('owner', EngagementActivity.owner),
+    ),
+}
+
+SECTION_ORDER = {
+    'departments': (Department.name,),
+    'applications': (Application.app_name,),
+    'integrations': (IntegrationStatus.app_id,),
+    'pipeline': (IntegrationSummary.tier, IntegrationSummary.stage, IntegrationSummary.status,
+                 IntegrationSummary.risk_level),
+    'contacts': (Contact.department_id, Contact.name),
+    'incidents': (desc(Incident.created_at),),
+    'recent_activities': (desc(EngagementActivity.date),),
+}
+
+RECENT_ACTIVITY_LIMIT = 20
+
+# Sections included with every question (see render_shared); the rest are chosen per question
+SHARED_SECTIONS = ('departments', 'applications', 'pipeline')
+
+# Words that make a section relevant to a question
+SECTION_KEYWORDS = {
+    'applications': ('app', 'application', 'system', 'service', 'live', 'deprecated', 'auth',
+                     'gc key', 'interact', 'consolidator', 'environment', 'prod', 'go-live', 'go live'),
+    'integrations': ('integration', 'stage', 'risk', 'blocked', 'delayed', 'on track', 'intake',
+                     'design', 'implementation', 'testing', 'production', 'progress'),
+    'pipeline': ('integration', 'stage', 'risk', 'blocked', 'delayed', 'pipeline', 'funnel', 'tier',
+                 'critical', 'progress'),
+    'contacts': ('contact', 'email', 'phone', 'who', 'person', 'people', 'technical',
+                 'business', 'security', 'reach'),
+    'incidents': ('incident', 'outage', 'issue', 'severity', 'root cause', 'problem', 'failure', 'open'),
+    'recent_activities': ('activit', 'meeting', 'email', 'workshop', 'engagement', 'next action',
+                          'follow', 'recent', 'last'),
+}
+
+# Columns summarized as value counts in the stats block. Integration breakdowns
+# are summed from the maintained summary table rather than counted.
+STAT_COLUMNS = (
+    ('departments.tier', Department.tier),
+    ('departments.status', Department.status),
+    ('applications.status', Application.status),
+    ('applications.environment', Application.environment),
+    ('integrations.stage', IntegrationSummary.stage),
+    ('integrations.status', IntegrationSummary.status),
+    ('integrations.risk_level', IntegrationSummary.risk_level),
+    ('incidents.status', Incident.status),
+    ('incidents.severity', Incident.severity),
+    ('contacts.role', Contact.role),
+    ('activities.type', EngagementActivity.type),
+)
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'y' if value else 'n'
+    if hasattr(value, 'isoformat'):
+        # Dates are enough for the model; drop time-of-day noise
+        return value.isoformat()[:10]
+    # Keep one row per line and the column separator unambiguous
+    return str(value).replace('\n', ' ').replace('|', '/')
+
+
+class ContextSnapshot:
+    """Immutable, pre-formatted view of the CRM data at one data version."""
+
+    def __init__(self, version, stats, rows, build_seconds):
+        self.version = version
+        self.stats = stats
+        self.rows = rows  # section -> list of tuples of formatted values
+        self.build_seconds = build_seconds
+        self.built_at = time.monotonic()
+        self.departments = {row[0]: row for row in rows['departments']}
+        self.applications = {row[0]: row for row in rows['applications']}
+
+
+def build_snapshot(session, version):
+    """Load every section with column-only Core queries and summarize it."""
+    started = time.perf_counter()
+
+    rows = {}
+    for section, columns in SECTIONS.items():
+        query = select(*[column for _, column in columns]).order_by(*SECTION_ORDER[section])
+        if section == 'recent_activities':
+            query = query.limit(RECENT_ACTIVITY_LIMIT)
+        elif section == 'pipeline':
+            query = query.where(IntegrationSummary.count > 0)
+        rows[section] = [tuple(_format_value(v) for v in row) for row in session.execute(query)]
+
+    stats = {}
+    for name, column in STAT_COLUMNS:
+        count = func.sum(IntegrationSummary.count) if column.class_ is IntegrationSummary else func.count()
+        counts = session.execute(select(column, count).group_by(column)).all()
+        stats[name] = {(value if value not in (None, '') else 'none'): n for value, n in counts if n}
+    stats['contacts.active'] = session.execute(
+        select(func.count()).where(Contact.active_flag.is_(True))
+    ).scalar()
+    stats['activities.total'] = session.execute(
+        select(func.count()).select_from(EngagementActivity)
+    ).scalar()
+
+    return ContextSnapshot(version, stats, rows, time.perf_counter() - started)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _is_fresh(snapshot, version, ttl):
+    if snapshot is None or snapshot.version != version:
+        return False
+    return ttl is None or time.monotonic() - snapshot.built_at < ttl
+
+
+def get_snapshot(session, ttl=None):
+    """Return the cached snapshot, rebuilding it when any context table changed.
+
+    ttl bounds how long a snapshot is reused, covering writes made by other
+    processes that this process's table versions cannot see.
+    """
+    global _snapshot
+    version = versions.snapshot(CONTEXT_TABLES)
+    if _is_fresh(_snapshot, version, ttl):
+        return _snapshot
+    with _snapshot_lock:
+        # Another thread may have rebuilt it while we waited
+        if not _is_fresh(_snapshot, version, ttl):
+            _snapshot = build_snapshot(session, version)
+        return _snapshot
+
+
+def invalidate():
+    """Drop the cached snapshot."""
+    global _snapshot
+    _snapshot = None
+
+
+# ==================== RELEVANCE ====================
+
+def _words(text):
+    return set(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+# Shorter names match too many ordinary words to be useful
+MIN_NAME_LENGTH = 3
+
+
+def _mentions(lowered, name):
+    """Whether a name appears in the text as a whole word or phrase."""
+    if len(name) < MIN_NAME_LENGTH or name not in lowered:
+        return False
+    return re.search(rf'(?<![a-z0-9]){re.escape(name)}(?![a-z0-9])', lowered) is not None
+
+
+def match_entities(snapshot, text):
+    """Department and application ids mentioned by acronym or name in the text."""
+    lowered = text.lower()
+    words = _words(text)
+    department_ids = set()
+    for dept_id, row in snapshot.departments.items():
+        acronym, name = row[1].lower(), row[2].lower()
+        if (len(acronym) >= 2 and acronym in words) or _mentions(lowered, name):
+            department_ids.add(dept_id)
+    app_ids = {app_id for app_id, row in snapshot.applications.items() if _mentions(lowered, row[2].lower())}
+    return department_ids, app_ids
+
+
+def relevant_sections(text):
+    """Sections whose keywords appear in the text."""
+    lowered = text.lower()
+    return {section for section, keywords in SECTION_KEYWORDS.items()
+            if any(keyword in lowered for keyword in keywords)}
+
+
+def _select_rows(snapshot, section, department_ids, app_ids):
+    rows = snapshot.rows[section]
+    if not department_ids and not app_ids:
+        return rows
+    # Scope widens both ways: a named department brings its applications,
+    # a named application brings its department
+    scoped_depts = set(department_ids) | {snapshot.applications[a][1] for a in app_ids}
+    scoped_apps = set(app_ids) | {app_id for app_id, row in snapshot.applications.items()
+                                  if row[1] in department_ids}
+    if section == 'departments':
+        return [row for row in rows if row[0] in scoped_depts]
+    if section in ('applications', 'integrations'):
+        return [row for row in rows if row[0] in scoped_apps]
+    if section == 'incidents':
+        return [row for row in rows if row[1] in scoped_apps]
+    if section == 'contacts':
+        return [row for row in rows if row[0] in scoped_depts]
+    if section == 'recent_activities':
+        return [row for row in rows if row[1] in scoped_depts or row[2] in scoped_apps]
+    return rows
+
+
+def _render_stats(snapshot):
+    lines = ['## stats']
+    for name, value in snapshot.stats.items():
+        if isinstance(value, dict):
+            value = ','.join(f'{key}={count}' for key, count in value.items())
+        lines.append(f'{name}: {value}')
+    return lines
+
+
+def _render_sections(snapshot, sections, department_ids, app_ids, max_rows):
+    lines = []
+    for section, columns in SECTIONS.items():
+        if section not in sections:
+            continue
+        rows = _select_rows(snapshot, section, department_ids, app_ids)
+        header = '|'.join(name for name, _ in columns)
+        lines.append(f'## {section} ({header})')
+        lines.extend('|'.join(row) for row in rows[:max_rows])
+        if len(rows) > max_rows:
+            lines.append(f'... {len(rows) - max_rows} more rows omitted')
+    return lines
+
+
+def render_shared(snapshot, max_rows=200):
+    """The part of the context every question gets: the stats block and SHARED_SECTIONS.
+
+    It depends only on the snapshot, so a conversation can keep it as a fixed
+    prefix; render_focus() adds the rest per question.
+    """
+    lines = _render_stats(snapshot)
+    lines.extend(_render_sections(snapshot, set(SHARED_SECTIONS), set(), set(), max_rows))
+    return '\n'.join(lines)
+
+
+def render_focus(snapshot, question, max_rows=200):
+    """The sections and rows relevant to a question beyond render_shared(), or '' if there are none.
+
+    Sections the shared context already holds are left out, except that named
+    departments and applications are repeated when their table was capped.
+    """
+    department_ids, app_ids = match_entities(snapshot, question)
+    sections = (relevant_sections(question) or set(SECTIONS)) - set(SHARED_SECTIONS)
+    if department_ids or app_ids:
+        sections.update(section for section in ('departments', 'applications')
+                        if len(snapshot.rows[section]) > max_rows)
+    return '\n'.join(_render_sections(snapshot, sections, department_ids, app_ids, max_rows))
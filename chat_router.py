@@ -0,0 +1,535 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import select, func, desc
+
+from chat_context import match_entities
+from models import Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident
+
+logger = logging.getLogger(__name__)
+
+
+# Answers common chat questions (counts, breakdowns, charts and short lists of one
+# entity, filtered by field values and named departments or applications) with SQL
+# instead of a model call. A question is answered only when every word in it is
+# understood; anything else, including follow-ups like "what about their
+# contacts?", falls through to the model.
+
+# A column questions can filter or group by. stat names the context snapshot
+# stats entry listing its values; values maps words to values for the rest.
+Field = namedtuple('Field', 'name label column words stat values', defaults=(None, None))
+
+# join: (target, onclause) pairs every query adds; department and app are the
+# columns named departments and applications are matched against
+Entity = namedtuple('Entity', 'name singular tag_type model words fields join department app order')
+
+ENTITIES = {
+    'departments': Entity(
+        'departments', 'department', 'department', Department, ('department', 'departments', 'dept', 'depts'),
+        (
+            Field('tier', 'tier', Department.tier, ('tier', 'tiers'), 'departments.tier'),
+            Field('status', 'status', Department.status, ('status', 'statuses'), 'departments.status'),
+            Field('owner_team', 'owner team', Department.owner_team, ('owner team', 'owner teams', 'team', 'teams')),
+        ),
+        (), Department.department_id, None, (Department.name,),
+    ),
+    'applications': Entity(
+        'applications', 'application', 'application', Application,
+        ('application', 'applications', 'app', 'apps', 'system', 'systems'),
+        (
+            Field('status', 'status', Application.status, ('status', 'statuses'), 'applications.status'),
+            Field('environment', 'environment', Application.environment,
+                  ('environment', 'environments', 'env'), 'applications.environment'),
+            Field('department', 'department', Department.name, ('department', 'departments')),
+        ),
+        ((Department, Application.department_id == Department.department_id),),
+        Application.department_id, Application.app_id, (Application.app_name,),
+    ),
+    'integrations': Entity(
+        'integrations', 'integration', 'integration', IntegrationStatus, ('integration', 'integrations'),
+        (
+            Field('stage', 'stage', IntegrationStatus.stage, ('stage', 'stages'), 'integrations.stage'),
+            Field('status', 'status', IntegrationStatus.status, ('status', 'statuses'), 'integrations.status'),
+            Field('risk_level', 'risk level', IntegrationStatus.risk_level,
+                  ('risk', 'risks', 'risk level', 'risk levels'), 'integrations.risk_level'),
+            Field('department', 'department', Department.name, ('department', 'departments')),
+        ),
+        ((Application, IntegrationStatus.app_id == Application.app_id),
+         (Department, Application.department_id == Department.department_id)),
+        Application.department_id, IntegrationStatus.app_id, (Application.app_name,),
+    ),
+    'incidents': Entity(
+        'incidents', 'incident', 'incident', Incident, ('incident', 'incidents'),
+        (
+            Field('severity', 'severity', Incident.severity, ('severity', 'severities'), 'incidents.severity'),
+            Field('status', 'status', Incident.status, ('status', 'statuses'), 'incidents.status'),
+            Field('application', 'application', Application.app_name, ('application', 'applications', 'app', 'apps')),
+            Field('department', 'department', Department.name, ('department', 'departments')),
+        ),
+        ((Application, Incident.app_id == Application.app_id),
+         (Department, Application.department_id == Department.department_id)),
+        Application.department_id, Incident.app_id, (desc(Incident.created_at),),
+    ),
+    'contacts': Entity(
+        'contacts', 'contact', 'contact', Contact, ('contact', 'contacts', 'person', 'people'),
+        (
+            Field('role', 'role', Contact.role, ('role', 'roles'), 'contacts.role'),
+            Field('active', 'active', Contact.active_flag, (), values={'active': True, 'inactive': False}),
+            Field('department', 'department', Department.name, ('department', 'departments')),
+        ),
+        ((Department, Contact.department_id == Department.department_id),),
+        Contact.department_id, None, (Department.name, Contact.name),
+    ),
+    'activities': Entity(
+        'activities', 'activity', 'activity', EngagementActivity,
+        ('activity', 'activities', 'engagement', 'engagements'),
+        (
+            Field('type', 'type', EngagementActivity.type, ('type', 'types'), 'activities.type'),
+            Field('owner', 'owner', EngagementActivity.owner, ('owner', 'owners')),
+            Field('department', 'department', Department.name, ('department', 'departments')),
+        ),
+        ((Department, EngagementActivity.department_id == Department.department_id),),
+        EngagementActivity.department_id, EngagementActivity.app_id, (desc(EngagementActivity.date),),
+    ),
+}
+
+# Row columns shown when listing each entity: (label, column)
+LIST_COLUMNS = {
+    'departments': ((None, Department.name), ('acronym', Department.acronym), ('tier', Department.tier),
+                    ('status', Department.status), ('owner team', Department.owner_team)),
+    'applications': ((None, Application.app_name), ('department', Department.name), ('status', Application.status),
+                     ('environment', Application.environment), ('auth', Application.auth_type)),
+    'integrations': ((None, Application.app_name), ('department', Department.name), ('stage', IntegrationStatus.stage),
+                     ('status', IntegrationStatus.status), ('risk', IntegrationStatus.risk_level)),
+    'incidents': ((None, Incident.description), ('application', Application.app_name),
+                  ('severity', Incident.severity), ('status', Incident.status), ('created', Incident.created_at)),
+    'contacts': ((None, Contact.name), ('department', Department.name), ('role', Contact.role),
+                 ('email', Contact.email), ('phone', Contact.phone)),
+    'activities': ((None, EngagementActivity.summary), ('department', Department.name),
+                   ('type', EngagementActivity.type), ('date', EngagementActivity.date),
+                   ('owner', EngagementActivity.owner)),
+}
+
+LIST_LIMIT = 20
+GROUP_LIMIT = 20
+LIST_TEXT_LENGTH = 100
+
+INTENT_WORDS = {
+    ('how', 'many'): 'count', ('number', 'of'): 'count', ('count',): 'count', ('total',): 'count',
+    ('breakdown',): 'breakdown', ('broken', 'down'): 'breakdown', ('distribution',): 'breakdown',
+    ('split',): 'breakdown',
+    ('chart',): 'chart', ('charts',): 'chart', ('graph',): 'chart', ('plot',): 'chart',
+    ('visualize',): 'chart', ('visualise',): 'chart', ('visualization',): 'chart', ('visualisation',): 'chart',
+}
+CHART_TYPES = {'bar': 'bar', 'pie': 'pie', 'doughnut': 'doughnut', 'donut': 'doughnut', 'line': 'line'}
+GROUP_WORDS = {'by', 'per', 'each', 'across'}
+
+# Words that carry no meaning for these questions. Words that narrow a question in
+# ways the router cannot express (time: "recent", "latest", "now"; earlier turns:
+# "those", "that"; the asker: "my") are left out, so such questions go to the model
+# instead of being answered over every row.
+STOPWORDS = set('''
+a all an and any are as at be can create display do does draw exist exists for from
+generate get give has have i in is it list make me of on our please show
+tell the there to us we what whats which who with you
+'''.split())
+
+# Used for chart slices without a tag color
+PALETTE = ('#26374A', '#E8112D', '#27AE60', '#3498DB', '#F39C12',
+           '#9B59B6', '#1ABC9C', '#E74C3C', '#2C3E50', '#95A5A6')
+
+Query = namedtuple('Query', 'entity intent filters group chart_type department_ids app_ids')
+
+
+# ==================== PARSING ====================
+
+def _words(text):
+    return tuple(re.findall(r'[a-z0-9]+', text.lower().replace('_', ' ')))
+
+
+def _plural(words):
+    return words[:-1] + (words[-1] + 's',) if not words[-1].endswith('s') else words
+
+
+def _tag(entity, field, value, registry):
+    """The tag for a field value (label, color and sort order), if the field is tag-backed."""
+    category = registry.category_for(entity.tag_type, field.name) if registry else None
+    return registry.tag(category, value) if category and value is not None else None
+
+
+def _field_values(entity, field, snapshot, registry):
+    """{words: value} for the values a field can be asked about."""
+    if field.values is not None:
+        return {_words(word): value for word, value in field.values.items()}
+    if field.stat is None:
+        return {}
+    values = {}
+    for value in snapshot.stats.get(field.stat, {}):
+        if value == 'none':
+            continue
+        names = {_words(value)}
+        tag = _tag(entity, field, value, registry)
+        if tag and tag.get('label'):
+            names.add(_words(tag['label']))
+        for words in names:
+            values[words] = value
+            values[_plural(words)] = value
+    return values
+
+
+def build_vocabulary(snapshot, registry=None):
+    """{phrase (a tuple of words): [meaning, ...]} for every entity."""
+    vocabulary = {}
+
+    def add(words, meaning):
+        if words:
+            vocabulary.setdefault(words, []).append(meaning)
+
+    for phrase, intent in INTENT_WORDS.items():
+        add(phrase, ('intent', intent))
+    for word, chart_type in CHART_TYPES.items():
+        add((word,), ('chart_type', chart_type))
+        add((word, 'chart'), ('chart_type', chart_type))
+    for word in GROUP_WORDS:
+        add((word,), ('group',))
+    add(('or',), ('or',))
+
+    for entity in ENTITIES.values():
+        for word in entity.words:
+            add(_words(word), ('entity', entity.name))
+        for field in entity.fields:
+            field_words = [_words(word) for word in field.words]
+            for words in field_words:
+                add(words, ('field', entity.name, field))
+            # "high", "high risk", "high-risk" and "risk level high" all mean risk_level = high
+            for value_words, value in _field_values(entity, field, snapshot, registry).items():
+                add(value_words, ('value', entity.name, field, value))
+                for words in field_words:
+                    add(value_words + words, ('value', entity.name, field, value))
+                    add(words + value_words, ('value', entity.name, field, value))
+    return vocabulary
+
+
+def _meaning_for(meanings, entity):
+    """The meaning a phrase has for an entity: a value, a field or the entity itself, in that order."""
+    for kind in ('value', 'field', 'entity'):
+        for meaning in meanings:
+            if meaning[0] == kind and meaning[1] == entity:
+                return meaning
+    for meaning in meanings:
+        if meaning[0] not in ('value', 'field', 'entity'):
+            return meaning
+    return None
+
+
+def _strip_names(text, snapshot, department_ids, app_ids):
+    """Remove the named departments and applications from the text."""
+    names = [snapshot.departments[i][1] for i in department_ids] + [snapshot.departments[i][2] for i in department_ids]
+    names += [snapshot.applications[i][2] for i in app_ids]
+    lowered = text.lower()
+    for name in sorted(names, key=len, reverse=True):
+        if name:
+            lowered = re.sub(rf'(?<![a-z0-9]){re.escape(name.lower())}(?![a-z0-9])', ' ', lowered)
+    return lowered
+
+
+def parse(question, snapshot, vocabulary):
+    """The Query a question asks for, or None if any part of it is not understood."""
+    department_ids, app_ids = match_entities(snapshot, question)
+    words = _words(_strip_names(question, snapshot, department_ids, app_ids))
+
+    # Longest known phrase at each position; unknown words end the attempt
+    phrases = []
+    position = 0
+    longest = max(len(phrase) for phrase in vocabulary)
+    while position < len(words):
+        for size in range(min(longest, len(words) - position), 0, -1):
+            phrase = words[position:position + size]
+            if phrase in vocabulary:
+                phrases.append(vocabulary[phrase])
+                position += size
+                break
+        else:
+            if words[position] not in STOPWORDS:
+                return None
+            position += 1
+
+    # The question is about the one entity every phrase makes sense for; without
+    # an entity word ("how many meetings"), the values must point to just one
+    candidates = {meaning[1] for meanings in phrases for meaning in meanings if meaning[0] == 'entity'}
+    candidates = candidates or set(ENTITIES)
+    fitting = [entity for entity in candidates
+               if all(_meaning_for(meanings, entity) for meanings in phrases)]
+    if len(fitting) != 1:
+        return None
+    entity = fitting[0]
+
+    intents, filters, group, bare, chart_type, alternatives = set(), {}, [], [], None, False
+    expect_group = False
+    for meanings in phrases:
+        # A word that is a value of two fields (e.g. a status and a stage) is ambiguous
+        if len({m[2].name for m in meanings if m[0] == 'value' and m[1] == entity}) > 1:
+            return None
+        meaning = _meaning_for(meanings, entity)
+        kind = meaning[0]
+        if expect_group and kind != 'field':
+            return None
+        if kind == 'value':
+            field = meaning[2]
+            filters.setdefault(field.name, (field, []))[1].append(meaning[3])
+        elif kind == 'field':
+            (group if expect_group else bare).append(meaning[2])
+        elif kind == 'intent':
+            intents.add(meaning[1])
+        elif kind == 'chart_type':
+            intents.add('chart')
+            chart_type = meaning[1]
+        elif kind == 'or':
+            alternatives = True
+        expect_group = kind == 'group'
+    if expect_group:
+        return None
+
+    # "A or B" only within one field; across fields it is ambiguous
+    if alternatives and len(filters) > 1:
+        return None
+    if len(filters) > 1 and any(len(values) > 1 for _, values in filters.values()):
+        return None
+
+    # A field mentioned on its own is what a chart or breakdown is grouped by
+    if bare:
+        if group or not intents & {'chart', 'breakdown'}:
+            return None
+        group = bare
+    if len(group) > 1:
+        return None
+
+    if 'chart' in intents:
+        intent = 'chart'
+    elif intents & {'count', 'breakdown'} or group:
+        intent = 'count'
+    else:
+        intent = 'list'
+    if intent == 'chart' and not group or 'breakdown' in intents and not group:
+        return None
+
+    return Query(ENTITIES[entity], intent, filters, group[0] if group else None, chart_type or 'bar',
+                 {int(i) for i in department_ids}, {int(i) for i in app_ids})
+
+
+def key_terms(question, snapshot, vocabulary):
+    """What a question names: departments, applications, and known entities, fields, values and intents.
+
+    Unknown words are skipped, so this works on any question. Two questions with
+    different key terms are about different things however alike they read.
+    """
+    department_ids, app_ids = match_entities(snapshot, question)
+    words = _words(_strip_names(question, snapshot, department_ids, app_ids))
+    terms = {('department', i) for i in department_ids} | {('application', i) for i in app_ids}
+    position = 0
+    longest = max(len(phrase) for phrase in vocabulary)
+    while position < len(words):
+        for size in range(min(longest, len(words) - position), 0, -1):
+            meanings = vocabulary.get(words[position:position + size])
+            if meanings:
+                for meaning in meanings:
+                    if meaning[0] in ('value', 'field'):
+                        terms.add(meaning[:2] + (meaning[2].name,) + meaning[3:])
+                    elif meaning[0] in ('entity', 'intent', 'chart_type'):
+                        terms.add(meaning)
+                position += size
+                break
+        else:
+            position += 1
+    return frozenset(terms)
+
+
+# ==================== ANSWERS ====================
+
+def _select(query, *columns):
+    statement = select(*columns).select_from(query.entity.model)
+    for target, onclause in query.entity.join:
+        statement = statement.join(target, onclause)
+    for field, values in query.filters.values():
+        statement = statement.where(field.column.in_(values))
+    entity = query.entity
+    if query.app_ids and entity.app is not None:
+        statement = statement.where(entity.app.in_(query.app_ids))
+    elif query.app_ids:
+        statement = statement.where(entity.department.in_(
+            select(Application.department_id).where(Application.app_id.in_(query.app_ids))
+        ))
+    if query.department_ids:
+        statement = statement.where(entity.department.in_(query.department_ids))
+    return statement
+
+
+def _value_word(field, value):
+    if field.values is not None:
+        return next(word for word, v in field.values.items() if v == value)
+    return str(value).replace('_', ' ')
+
+
+def _label(entity, field, value, registry):
+    """Display label of a field value: its tag label, or the value (names as they are)."""
+    if value in (None, ''):
+        return 'None'
+    tag = _tag(entity, field, value, registry)
+    if tag:
+        return tag['label']
+    return _value_word(field, value).title() if field.stat or field.values else str(value)
+
+
+def describe(query, snapshot, count=None):
+    """E.g. "integrations with risk level high for CRA"."""
+    noun = query.entity.singular if count == 1 else query.entity.name
+    conditions = [f"{field.label} {' or '.join(_value_word(field, value) for value in values)}"
+                  for field, values in query.filters.values() if field.values is None]
+    # Yes/no fields read as adjectives: "active contacts"
+    adjectives = [_value_word(field, values[0]) for field, values in query.filters.values() if field.values is not None]
+    text = ' '.join(adjectives + [noun])
+    if conditions:
+        text += ' with ' + ' and '.join(conditions)
+    names = [snapshot.departments[str(i)][1] or snapshot.departments[str(i)][2] for i in sorted(query.department_ids)]
+    names += [snapshot.applications[str(i)][2] for i in sorted(query.app_ids)]
+    if names:
+        text += ' for ' + ', '.join(names)
+    return text
+
+
+def answer_count(session, query, snapshot, registry):
+    total = session.execute(_select(query, func.count())).scalar()
+    if query.group is None:
+        verb = 'is' if total == 1 else 'are'
+        return f'There {verb} **{total:,}** {describe(query, snapshot, total)}.'
+
+    groups = group_counts(session, query, registry)
+    lines = [f'**{total:,}** {describe(query, snapshot, total)} in total, by {query.group.label}:']
+    lines += [f'- {label}: {count:,}' for label, count, _ in groups]
+    return '\n'.join(lines)
+
+
+def group_counts(session, query, registry):
+    """[(label, count, tag or None)] for the query's group field, in tag order where it has tags."""
+    column = query.group.column
+    rows = session.execute(
+        _select(query, column, func.count()).group_by(column).order_by(desc(func.count()))
+    ).all()
+    entity, field = query.entity, query.group
+    groups = [(_label(entity, field, value, registry), count, _tag(entity, field, value, registry))
+              for value, count in rows[:GROUP_LIMIT]]
+    if all(tag is not None for _, _, tag in groups):
+        groups.sort(key=lambda group: group[2]['sort_order'] or 0)
+    if len(rows) > GROUP_LIMIT:
+        groups.append(('Other', sum(count for _, count in rows[GROUP_LIMIT:]), None))
+    return groups
+
+
+def answer_chart(session, query, snapshot, registry):
+    groups = group_counts(session, query, registry)
+    total = sum(count for _, count, _ in groups)
+    title = f'{query.entity.name.title()} by {query.group.label.title()}'
+    chart = {
+        'type': query.chart_type,
+        'title': title,
+        'labels': [label for label, _, _ in groups],
+        'datasets': [{
+            'label': 'Count',
+            'data': [count for _, count, _ in groups],
+            'backgroundColor': [
+                tag['color'] if tag and tag.get('color') else PALETTE[i % len(PALETTE)]
+                for i, (_, _, tag) in enumerate(groups)
+            ],
+        }],
+    }
+    largest = max(groups, key=lambda group: group[1]) if groups else None
+    text = f'{title}: **{total:,}** {describe(query, snapshot, total)}'
+    if largest:
+        text += f', the most with {query.group.label} {largest[0]} ({largest[1]:,})'
+    return f'{text}.\n\n```chart\n{json.dumps(chart, indent=2)}\n```'
+
+
+def _format_cell(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()[:10]
+    text = str(value).replace('\n', ' ')
+    return text if len(text) <= LIST_TEXT_LENGTH else text[:LIST_TEXT_LENGTH - 1] + '…'
+
+
+def answer_list(session, query, snapshot, registry):
+    total = session.execute(_select(query, func.count())).scalar()
+    if not total:
+        return f'There are no {describe(query, snapshot)}.'
+    columns = LIST_COLUMNS[query.entity.name]
+    rows = session.execute(
+        _select(query, *[column for _, column in columns]).order_by(*query.entity.order).limit(LIST_LIMIT)
+    ).all()
+    lines = [f'**{total:,}** {describe(query, snapshot, total)}:']
+    for row in rows:
+        title, *details = row
+        details = ', '.join(f'{label}: {_format_cell(value)}'
+                            for (label, _), value in zip(columns[1:], details) if value not in (None, ''))
+        lines.append(f'- **{_format_cell(title)}**' + (f' ({details})' if details else ''))
+    if total > len(rows):
+        lines.append(f'Showing the first {len(rows)}.')
+    return '\n'.join(lines)
+
+
+ANSWERS = {'count': answer_count, 'chart': answer_chart, 'list': answer_list}
+
+
+class ChatRouter:
+    """Answers the chat questions parse() understands, and counts how many that is."""
+
+    def __init__(self):
+        self._vocabulary = (None, None)
+        self._lock = threading.Lock()
+        self.questions = 0
+        self.answered = {intent: 0 for intent in ANSWERS}
+        self.errors = 0
+        self.answer_seconds = 0.0
+
+    def vocabulary(self, snapshot, registry):
+        key = (snapshot.version, snapshot.built_at, registry.version if registry else None)
+        cached_key, vocabulary = self._vocabulary
+        if cached_key != key:
+            vocabulary = build_vocabulary(snapshot, registry)
+            self._vocabulary = (key, vocabulary)
+        return vocabulary
+
+    def key_terms(self, snapshot, question, registry=None):
+        return key_terms(question, snapshot, self.vocabulary(snapshot, registry))
+
+    def answer(self, session, snapshot, question, registry=None):
+        """Markdown answer (with a ```chart block for charts), or None to ask the model."""
+        started = time.perf_counter()
+        try:
+            query = parse(question, snapshot, self.vocabulary(snapshot, registry))
+            text = ANSWERS[query.intent](session, query, snapshot, registry) if query else None
+        except Exception as e:
+            logger.warning('Chat router failed on %r, asking the model instead: %s', question, e)
+            query, text = None, None
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            self.questions += 1
+            if text is not None:
+                self.answered[query.intent] += 1
+                self.answer_seconds += time.perf_counter() - started
+        return text
+
+    def stats(self):
+        with self._lock:
+            answered = sum(self.answered.values())
+            return {
+                'questions': self.questions,
+                'answered': answered,
+                **{f'answered_{intent}': count for intent, count in self.answered.items()},
+                'errors': self.errors,
+                'hit_rate': answered / self.questions if self.questions else 0.0,
+                'answer_seconds_total': self.answer_seconds,
+            }
@@ -0,0 +1,266 @@
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+# Chat conversations kept on the server. Each request sends only the new message:
+# the model sees the shared prefix (system prompt and database context), a summary
+# of older turns once the history outgrows its token budget, and the recent turns.
+
+USAGE_FIELDS = ('model_calls', 'prompt_tokens', 'cached_tokens', 'output_tokens', 'compactions')
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for when the model reports none."""
+    return (len(text) + 3) // 4
+
+
+def response_usage(response):
+    """(prompt, cached, output) token counts reported with a model response, or None."""
+    metadata = getattr(response, 'usage_metadata', None)
+    if metadata is None or not getattr(metadata, 'prompt_token_count', 0):
+        return None
+    return (
+        metadata.prompt_token_count,
+        getattr(metadata, 'cached_content_token_count', 0) or 0,
+        getattr(metadata, 'candidates_token_count', 0) or 0,
+    )
+
+
+# ==================== SHARED PREFIX ====================
+
+class Prefix:
+    """The conversation prefix for one database context, and its provider cache handle if any."""
+
+    __slots__ = ('key', 'digest', 'text', 'tokens', 'cached', 'created_at')
+
+    def __init__(self, key, text, cached):
+        self.key = key
+        self.digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.cached = cached
+        self.created_at = time.monotonic()
+
+
+class PrefixCache:
+    """Builds the prefix once per context and stores it with the model provider when possible.
+
+    create(text) stores a prefix with the provider (Gemini context caching) and
+    returns a handle; release(handle) deletes one. Without create, or when it
+    fails (not every model and prefix size can be cached), the prefix is kept
+    here and resent verbatim, which leaves it byte-identical from turn to turn
+    for the provider's implicit prefix caching. Provider caches expire after
+    ttl seconds, so they are replaced a little before that; a failed create is
+    retried after the same time.
+    """
+
+    def __init__(self, create=None, release=None, ttl=3600):
+        self.create = create
+        self.release = release
+        self.ttl = ttl
+        self._current = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.provider_caches = 0
+        self.provider_failures = 0
+
+    def get(self, key, build):
+        """Prefix for key (e.g. a context snapshot's version), calling build() for its text on a miss."""
+        with self._lock:
+            current = self._current
+            if current is not None and current.key == key and not self._expiring(current):
+                self.hits += 1
+                return current
+            text = build()
+            if current is not None and current.digest == Prefix(key, text, None).digest and not self._expiring(current):
+                # Same context under a new key: keep the provider cache
+                current.key = key
+                self.hits += 1
+                return current
+            self._current = Prefix(key, text, self._create(text))
+            self.builds += 1
+            if current is not None and current.cached is not None:
+                self._release(current.cached)
+            return self._current
+
+    def _expiring(self, prefix):
+        # Also retries, once per ttl, a prefix the provider could not cache
+        if prefix.cached is None and self.create is None:
+            return False
+        return time.monotonic() - prefix.created_at >= self.ttl * 0.9
+
+    def _create(self, text):
+        if self.create is None:
+            return None
+        try:
+            handle = self.create(text)
+        except Exception as e:
+            self.provider_failures += 1
+            logger.info('Prefix not cached by the model provider, resending it instead: %s', e)
+            return None
+        self.provider_caches += 1
+        return handle
+
+    def _release(self, handle):
+        if self.release is None:
+            return
+        try:
+            self.release(handle)
+        except Exception as e:
+            logger.info('Could not delete a cached prefix: %s', e)
+
+    def stats(self):
+        with self._lock:
+            current = self._current
+            return {
+                'hits': self.hits,
+                'builds': self.builds,
+                'provider_caches': self.provider_caches,
+                'provider_failures': self.provider_failures,
+                'tokens': current.tokens if current else 0,
+                'provider_cached': int(bool(current and current.cached is not None)),
+            }
+
+
+# ==================== SESSIONS ====================
+
+class ChatSession:
+    """One conversation: recent turns, a summary of the older ones, and token usage."""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.turns = []          # [(role, text)], role 'user' or 'model'
+        self.summary = ''
+        self.dropped = 0         # older messages removed without a summary
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+        self.estimated = False   # some counts were estimated rather than reported
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def messages(self):
+        """History for the model: the summary of older turns, then the recent turns."""
+        history = []
+        if self.summary or self.dropped:
+            note = self.summary or f'{self.dropped} earlier messages were dropped to save space.'
+            history.append({'role': 'user', 'parts': [f'[Summary of the conversation so far]\n{note}']})
+            history.append({'role': 'model', 'parts': ['Understood.']})
+        history.extend({'role': role, 'parts': [text]} for role, text in self.turns)
+        return history
+
+    def history_tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(text) for _, text in self.turns)
+
+    def is_empty(self):
+        """Whether nothing has been said yet, so an answer depends on the question alone."""
+        return not self.turns and not self.summary and not self.dropped
+
+    def add_exchange(self, question, answer):
+        self.turns.append(('user', question))
+        self.turns.append(('model', answer))
+
+    def to_dict(self):
+        return {
+            'session_id': self.id,
+            'messages': len(self.turns),
+            'summarized': bool(self.summary),
+            'dropped_messages': self.dropped,
+            'history_tokens': self.history_tokens(),
+            'usage': dict(self.usage),
+            'estimated': self.estimated,
+        }
+
+
+def compact(session, budget, keep, summarize=None):
+    """Fold the oldest turns into the summary once the history exceeds budget tokens.
+
+    The last keep messages always stay verbatim. summarize(summary, turns)
+    returns the new summary text; without it, or if it fails, the old turns
+    are dropped instead. Returns whether the history was compacted.
+    """
+    if session.history_tokens() <= budget or len(session.turns) <= keep:
+        return False
+    old = session.turns[:-keep] if keep else session.turns
+    session.turns = session.turns[-keep:] if keep else []
+    if summarize is not None:
+        try:
+            session.summary = summarize(session.summary, old)
+            return True
+        except Exception as e:
+            logger.warning('Chat summary failed, dropping %d old messages instead: %s', len(old), e)
+    session.dropped += len(old)
+    return True
+
+
+class SessionStore:
+    """In-process chat sessions, evicted least recently used beyond max_sessions or after ttl idle seconds."""
+
+    def __init__(self, max_sessions=1000, ttl=3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.totals = dict.fromkeys(USAGE_FIELDS, 0)
+
+    def get(self, session_id):
+        """The session with this id, or None if it never existed, expired or was evicted."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.monotonic() - session.last_used >= self.ttl:
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id=None):
+        """(session, created): the given session if it is still held, else a new one."""
+        session = self.get(session_id) if session_id else None
+        if session is not None:
+            return session, False
+        session = ChatSession(secrets.token_urlsafe(16))
+        with self._lock:
+            self._sessions[session.id] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return session, True
+
+    def drop(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def record(self, session, prompt, cached, output, estimated=False, compactions=0):
+        """Add one model call's token counts (and any compaction before it) to the session and the totals."""
+        with self._lock:
+            for usage in (session.usage, self.totals):
+                usage['model_calls'] += 1
+                usage['prompt_tokens'] += prompt
+                usage['cached_tokens'] += cached
+                usage['output_tokens'] += output
+                usage['compactions'] += compactions
+            session.estimated = session.estimated or estimated
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'created': self.created,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                **self.totals,
+            }
@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+class ChatBusy(Exception):
+    """Raised when a chat request cannot be admitted; maps to HTTP 429."""
+
+
+class _Cancelled(Exception):
+    """Raised inside a streaming producer once its consumer has gone away."""
+
+
+_END = object()
+
+
+class ChatPool:
+    """Bounded executor for model calls.
+
+    At most max_workers calls run at once and max_queue more may wait for a
+    worker; beyond that, and beyond per_user_limit calls in flight for one user,
+    submissions are rejected immediately instead of queueing without bound. A
+    slot is held until the call actually finishes, so a caller that gave up on
+    a timeout cannot let new work pile up behind a still-running model call.
+    """
+
+    def __init__(self, max_workers, max_queue, per_user_limit):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.per_user_limit = per_user_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._per_user = defaultdict(int)
+
+    def submit(self, user, fn, *args):
+        """Schedule fn(*args) on the pool; returns a Future or raises ChatBusy."""
+        with self._lock:
+            if self._per_user.get(user, 0) >= self.per_user_limit:
+                raise ChatBusy('Too many chat requests in progress; wait for one to finish.')
+            if not self._slots.acquire(blocking=False):
+                raise ChatBusy('The assistant is busy; please try again shortly.')
+            self._per_user[user] += 1
+
+        def release(_future):
+            with self._lock:
+                self._per_user[user] -= 1
+                if not self._per_user[user]:
+                    del self._per_user[user]
+            self._slots.release()
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except RuntimeError:
+            release(None)
+            raise ChatBusy('The assistant is shutting down.')
+        future.add_done_callback(release)
+        return future
+
+    def run(self, user, fn, *args, timeout=None):
+        """Run fn(*args) on the pool and wait for its result.
+
+        Raises ChatBusy when not admitted and TimeoutError when no result arrives
+        within timeout seconds (queue wait included).
+        """
+        future = self.submit(user, fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()  # frees the slot if the call never left the queue
+            raise
+
+    def stream(self, user, produce, timeout=None):
+        """Run produce(emit) on the pool and iterate over the items it emits.
+
+        Admission happens here, so ChatBusy is raised before iteration starts.
+        The returned generator raises TimeoutError if the whole stream takes
+        longer than timeout, and re-raises any exception from produce. Closing
+        it early makes the producer's next emit() stop the worker.
+        """
+        items = queue.Queue()
+        cancelled = threading.Event()
+
+        def emit(item):
+            if cancelled.is_set():
+                raise _Cancelled()
+            items.put((item, None))
+
+        def run():
+            try:
+                produce(emit)
+                items.put((_END, None))
+            except _Cancelled:
+                pass
+            except Exception as e:
+                items.put((_END, e))
+
+        future = self.submit(user, run)
+        return self._drain(items, future, cancelled, timeout)
+
+    @staticmethod
+    def _drain(items, future, cancelled, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item, error = items.get(timeout=remaining)
+                except queue.Empty:
+                    raise TimeoutError()
+                if item is _END:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            cancelled.set()
+            future.cancel()
+
+    def stats(self):
+        """Current in-flight counts, for monitoring."""
+        with self._lock:
+            return {
+                'in_flight': sum(self._per_user.values()),
+                'users': len(self._per_user),
+                'capacity': self.max_workers + self.max_queue,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -4,13 +4,126 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Database
-DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crm.db')
+DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crm.db'))
 SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
 
+# SQLite engine profile, applied as PRAGMAs on every new connection.
+# WAL lets readers proceed while a writer commits; synchronous=NORMAL is durable
+# across application crashes in WAL mode (only a power loss can drop the last commits).
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536')),  # negative = KiB
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'temp_store': 'MEMORY',
+}
+
+# Connection pools: writes go through the primary engine, GET routes use a
+# separate read-only engine so readers never queue behind writers for a connection
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', '20'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+# Serve /api/dashboard from the maintained counter table instead of aggregating
+DASHBOARD_COUNTERS = os.getenv('DASHBOARD_COUNTERS', 'true').lower() == 'true'
+
+# Response cache for list, dashboard and tag GETs: entries are invalidated when a
+# table they read is written; the TTL (seconds) bounds how long writes made by other
+# processes can go unseen
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', 'true').lower() == 'true'
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_MB', '64')) * 1024 * 1024
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '60'))
+
+# Seconds the in-memory tag registry may be reused before re-reading tag
+# writes made by other processes (writes in this process rebuild it at once)
+TAG_REGISTRY_TTL = int(os.getenv('TAG_REGISTRY_TTL', '60'))
+
+# Request metrics at /metrics, and the slow-query log: statements taking at least
+# SLOW_QUERY_MS are logged and kept (the most recent SLOW_QUERY_LOG_SIZE) for
+# /api/metrics/slow-queries; 0 turns the log off
+METRICS = os.getenv('METRICS', 'true').lower() == 'true'
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG_SIZE = 100
+
+# List API pagination (used when a request passes limit or after)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# /api/search paging, and how many of the newest matches per entity are ranked
+# when a term matches more rows than that (0 ranks every match)
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_MAX_OFFSET = 1000
+SEARCH_RANK_WINDOW = int(os.getenv('SEARCH_RANK_WINDOW', '1000'))
+
+# Rows fetched per round trip by /api/export streams
+EXPORT_BATCH_SIZE = 1000
+
+# Days of change log kept for /api/sync; clients whose token is older get a full reload.
+# Pruned by `flask init-db` and `flask prune-changes`.
+SYNC_LOG_RETENTION_DAYS = int(os.getenv('SYNC_LOG_RETENTION_DAYS', '30'))
+
+# Rows per transaction for /api/bulk imports
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '1000'))
+
 # Gemini API
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 GEMINI_MODEL = 'gemini-3-flash-preview'
 
+# Chat context: rows per section sent to the model, and how long (seconds) a cached
+# snapshot may be reused before re-reading writes made by other processes
+CHAT_CONTEXT_MAX_ROWS = int(os.getenv('CHAT_CONTEXT_MAX_ROWS', '200'))
+CHAT_CONTEXT_TTL = int(os.getenv('CHAT_CONTEXT_TTL', '60'))
+
+# Chat worker pool: concurrent model calls, extra requests allowed to wait for a
+# worker, calls in flight per client, and the end-to-end limit (seconds) per call.
+# Requests beyond the limits get 429 with Retry-After; slow calls get 504.
+# Waiting chat requests still occupy a server thread, so keep workers + queue
+# well below the server's request threads to leave room for everything else.
+CHAT_MAX_WORKERS = int(os.getenv('CHAT_MAX_WORKERS', '4'))
+CHAT_MAX_QUEUE = int(os.getenv('CHAT_MAX_QUEUE', '4'))
+CHAT_PER_USER_LIMIT = int(os.getenv('CHAT_PER_USER_LIMIT', '2'))
+CHAT_TIMEOUT_SECONDS = int(os.getenv('CHAT_TIMEOUT_SECONDS', '60'))
+CHAT_RETRY_AFTER = 5
+
+# Reverse proxies in front of the app that append to X-Forwarded-For (e.g. 1 for
+# nginx). Clients are told apart by address, for the per-client chat limit among
+# others; behind a proxy every request would come from the proxy's address. Leave
+# at 0 when clients connect directly, since they could then forge the header.
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '0'))
+
+# Chat sessions: conversations are held in process memory, at most CHAT_MAX_SESSIONS,
+# each dropped after CHAT_SESSION_TTL idle seconds. Once a conversation's history
+# passes CHAT_HISTORY_TOKEN_BUDGET (estimated) tokens, all but the last
+# CHAT_KEEP_RECENT_EXCHANGES question/answer pairs are folded into a summary.
+CHAT_MAX_SESSIONS = int(os.getenv('CHAT_MAX_SESSIONS', '1000'))
+CHAT_SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', '3600'))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '4000'))
+CHAT_KEEP_RECENT_EXCHANGES = int(os.getenv('CHAT_KEEP_RECENT_EXCHANGES', '3'))
+
+# Store the system prompt and database context with Gemini context caching, for
+# CHAT_PREFIX_CACHE_TTL seconds. When the model or prefix size does not allow it
+# (or this is false), the prefix is sent with each request instead.
+CHAT_CONTEXT_CACHING = os.getenv('CHAT_CONTEXT_CACHING', 'true').lower() == 'true'
+CHAT_PREFIX_CACHE_TTL = int(os.getenv('CHAT_PREFIX_CACHE_TTL', '3600'))
+
+# Answer common chat questions (counts, breakdowns, charts, short lists) with SQL
+# instead of the model; questions the router does not fully understand still go to the model
+CHAT_ROUTER = os.getenv('CHAT_ROUTER', 'true').lower() == 'true'
+
+# Reuse model answers to questions that open a conversation, while the data they
+# were given is unchanged (writes from any process are seen through change_log):
+# up to CHAT_ANSWER_CACHE_SIZE answers (0 disables), each for at most
+# CHAT_ANSWER_CACHE_TTL seconds, the same bound as the context the model was
+# given (CHAT_CONTEXT_TTL). CHAT_ANSWER_CACHE_SIMILARITY (0 to 1) also serves questions that
+# read almost the same as a cached one; 0 matches only the same words.
+CHAT_ANSWER_CACHE_SIZE = int(os.getenv('CHAT_ANSWER_CACHE_SIZE', '500'))
+CHAT_ANSWER_CACHE_TTL = int(os.getenv('CHAT_ANSWER_CACHE_TTL', '60'))
+CHAT_ANSWER_CACHE_SIMILARITY = float(os.getenv('CHAT_ANSWER_CACHE_SIMILARITY', '0'))
+
 # Flask
 DEBUG = True
 SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -0,0 +1,122 @@
+from collections import defaultdict
+
+from sqlalchemy import event, func, case, select, inspect
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Department, Application, IntegrationStatus, Incident, DashboardCounter
+
+
+# Dashboard counters: (name, model, column, matching values).
+# A column of None counts every row of the model.
+COUNTERS = [
+    ('departments.total', Department, None, None),
+    ('departments.active', Department, 'status', ('active',)),
+    ('departments.critical', Department, 'tier', ('critical',)),
+    ('applications.total', Application, None, None),
+    ('applications.live', Application, 'status', ('live',)),
+    ('applications.integrating', Application, 'status', ('integrating',)),
+    ('risk.high_risk', IntegrationStatus, 'risk_level', ('high',)),
+    ('risk.blocked', IntegrationStatus, 'status', ('blocked',)),
+    ('risk.delayed', IntegrationStatus, 'status', ('delayed',)),
+    ('incidents.open', Incident, 'status', ('open', 'investigating')),
+]
+
+COUNTERS_BY_MODEL = defaultdict(list)
+for _counter in COUNTERS:
+    COUNTERS_BY_MODEL[_counter[1]].append(_counter)
+
+
+def _aggregate(model):
+    columns = []
+    for name, _, column, values in COUNTERS_BY_MODEL[model]:
+        if column is None:
+            columns.append(func.count().label(name))
+        else:
+            columns.append(func.coalesce(
+                func.sum(case((getattr(model, column).in_(values), 1), else_=0)), 0
+            ).label(name))
+    return select(*columns).select_from(model)
+
+
+def aggregate_counts(session):
+    """Compute every counter with one conditional-aggregate query per table."""
+    counts = {}
+    for model in COUNTERS_BY_MODEL:
+        counts.update(session.execute(_aggregate(model)).one()._asdict())
+    return counts
+
+
+def count_rows(session, model, condition):
+    """The counters of one model, over just the rows matching a condition."""
+    if model not in COUNTERS_BY_MODEL:
+        return {}
+    return session.execute(_aggregate(model).where(condition)).one()._asdict()
+
+
+def read_counters(session):
+    """Read the maintained counters in a single primary-key scan."""
+    counts = {name: 0 for name, _, _, _ in COUNTERS}
+    for name, value in session.query(DashboardCounter.name, DashboardCounter.value):
+        counts[name] = value
+    return counts
+
+
+def rebuild_counters(session):
+    """Recompute the counter table from the entity tables."""
+    counts = aggregate_counts(session)
+    session.query(DashboardCounter).delete()
+    session.add_all([DashboardCounter(name=name, value=value) for name, value in counts.items()])
+    session.commit()
+    return counts
+
+
+def apply_deltas(connection, deltas):
+    """Add per-counter deltas to the counter table on the given connection."""
+    rows = [{'name': name, 'value': delta} for name, delta in deltas.items() if delta]
+    if not rows:
+        return
+    stmt = insert(DashboardCounter.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'value': DashboardCounter.__table__.c.value + stmt.excluded.value}
+    )
+    connection.execute(stmt, rows)
+
+
+def _matches(values, value):
+    return values is None or value in values
+
+
+def _old_value(obj, column):
+    """Value of a column as it was before the pending flush."""
+    history = inspect(obj).attrs[column].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, column)
+
+
+def _after_flush(session, flush_context):
+    deltas = defaultdict(int)
+    for obj in session.new:
+        for name, _, column, values in COUNTERS_BY_MODEL.get(type(obj), []):
+            if column is None or _matches(values, getattr(obj, column)):
+                deltas[name] += 1
+    for obj in session.deleted:
+        for name, _, column, values in COUNTERS_BY_MODEL.get(type(obj), []):
+            if column is None or _matches(values, _old_value(obj, column)):
+                deltas[name] -= 1
+    for obj in session.dirty:
+        for name, _, column, values in COUNTERS_BY_MODEL.get(type(obj), []):
+            if column is None:
+                continue
+            deltas[name] += _matches(values, getattr(obj, column)) - _matches(values, _old_value(obj, column))
+    # Runs inside the flush transaction, so counters commit or roll back with the write
+    apply_deltas(session.connection(), deltas)
+
+
+def install_counters(session_factory):
+    """Keep the counter table in sync with writes made through a sessionmaker."""
+    if not event.contains(session_factory, 'after_flush', _after_flush):
+        event.listen(session_factory, 'after_flush', _after_flush)
@@ -1,18 +1,255 @@
+import logging
 from datetime import datetime, date, timedelta
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-from models import Base, Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident
+from models import Base, Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident, SchemaVersion, ChangeLog
 from tag_models import TagCategory, Tag
 import config
 
+logger = logging.getLogger(__name__)
 
-def init_db():
-    """Initialize the database and create all tables."""
-    engine = create_engine(config.SQLALCHEMY_DATABASE_URI, echo=False)
+
+# PRAGMAs that only a writable connection may change
+WRITE_ONLY_PRAGMAS = ('journal_mode',)
+
+
+def _apply_pragmas(engine, pragmas, readonly=False):
+    """Run the configured PRAGMAs on every new DBAPI connection of an engine."""
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if readonly and name in WRITE_ONLY_PRAGMAS:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def create_db_engine(url=None, pragmas=None, readonly=False, pool_size=None):
+    """Create a SQLite engine with the configured tuning profile.
+    
+    With readonly=True the database file is opened with mode=ro, so the
+    engine can serve GET routes from its own pool without taking write locks.
+    """
+    url = make_url(url or config.SQLALCHEMY_DATABASE_URI)
+    pragmas = config.SQLITE_PRAGMAS if pragmas is None else pragmas
+    
+    if readonly:
+        url = url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'})
+        pool_size = pool_size or config.DB_READ_POOL_SIZE
+        max_overflow = 0
+    else:
+        pool_size = pool_size or config.DB_POOL_SIZE
+        max_overflow = config.DB_MAX_OVERFLOW
+    
+    engine = create_engine(
+        url,
+        echo=False,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        # busy_timeout PRAGMA covers lock waits; this is the driver-level equivalent
+        connect_args={'timeout': pragmas.get('busy_timeout', 5000) / 1000}
+    )
+    _apply_pragmas(engine, pragmas, readonly=readonly)
+    return engine
+
+
+def init_db(engine=None):
+    """Initialize the database, create all tables and apply pending migrations."""
+    engine = engine or create_db_engine()
     Base.metadata.create_all(engine)
+    run_migrations(engine)
     return engine
 
 
+def init_read_engine(engine):
+    """Create the read-only engine used by GET routes (call after init_db).
+    
+    In-memory databases are private to their connection, so they share the
+    write engine instead.
+    """
+    if engine.url.database in (None, '', ':memory:'):
+        return engine
+    return create_db_engine(engine.url, readonly=True)
+
+
+# ==================== SCHEMA MIGRATIONS ====================
+# create_all() only creates missing tables, so anything added to an existing
+# table (indexes, columns, triggers) needs a numbered migration here. Migrations
+# must be idempotent: on a fresh database create_all() has usually done the work.
+
+def _create_indexes(connection, *tables, unique=False):
+    """Create the indexes declared on the given tables if they are missing.
+
+    Unique indexes are left to the migration that first removes the rows they
+    would reject, which passes unique=True.
+    """
+    for table_name in tables:
+        for index in Base.metadata.tables[table_name].indexes:
+            if unique or not index.unique:
+                index.create(connection, checkfirst=True)
+
+
+def _migration_001_secondary_indexes(connection):
+    _create_indexes(
+        connection,
+        'departments', 'applications', 'integration_status', 'contacts',
+        'engagement_activities', 'incidents', 'tags'
+    )
+
+
+# Full-text indexes: (fts table, content table, primary key, indexed columns).
+# External-content tables store only the index; the text stays in the source rows.
+FTS_TABLES = (
+    ('departments_fts', 'departments', 'department_id', ('name', 'acronym')),
+    ('applications_fts', 'applications', 'app_id', ('app_name',)),
+    ('integration_status_fts', 'integration_status', 'integration_id', ('notes',)),
+    ('engagement_activities_fts', 'engagement_activities', 'activity_id', ('summary', 'next_action')),
+    ('incidents_fts', 'incidents', 'incident_id', ('description', 'root_cause')),
+)
+
+
+def _migration_002_full_text_search(connection):
+    for fts, content, pk, columns in FTS_TABLES:
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{column_list}, content='{content}', content_rowid='{pk}', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        # Triggers keep the index in step with every write, including bulk Core statements
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {content} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.{pk}, {new_values}); END"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {content} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.{pk}, {old_values}); END"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {content} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.{pk}, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.{pk}, {new_values}); END"
+        )
+        # Index the rows that already exist
+        connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+# Tables whose writes are recorded in change_log for /api/sync: (table, primary key)
+CHANGE_LOG_TABLES = (
+    ('departments', 'department_id'),
+    ('applications', 'app_id'),
+    ('integration_status', 'integration_id'),
+    ('contacts', 'contact_id'),
+    ('engagement_activities', 'activity_id'),
+    ('incidents', 'incident_id'),
+)
+
+# Serialized rows that include values from another table (parent names, a
+# department's app_count) must be re-sent when that table changes: (trigger name,
+# triggering action, condition, [(dependent table, expression selecting its primary keys)]).
+CHANGE_LOG_DEPENDENTS = (
+    ('departments_changes_name', 'UPDATE OF name ON departments', 'new.name IS NOT old.name', [
+        ('applications', 'app_id FROM applications WHERE department_id = new.department_id'),
+        ('contacts', 'contact_id FROM contacts WHERE department_id = new.department_id'),
+        ('engagement_activities', 'activity_id FROM engagement_activities WHERE department_id = new.department_id'),
+        ('integration_status', 'integration_id FROM integration_status WHERE app_id IN '
+                               '(SELECT app_id FROM applications WHERE department_id = new.department_id)'),
+        ('incidents', 'incident_id FROM incidents WHERE app_id IN '
+                      '(SELECT app_id FROM applications WHERE department_id = new.department_id)'),
+    ]),
+    ('applications_changes_name', 'UPDATE OF app_name, department_id ON applications',
+     'new.app_name IS NOT old.app_name OR new.department_id IS NOT old.department_id', [
+        ('integration_status', 'integration_id FROM integration_status WHERE app_id = new.app_id'),
+        ('engagement_activities', 'activity_id FROM engagement_activities WHERE app_id = new.app_id'),
+        ('incidents', 'incident_id FROM incidents WHERE app_id = new.app_id'),
+    ]),
+    ('applications_changes_count_ai', 'INSERT ON applications', None, [
+        ('departments', 'new.department_id'),
+    ]),
+    ('applications_changes_count_ad', 'DELETE ON applications', None, [
+        ('departments', 'old.department_id'),
+    ]),
+    ('applications_changes_count_au', 'UPDATE OF department_id ON applications',
+     'new.department_id IS NOT old.department_id', [
+        ('departments', 'old.department_id'),
+        ('departments', 'new.department_id'),
+    ]),
+)
+
+
+def _migration_003_change_log(connection):
+    ChangeLog.__table__.create(connection, checkfirst=True)
+    # Triggers see every write, including bulk Core statements and ORM cascades
+    for table, pk in CHANGE_LOG_TABLES:
+        for suffix, action, ref in (('ai', 'INSERT', 'new'), ('au', 'UPDATE', 'new'), ('ad', 'DELETE', 'old')):
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_changes_{suffix} AFTER {action} ON {table} BEGIN "
+                f"INSERT INTO change_log(table_name, row_id) VALUES ('{table}', {ref}.{pk}); END"
+            )
+    for name, action, condition, dependents in CHANGE_LOG_DEPENDENTS:
+        when = f' WHEN {condition}' if condition else ''
+        inserts = ' '.join(
+            f"INSERT INTO change_log(table_name, row_id) SELECT '{table}', {keys};"
+            for table, keys in dependents
+        )
+        connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {action}{when} BEGIN {inserts} END")
+
+
+def _migration_004_filter_indexes(connection):
+    # Contact active flag, activity owner and incident severity list filters
+    _create_indexes(connection, 'contacts', 'engagement_activities', 'incidents')
+
+
+def _migration_005_unique_tag_values(connection):
+    # Records hold tag values, not tag ids, so nothing references a repeated value's
+    # later tags: keep the first tag for each value and remove the rest
+    duplicates = connection.exec_driver_sql(
+        'SELECT tag_id, category_id, value FROM tags '
+        'WHERE tag_id NOT IN (SELECT min(tag_id) FROM tags GROUP BY category_id, value)'
+    ).all()
+    for tag_id, category_id, value in duplicates:
+        logger.warning('Removing tag %d: category %d already has a tag with value %r', tag_id, category_id, value)
+        connection.exec_driver_sql('DELETE FROM tags WHERE tag_id = ?', (tag_id,))
+    _create_indexes(connection, 'tags', unique=True)
+
+
+MIGRATIONS = [
+    (1, 'Secondary indexes on foreign keys and filter columns', _migration_001_secondary_indexes),
+    (2, 'Full-text search indexes and sync triggers', _migration_002_full_text_search),
+    (3, 'Change log and triggers for delta sync', _migration_003_change_log),
+    (4, 'Indexes on the remaining list filter columns', _migration_004_filter_indexes),
+    (5, 'Unique tag values within a category', _migration_005_unique_tag_values),
+]
+
+
+def get_schema_version(connection):
+    """Return the highest applied migration version (0 for none)."""
+    return connection.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
+def run_migrations(engine):
+    """Apply pending migrations in order, each in its own transaction."""
+    with engine.connect() as connection:
+        current = get_schema_version(connection)
+    
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info('Applying schema migration %d: %s', version, description)
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(SchemaVersion.__table__.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+
+
 def get_session(engine):
     """Create a database session."""
     Session = sessionmaker(bind=engine)
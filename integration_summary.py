@@ -0,0 +1,176 @@
+from collections import Counter
+
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Department, Application, IntegrationStatus, IntegrationSummary
+
+
+# Summary dimensions, each with the column it is read from. Unset values are
+# stored as '' so every combination has a primary key.
+DIMENSIONS = ('tier', 'stage', 'status', 'risk_level')
+
+_SOURCE_COLUMNS = (Department.tier, IntegrationStatus.stage, IntegrationStatus.status, IntegrationStatus.risk_level)
+
+# Writes that can move an integration between combinations, by model (foreign
+# keys are listed with their relationships, which may be set instead)
+_WATCHED = {
+    IntegrationStatus: ('app_id', 'application', 'stage', 'status', 'risk_level'),
+    Application: ('department_id', 'department'),
+    Department: ('tier',),
+}
+
+_BEFORE_KEY = 'integration_summary_before'
+
+
+def _joined(*columns):
+    return (
+        select(*columns)
+        .select_from(IntegrationStatus)
+        .join(Application, IntegrationStatus.app_id == Application.app_id)
+        .join(Department, Application.department_id == Department.department_id)
+    )
+
+
+def _cell(values):
+    return tuple(value if value is not None else '' for value in values)
+
+
+def count_cells(session):
+    """{(tier, stage, status, risk_level): count} with one GROUP BY over the joined tables."""
+    rows = session.execute(_joined(*_SOURCE_COLUMNS, func.count()).group_by(*_SOURCE_COLUMNS))
+    counts = Counter()
+    for row in rows:
+        counts[_cell(row[:-1])] += row[-1]
+    return counts
+
+
+def rebuild_summary(session):
+    """Recompute the summary table from the entity tables."""
+    counts = count_cells(session)
+    session.query(IntegrationSummary).delete()
+    session.add_all([
+        IntegrationSummary(**dict(zip(DIMENSIONS, cell)), count=count)
+        for cell, count in counts.items()
+    ])
+    session.commit()
+    return counts
+
+
+def _stage_key(stage_order):
+    rank = {stage: index for index, stage in enumerate(stage_order)}
+    return lambda row: rank.get(row['stage'], len(rank))
+
+
+def read_summary(session, group_by=DIMENSIONS, filters=None, stage_order=()):
+    """Counts grouped by some dimensions, optionally filtered to {dimension: [values]}.
+
+    Returns [{dimension: value, ..., 'count': n}] for non-empty groups, with
+    unset values as None. Stages listed in stage_order sort in that order.
+    """
+    columns = [getattr(IntegrationSummary, name) for name in group_by]
+    query = select(*columns, func.sum(IntegrationSummary.count)).where(IntegrationSummary.count > 0)
+    for name, values in (filters or {}).items():
+        query = query.where(getattr(IntegrationSummary, name).in_(['' if v is None else v for v in values]))
+    query = query.group_by(*columns).order_by(*columns)
+    rows = [
+        {**{name: value or None for name, value in zip(group_by, row[:-1])}, 'count': row[-1]}
+        for row in session.execute(query)
+    ]
+    if 'stage' in group_by:
+        rows.sort(key=_stage_key(stage_order))
+    return rows
+
+
+def funnel(session, stage_order=()):
+    """Per-stage integration counts with their critical-tier, blocked, delayed and high-risk shares."""
+    stages = {}
+    for row in read_summary(session):
+        entry = stages.setdefault(row['stage'], {
+            'stage': row['stage'], 'count': 0, 'critical': 0, 'blocked': 0, 'delayed': 0, 'high_risk': 0
+        })
+        entry['count'] += row['count']
+        entry['critical'] += row['count'] if row['tier'] == 'critical' else 0
+        entry['blocked'] += row['count'] if row['status'] == 'blocked' else 0
+        entry['delayed'] += row['count'] if row['status'] == 'delayed' else 0
+        entry['high_risk'] += row['count'] if row['risk_level'] == 'high' else 0
+    return sorted(stages.values(), key=_stage_key(stage_order))
+
+
+def apply_deltas(connection, deltas):
+    """Add per-combination deltas to the summary table on the given connection."""
+    rows = [{**dict(zip(DIMENSIONS, cell)), 'count': delta} for cell, delta in deltas.items() if delta]
+    if not rows:
+        return
+    table = IntegrationSummary.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(DIMENSIONS),
+        set_={'count': table.c['count'] + stmt.excluded['count']}
+    )
+    connection.execute(stmt, rows)
+
+
+# ==================== WRITE LISTENERS ====================
+# An integration's combination depends on three tables, so instead of reading old
+# values from attribute history the listener snapshots the combinations of every
+# integration a flush may move, before and after the flush, and applies the difference.
+
+def _changed(obj, fields):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _affected(session, include_new=False):
+    """Ids of the integrations, applications and departments touched by the pending (or just-flushed) changes."""
+    ids = {IntegrationStatus: set(), Application: set(), Department: set()}
+    objects = [(obj, True) for obj in session.deleted]
+    objects += [(obj, False) for obj in session.dirty]
+    if include_new:
+        objects += [(obj, True) for obj in session.new]
+    for obj, always in objects:
+        fields = _WATCHED.get(type(obj))
+        if fields is None or not (always or _changed(obj, fields)):
+            continue
+        ids[type(obj)].add(inspect(obj).mapper.primary_key_from_instance(obj)[0])
+    for values in ids.values():
+        values.discard(None)
+    return ids
+
+
+def count_affected(session, ids):
+    """Combinations of the integrations of some {model: ids}, as a Counter (the ids _affected() returns)."""
+    clauses = [
+        column.in_(ids[model]) for model, column in ((IntegrationStatus, IntegrationStatus.integration_id),
+                                                     (Application, IntegrationStatus.app_id),
+                                                     (Department, Application.department_id))
+        if ids[model]
+    ]
+    if not clauses:
+        return Counter()
+    rows = session.connection().execute(_joined(*_SOURCE_COLUMNS).where(or_(*clauses)))
+    return Counter(_cell(row) for row in rows)
+
+
+def _before_flush(session, flush_context, instances):
+    ids = _affected(session)
+    session.info[_BEFORE_KEY] = (ids, count_affected(session, ids))
+
+
+def _after_flush(session, flush_context):
+    ids, before = session.info.pop(_BEFORE_KEY, (None, Counter()))
+    # New rows have their ids now; deleted rows are simply no longer found
+    after_ids = _affected(session, include_new=True)
+    for model, values in (ids or {}).items():
+        after_ids[model] |= values
+    after = count_affected(session, after_ids)
+    deltas = {cell: after[cell] - before[cell] for cell in set(before) | set(after)}
+    # Runs inside the flush transaction, so counts commit or roll back with the write
+    apply_deltas(session.connection(), deltas)
+
+
+def install_summary(session_factory):
+    """Keep the summary table in sync with writes made through a sessionmaker."""
+    for name, listener in (('before_flush', _before_flush), ('after_flush', _after_flush)):
+        if not event.contains(session_factory, name, listener):
+            event.listen(session_factory, name, listener)
@@ -0,0 +1,252 @@
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+
+# Longest statement text kept in the slow-query log
+SLOW_QUERY_MAX_CHARS = 2000
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Stats of the request being handled on this thread, or None outside a request
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    """SQL and serialization work done while handling one request."""
+
+    __slots__ = ('endpoint', 'started', 'queries', 'sql_seconds', 'serialize_seconds')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}'
+        yield f'{name}_bucket{_labels(labels, le="+Inf")} {self.count}'
+        yield f'{name}_sum{_labels(labels)} {_number(self.sum)}'
+        yield f'{name}_count{_labels(labels)} {self.count}'
+
+
+class Metrics:
+    """Per-route request, SQL and serialization metrics for one process."""
+
+    def __init__(self, slow_query_ms=None, slow_query_log_size=100):
+        self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms else None
+        self.slow_queries = deque(maxlen=slow_query_log_size)
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._latency = {}
+        self._queries = {}
+        self._bytes = {}
+        self._sql_seconds = defaultdict(float)
+        self._serialize_seconds = defaultdict(float)
+        self._slow_total = defaultdict(int)
+        self._collectors = []
+
+    def record_request(self, stats, method, status, duration, size):
+        key = (stats.endpoint, method)
+        with self._lock:
+            self._requests[key + (str(status),)] += 1
+            self._histogram(self._latency, key, LATENCY_BUCKETS).observe(duration)
+            self._histogram(self._queries, key, QUERY_COUNT_BUCKETS).observe(stats.queries)
+            if size is not None:
+                self._histogram(self._bytes, key, BYTES_BUCKETS).observe(size)
+            self._sql_seconds[key] += stats.sql_seconds
+            self._serialize_seconds[key] += stats.serialize_seconds
+
+    def record_slow_query(self, endpoint, statement, parameters, duration):
+        entry = {
+            'endpoint': endpoint,
+            'ms': round(duration * 1000, 2),
+            'statement': ' '.join(statement.split())[:SLOW_QUERY_MAX_CHARS],
+            'at': time.time(),
+        }
+        with self._lock:
+            self._slow_total[endpoint] += 1
+            self.slow_queries.append(entry)
+        logger.warning('Slow query (%.1f ms) in %s: %s %r', entry['ms'], endpoint, entry['statement'], parameters)
+
+    def add_collector(self, prefix, collect):
+        """Export the numeric values of collect() (a dict) as gauges named prefix_key."""
+        self._collectors.append((prefix, collect))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                '# HELP crm_http_requests_total Requests handled, by route, method and status.',
+                '# TYPE crm_http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'crm_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+            for name, kind, help_text, series in (
+                ('crm_http_request_duration_seconds', 'histogram', 'Time to produce the response.', self._latency),
+                ('crm_http_request_sql_queries', 'histogram', 'SQL statements executed per request.', self._queries),
+                ('crm_http_response_bytes', 'histogram', 'Response body size (unstreamed responses).', self._bytes),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for (endpoint, method), histogram in sorted(series.items()):
+                    lines += histogram.lines(name, {'endpoint': endpoint, 'method': method})
+
+            for name, help_text, series in (
+                ('crm_http_request_sql_seconds_total', 'Time spent executing SQL.', self._sql_seconds),
+                ('crm_http_request_serialize_seconds_total', 'Time spent serializing JSON.', self._serialize_seconds),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (endpoint, method), seconds in sorted(series.items()):
+                    lines.append(f'{name}{_labels(endpoint=endpoint, method=method)} {_number(seconds)}')
+
+            lines += [
+                '# HELP crm_sql_slow_queries_total Statements slower than SLOW_QUERY_MS.',
+                '# TYPE crm_sql_slow_queries_total counter',
+            ]
+            for endpoint, count in sorted(self._slow_total.items()):
+                lines.append(f'crm_sql_slow_queries_total{_labels(endpoint=endpoint)} {count}')
+            collectors = list(self._collectors)
+
+        for prefix, collect in collectors:
+            for key, value in collect().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines += [f'# TYPE {prefix}_{key} gauge', f'{prefix}_{key} {_number(value)}']
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram(series, key, buckets):
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        return histogram
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels=None, **extra):
+    items = {**(labels or {}), **extra}
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in items.items()) + '}'
+
+
+def instrument_engine(metrics, engine):
+    """Count and time every statement an engine executes, logging slow ones."""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += duration
+        if metrics.slow_query_seconds is not None and duration >= metrics.slow_query_seconds:
+            metrics.record_slow_query(stats.endpoint if stats else '-', statement, parameters, duration)
+
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _time_json(provider):
+    """Add the time spent building JSON responses (jsonify) to the current request."""
+    response = provider.response
+
+    def timed_response(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return response(*args, **kwargs)
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.serialize_seconds += time.perf_counter() - started
+
+    provider.response = timed_response
+
+
+def install_metrics(app, metrics, engines=()):
+    """Record latency, SQL work, serialization time and size for every request.
+
+    Latency is measured to the point the response is returned to the server;
+    for streamed responses that is the time to the first byte, and their size
+    is not known.
+    """
+    for engine in set(engines):
+        instrument_engine(metrics, engine)
+    _time_json(app.json)
+
+    @app.before_request
+    def start_request_metrics():
+        rule = request.url_rule
+        g.request_metrics = RequestStats(rule.rule if rule is not None else '<unmatched>')
+        _current.set(g.request_metrics)
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = g.pop('request_metrics', None)
+        if stats is not None:
+            _current.set(None)
+            size = response.content_length if response.is_streamed else response.calculate_content_length()
+            metrics.record_request(stats, request.method, response.status_code,
+                                   time.perf_counter() - stats.started, size)
+        return response
+
+    @app.teardown_request
+    def record_failed_request_metrics(error=None):
+        # after_request does not run when a view raises
+        stats = g.pop('request_metrics', None)
+        if stats is not None:
+            _current.set(None)
+            metrics.record_request(stats, request.method, 500, time.perf_counter() - stats.started, None)
+
+
+def metrics_response(metrics):
+    return Response(metrics.render(), mimetype=PROMETHEUS_MIMETYPE)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Date
+from sqlalchemy import create_engine, func, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Date
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -18,11 +18,11 @@ class Department(Base):
     __tablename__ = 'departments'
     
     department_id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=False, index=True)
     acronym = Column(String(50))
-    tier = Column(String(20), default='standard')  # critical / standard
-    status = Column(String(20), default='active')  # active / inactive
-    owner_team = Column(String(100))
+    tier = Column(String(20), default='standard', index=True)  # critical / standard
+    status = Column(String(20), default='active', index=True)  # active / inactive
+    owner_team = Column(String(100), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -57,12 +57,12 @@ class Application(Base):
     __tablename__ = 'applications'
     
     app_id = Column(Integer, primary_key=True, autoincrement=True)
-    department_id = Column(Integer, ForeignKey('departments.department_id'), nullable=False)
-    app_name = Column(String(255), nullable=False)
-    environment = Column(String(20), default='prod')  # prod / test
-    auth_type = Column(Text, default='GC Key')  # GC Key, Interact Sign In, etc. (comma-separated)
+    department_id = Column(Integer, ForeignKey('departments.department_id'), nullable=False, index=True)
+    app_name = Column(String(255), nullable=False, index=True)
+    environment = Column(String(20), default='prod', index=True)  # prod / test
+    auth_type = Column(Text, default='GC Key', index=True)  # GC Key, Interact Sign In, etc. (comma-separated)
     go_live_date = Column(Date)
-    status = Column(String(30), default='integrating')  # live / integrating / deprecated
+    status = Column(String(30), default='integrating', index=True)  # live / integrating / deprecated
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -106,9 +106,9 @@ class IntegrationStatus(Base):
     
     integration_id = Column(Integer, primary_key=True, autoincrement=True)
     app_id = Column(Integer, ForeignKey('applications.app_id'), nullable=False, unique=True)
-    stage = Column(String(30), default='intake')  # intake / design / implementation / testing / production
-    status = Column(String(20), default='on_track')  # on_track / blocked / delayed
-    risk_level = Column(String(20), default='low')  # low / medium / high
+    stage = Column(String(30), default='intake', index=True)  # intake / design / implementation / testing / production
+    status = Column(String(20), default='on_track', index=True)  # on_track / blocked / delayed
+    risk_level = Column(String(20), default='low', index=True)  # low / medium / high
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     notes = Column(Text)
     
@@ -140,12 +140,12 @@ class Contact(Base):
     __tablename__ = 'contacts'
     
     contact_id = Column(Integer, primary_key=True, autoincrement=True)
-    department_id = Column(Integer, ForeignKey('departments.department_id'), nullable=False)
-    name = Column(String(255), nullable=False)
-    role = Column(String(30))  # business / technical / security
+    department_id = Column(Integer, ForeignKey('departments.department_id'), nullable=False, index=True)
+    name = Column(String(255), nullable=False, index=True)
+    role = Column(String(30), index=True)  # business / technical / security
     email = Column(String(255))
     phone = Column(String(30))
-    active_flag = Column(Boolean, default=True)
+    active_flag = Column(Boolean, default=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -179,13 +179,13 @@ class EngagementActivity(Base):
     __tablename__ = 'engagement_activities'
     
     activity_id = Column(Integer, primary_key=True, autoincrement=True)
-    department_id = Column(Integer, ForeignKey('departments.department_id'), nullable=False)
-    app_id = Column(Integer, ForeignKey('applications.app_id'), nullable=True)
-    type = Column(String(30))  # meeting / email / workshop / incident
-    date = Column(Date, default=datetime.utcnow)
+    department_id = Column(Integer, ForeignKey('departments.department_id'), nullable=False, index=True)
+    app_id = Column(Integer, ForeignKey('applications.app_id'), nullable=True, index=True)
+    type = Column(String(30), index=True)  # meeting / email / workshop / incident
+    date = Column(Date, default=datetime.utcnow, index=True)
     summary = Column(Text)
     next_action = Column(Text)
-    owner = Column(String(100))
+    owner = Column(String(100), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -220,12 +220,12 @@ class Incident(Base):
     __tablename__ = 'incidents'
     
     incident_id = Column(Integer, primary_key=True, autoincrement=True)
-    app_id = Column(Integer, ForeignKey('applications.app_id'), nullable=False)
-    severity = Column(String(20))  # critical / high / medium / low
-    status = Column(String(20), default='open')  # open / investigating / resolved / closed
+    app_id = Column(Integer, ForeignKey('applications.app_id'), nullable=False, index=True)
+    severity = Column(String(20), index=True)  # critical / high / medium / low
+    status = Column(String(20), default='open', index=True)  # open / investigating / resolved / closed
     description = Column(Text)
     root_cause = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     resolved_at = Column(DateTime)
     
     # Relationships
@@ -244,3 +244,83 @@ class Incident(Base):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None
         }
+
+
+class DashboardCounter(Base):
+    """
+    Denormalized dashboard counts, kept in step with entity writes by counters.py.
+    
+    Semantic definitions:
+    - name: Counter key in '<group>.<metric>' form (e.g., 'departments.active')
+    - value: Current count of rows matching the counter's predicate
+    """
+    __tablename__ = 'dashboard_counters'
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'value': self.value
+        }
+
+
+class SchemaVersion(Base):
+    """
+    Records each schema migration applied by database.run_migrations().
+    """
+    __tablename__ = 'schema_version'
+    
+    version = Column(Integer, primary_key=True)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ChangeLog(Base):
+    """
+    One row per insert, update or delete of a list entity, written by SQLite
+    triggers (see migration 3 in database.py) and read by /api/sync.
+    
+    Semantic definitions:
+    - seq: Position in the log; the sync token is the highest seq a client has seen
+    - table_name: Table of the changed row
+    - row_id: Primary key of the changed row (a tombstone if the row no longer exists)
+    - changed_at: UTC time the change was written
+    """
+    __tablename__ = 'change_log'
+    # AUTOINCREMENT so a seq is never reused after old entries are pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    changed_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+
+class IntegrationSummary(Base):
+    """
+    Materialized integration pipeline: integrations counted by department tier,
+    stage, status and risk level, kept in step with writes by integration_summary.py.
+    
+    Semantic definitions:
+    - tier: Tier of the department owning the integration's application
+    - stage, status, risk_level: As on IntegrationStatus
+    - count: Integrations in this combination ('' stands for an unset value)
+    """
+    __tablename__ = 'integration_summary'
+    
+    tier = Column(String(20), primary_key=True)
+    stage = Column(String(30), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    risk_level = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'tier': self.tier or None,
+            'stage': self.stage or None,
+            'status': self.status or None,
+            'risk_level': self.risk_level or None,
+            'count': self.count
+        }
@@ -0,0 +1,293 @@
+import base64
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import desc, and_, or_, false, select, Boolean, Date, DateTime, Integer
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident
+from tag_models import TagCategory
+
+
+# Loader options matching the shape each model's to_dict() serializes.
+# Many-to-one parents are joined into the main SELECT; collections are fetched
+# with a single extra SELECT ... WHERE IN, so a list call issues a fixed number
+# of statements regardless of row count.
+LOAD_OPTIONS = {
+    Department: [
+        # to_dict() only needs len(applications), so don't hydrate full rows
+        selectinload(Department.applications).load_only(Application.app_id),
+    ],
+    Application: [
+        joinedload(Application.department).load_only(Department.name),
+    ],
+    IntegrationStatus: [
+        joinedload(IntegrationStatus.application)
+            .load_only(Application.app_name, Application.department_id)
+            .joinedload(Application.department)
+            .load_only(Department.name),
+    ],
+    Contact: [
+        joinedload(Contact.department).load_only(Department.name),
+    ],
+    EngagementActivity: [
+        joinedload(EngagementActivity.department).load_only(Department.name),
+        joinedload(EngagementActivity.application).load_only(Application.app_name),
+    ],
+    Incident: [
+        joinedload(Incident.application)
+            .load_only(Application.app_name, Application.department_id)
+            .joinedload(Application.department)
+            .load_only(Department.name),
+    ],
+    TagCategory: [
+        selectinload(TagCategory.tags),
+    ],
+}
+
+# List ordering as (column, descending) pairs. Each ends in the primary key so the
+# order is total and can be resumed from a keyset cursor.
+LIST_ORDER = {
+    Department: [(Department.name, False), (Department.department_id, False)],
+    Application: [(Application.app_name, False), (Application.app_id, False)],
+    IntegrationStatus: [(IntegrationStatus.integration_id, False)],
+    Contact: [(Contact.name, False), (Contact.contact_id, False)],
+    EngagementActivity: [(EngagementActivity.date, True), (EngagementActivity.activity_id, True)],
+    Incident: [(Incident.created_at, True), (Incident.incident_id, True)],
+    TagCategory: [(TagCategory.category_id, False)],
+}
+
+# URL names of the list entities, shared by the export, sync and search APIs
+ENTITY_MODELS = {
+    'departments': Department,
+    'applications': Application,
+    'integrations': IntegrationStatus,
+    'contacts': Contact,
+    'activities': EngagementActivity,
+    'incidents': Incident,
+}
+
+# Equality filters accepted by each list endpoint (comma-separated values become IN)
+LIST_FILTERS = {
+    Department: {
+        'tier': Department.tier,
+        'status': Department.status,
+        'owner_team': Department.owner_team,
+    },
+    Application: {
+        'department_id': Application.department_id,
+        'status': Application.status,
+        'environment': Application.environment,
+    },
+    IntegrationStatus: {
+        'app_id': IntegrationStatus.app_id,
+        'stage': IntegrationStatus.stage,
+        'status': IntegrationStatus.status,
+        'risk_level': IntegrationStatus.risk_level,
+    },
+    Contact: {
+        'department_id': Contact.department_id,
+        'role': Contact.role,
+        'active_flag': Contact.active_flag,
+    },
+    EngagementActivity: {
+        'department_id': EngagementActivity.department_id,
+        'app_id': EngagementActivity.app_id,
+        'type': EngagementActivity.type,
+        'owner': EngagementActivity.owner,
+    },
+    Incident: {
+        'app_id': Incident.app_id,
+        'severity': Incident.severity,
+        'status': Incident.status,
+    },
+}
+
+# Column used by the date_from/date_to range filter
+DATE_FILTERS = {
+    EngagementActivity: EngagementActivity.date,
+    Incident: Incident.created_at,
+}
+
+
+def eager_query(session, model):
+    """Query a model with the eager-loading strategy for its serialized shape."""
+    return session.query(model).options(*LOAD_OPTIONS.get(model, []))
+
+
+def list_query(session, model):
+    """Eager-loaded query in the default list order for a model."""
+    order = [desc(column) if descending else column for column, descending in LIST_ORDER.get(model, [])]
+    return eager_query(session, model).order_by(*order)
+
+
+def get_by_id(session, model, pk):
+    """Fetch a single row by primary key with its serialized relationships loaded."""
+    return session.get(model, pk, options=LOAD_OPTIONS.get(model, []))
+
+
+# ==================== LIST PARAMETERS ====================
+
+def _coerce(column, raw):
+    """Convert a query-string value to the Python type of a column."""
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        if raw.lower() in ('1', 'true', 'yes'):
+            return True
+        if raw.lower() in ('0', 'false', 'no'):
+            return False
+        raise ValueError(f'Invalid boolean value: {raw}')
+    if isinstance(column_type, Integer):
+        try:
+            return int(raw)
+        except ValueError:
+            raise ValueError(f'Invalid integer value: {raw}')
+    return raw
+
+
+def _parse_date_arg(name, raw):
+    try:
+        return datetime.strptime(raw, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Invalid {name}, expected YYYY-MM-DD: {raw}')
+
+
+def filtered_query(session, model, args, query=None):
+    """List query with the equality and date-range filters from request args applied.
+    
+    query defaults to list_query(); a column query over the model (see
+    serializers.row_query) can be passed instead.
+    """
+    if query is None:
+        query = list_query(session, model)
+    
+    for name, column in LIST_FILTERS.get(model, {}).items():
+        raw = args.get(name)
+        if raw is None or raw == '':
+            continue
+        values = [_coerce(column, v) for v in raw.split(',')]
+        query = query.filter(column == values[0] if len(values) == 1 else column.in_(values))
+    
+    # Integrations and incidents belong to a department through their application
+    if model in (IntegrationStatus, Incident) and args.get('department_id'):
+        department_ids = [_coerce(Application.department_id, v) for v in args['department_id'].split(',')]
+        query = query.filter(model.app_id.in_(
+            select(Application.app_id).where(Application.department_id.in_(department_ids))
+        ))
+    
+    date_column = DATE_FILTERS.get(model)
+    if date_column is not None:
+        date_from = args.get('date_from')
+        date_to = args.get('date_to')
+        if date_from:
+            query = query.filter(date_column >= _parse_date_arg('date_from', date_from))
+        if date_to:
+            end = _parse_date_arg('date_to', date_to)
+            if isinstance(date_column.type, DateTime):
+                # Inclusive end date for timestamp columns
+                query = query.filter(date_column < end + timedelta(days=1))
+            else:
+                query = query.filter(date_column <= end)
+    
+    return query
+
+
+def parse_limit(raw, default, maximum):
+    """Parse the limit parameter, clamped to the configured maximum page size."""
+    if raw is None or raw == '':
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError(f'Invalid limit: {raw}')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
+
+
+def parse_fields(raw):
+    """Parse the fields= projection parameter into a list of keys (None for all)."""
+    if not raw:
+        return None
+    return [field.strip() for field in raw.split(',') if field.strip()]
+
+
+def project(row, fields):
+    """Keep only the requested keys of a serialized row."""
+    if fields is None:
+        return row
+    return {key: row[key] for key in fields if key in row}
+
+
+# ==================== KEYSET PAGINATION ====================
+
+def encode_cursor(model, obj):
+    """Opaque cursor holding the sort-key values of the last row on a page."""
+    values = []
+    for column, _ in LIST_ORDER[model]:
+        value = getattr(obj, column.key)
+        values.append(value.isoformat() if isinstance(value, (date, datetime)) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, cursor):
+    """Decode a cursor back into typed sort-key values."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        order = LIST_ORDER[model]
+        if not isinstance(values, list) or len(values) != len(order):
+            raise ValueError
+        decoded = []
+        for (column, _), value in zip(order, values):
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif value is not None and isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def _after_condition(model, values):
+    """WHERE clause selecting rows strictly after the given sort-key values.
+    
+    SQLite sorts NULLs first ascending and last descending; the expansion below
+    follows that so nullable sort columns page without skipping rows.
+    """
+    order = LIST_ORDER[model]
+    terms = []
+    for i, ((column, descending), value) in enumerate(zip(order, values)):
+        if value is None:
+            after = None if descending else column.isnot(None)
+        elif descending:
+            after = or_(column < value, column.is_(None))
+        else:
+            after = column > value
+        if after is None:
+            continue
+        equal = [c.is_(None) if v is None else c == v for (c, _), v in zip(order[:i], values[:i])]
+        terms.append(and_(*equal, after))
+    
+    # Leading-column bound lets SQLite range-scan the sort index
+    leading, leading_desc = order[0]
+    if values[0] is None:
+        bound = leading.is_(None) if leading_desc else None
+    elif leading_desc:
+        bound = or_(leading <= values[0], leading.is_(None))
+    else:
+        bound = leading >= values[0]
+    condition = or_(*terms) if terms else false()
+    return condition if bound is None else and_(bound, condition)
+
+
+def fetch_page(query, model, limit, after=None):
+    """Fetch one keyset page; returns (rows, next_cursor)."""
+    if after:
+        query = query.filter(_after_condition(model, decode_cursor(model, after)))
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(model, rows[-1])
+    return rows, None
@@ -0,0 +1,150 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+import versions
+
+
+class CachedResponse:
+    """A serialized 200 response and the table versions it was built at."""
+
+    __slots__ = ('table_versions', 'etag', 'body', 'mimetype', 'stored_at')
+
+    def __init__(self, table_versions, body, mimetype):
+        self.table_versions = table_versions
+        self.etag = make_etag(body)
+        self.body = body
+        self.mimetype = mimetype
+        self.stored_at = time.monotonic()
+
+
+class ResponseCache:
+    """LRU cache of response bodies bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key, table_versions):
+        """Entry for key if it was built at the given table versions and has not expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.table_versions != table_versions or self._expired(entry):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if len(entry.body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def record(self, outcome):
+        """Count a hit, miss or 304."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.not_modified
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.not_modified) / lookups, 4) if lookups else None,
+            }
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.monotonic() - entry.stored_at >= self.ttl
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+
+def make_etag(body):
+    """Strong ETag from the response bytes, so it is valid across restarts and processes."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_response(cache, *tables, enabled=True):
+    """Cache a GET view's 200 responses until any of the tables it reads changes.
+
+    Entries are keyed on the request path and query string and validated against
+    the current versions of the given tables (see versions.py), which writes bump
+    on commit. While an entry is valid, a matching If-None-Match or a cached
+    body is answered without calling the view. Responses carry a strong ETag and
+    Cache-Control: no-cache, so browsers revalidate every time and get a 304
+    while nothing has changed.
+    """
+    def decorator(view):
+        if not enabled:
+            return view
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.full_path
+            # Versions are read before the view runs, so the body is never older than them
+            table_versions = versions.snapshot(tables)
+            entry = cache.get(key, table_versions)
+
+            if entry is not None:
+                if request.if_none_match.contains(entry.etag):
+                    cache.record('not_modified')
+                    return _not_modified(entry.etag)
+                cache.record('hits')
+                response = Response(entry.body, mimetype=entry.mimetype)
+            else:
+                cache.record('misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = CachedResponse(table_versions, response.get_data(), response.mimetype)
+                cache.put(key, entry)
+                if request.if_none_match.contains(entry.etag):
+                    return _not_modified(entry.etag)
+
+            response.set_etag(entry.etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,142 @@
+import heapq
+import html
+import re
+
+from sqlalchemy import text
+
+
+# Searchable entities: the FTS5 index (see migration 2 in database.py), its content
+# table and key, the SQL expression used as the result title (over alias c), and
+# extra columns returned with each hit.
+SEARCH_ENTITIES = {
+    'departments': {
+        'fts': 'departments_fts',
+        'table': 'departments',
+        'pk': 'department_id',
+        'title': "c.name || COALESCE(' (' || c.acronym || ')', '')",
+        'extra': ('acronym', 'tier', 'status'),
+    },
+    'applications': {
+        'fts': 'applications_fts',
+        'table': 'applications',
+        'pk': 'app_id',
+        'title': 'c.app_name',
+        'extra': ('department_id', 'environment', 'status'),
+    },
+    'integrations': {
+        'fts': 'integration_status_fts',
+        'table': 'integration_status',
+        'pk': 'integration_id',
+        'title': '(SELECT app_name FROM applications a WHERE a.app_id = c.app_id)',
+        'extra': ('app_id', 'stage', 'status', 'risk_level'),
+    },
+    'activities': {
+        'fts': 'engagement_activities_fts',
+        'table': 'engagement_activities',
+        'pk': 'activity_id',
+        'title': "c.type || ' on ' || c.date",
+        'extra': ('department_id', 'app_id', 'type', 'date'),
+    },
+    'incidents': {
+        'fts': 'incidents_fts',
+        'table': 'incidents',
+        'pk': 'incident_id',
+        'title': "c.severity || ' incident'",
+        'extra': ('app_id', 'severity', 'status', 'created_at'),
+    },
+}
+
+MAX_QUERY_TERMS = 10
+
+# Shorter final terms are matched whole; a one-letter prefix would match most of the index
+MIN_PREFIX_LENGTH = 2
+
+# Snippet markers, replaced by <mark> tags after the text is HTML-escaped
+_OPEN, _CLOSE = '\x02', '\x03'
+SNIPPET_TOKENS = 16
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match(query):
+    """FTS5 MATCH expression for free text: every word must match, the last as a prefix.
+
+    Words are quoted so user input can never be parsed as FTS5 query syntax.
+    Returns None when the text contains no words.
+    """
+    terms = _TERM.findall(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= MIN_PREFIX_LENGTH:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and wrap matched terms in <mark>."""
+    return html.escape(snippet or '').replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def _entity_hits(session, entity, match, count, rank_window):
+    """The best `count` hits for one entity, as (rank, entity, row) tuples."""
+    spec = SEARCH_ENTITIES[entity]
+    fts, table, pk = spec['fts'], spec['table'], spec['pk']
+    params = {'match': match, 'count': count}
+
+    # For very common terms, rank only the newest rank_window matches: FTS5 can
+    # bound the scan by rowid, where ranking every match would score the whole table
+    floor = ''
+    if rank_window:
+        boundary = session.execute(text(
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH :match ORDER BY rowid DESC LIMIT 1 OFFSET :window"
+        ), {'match': match, 'window': rank_window}).scalar()
+        if boundary is not None:
+            floor = 'AND rowid > :floor'
+            params['floor'] = boundary
+
+    extra = ', '.join(f'c.{column}' for column in spec['extra'])
+    rows = session.execute(text(
+        f"SELECT m.rowid AS id, m.rank, m.snippet, {spec['title']} AS title, {extra} "
+        f"FROM (SELECT rowid, rank, snippet({fts}, -1, '{_OPEN}', '{_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet "
+        f"      FROM {fts} WHERE {fts} MATCH :match {floor} ORDER BY rank LIMIT :count) AS m "
+        f"JOIN {table} c ON c.{pk} = m.rowid "
+        f"ORDER BY m.rank"
+    ), params).mappings().all()
+    return [(row['rank'], entity, row) for row in rows]
+
+
+def search(session, query, entities=None, limit=20, offset=0, rank_window=None):
+    """Ranked full-text search across entity types.
+
+    Each entity's index returns its best offset+limit+1 hits by bm25, and the
+    lists are merged by score. Scores come from separate indexes, so they are
+    comparable in scale but not strictly. With a rank_window, an entity whose
+    matches outnumber the window is ranked over its newest rank_window matches
+    only. Returns (results, has_more).
+    """
+    match = build_match(query)
+    if match is None:
+        return [], False
+    entities = entities or list(SEARCH_ENTITIES)
+    count = offset + limit + 1
+
+    hits = heapq.merge(
+        *[_entity_hits(session, entity, match, count, rank_window) for entity in entities],
+        key=lambda hit: hit[0]
+    )
+    page = list(hits)[offset:offset + limit + 1]
+
+    results = []
+    for rank, entity, row in page[:limit]:
+        result = {
+            'entity': entity,
+            'id': row['id'],
+            'title': row['title'],
+            'snippet': highlight(row['snippet']),
+            'score': round(-rank, 4),
+        }
+        for column in SEARCH_ENTITIES[entity]['extra']:
+            result[column] = row[column]
+        results.append(result)
+    return results, len(page) > limit
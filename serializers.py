@@ -0,0 +1,205 @@
+import dataclasses
+import decimal
+import json
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import func, select, Date, DateTime
+from sqlalchemy.orm import aliased
+
+from models import Department, Application, IntegrationStatus, Contact, EngagementActivity, Incident
+from queries import LIST_ORDER
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used without it
+    orjson = None
+
+
+# ==================== ROW SHAPES ====================
+# Each list entity as (key, column) pairs matching the keys and order of the
+# model's to_dict(), plus the outer joins that supply parent names. Selecting
+# these with a Core-style column query returns plain rows, so no ORM instances
+# or relationships are built. Parent tables are aliased so they never correlate
+# with subqueries used by the list filters.
+
+_app = aliased(Application, name='parent_app')
+_dept = aliased(Department, name='parent_dept')
+
+_APP_COUNT = (
+    select(func.count(Application.app_id))
+    .where(Application.department_id == Department.department_id)
+    .correlate(Department)
+    .scalar_subquery()
+)
+
+
+class RowShape:
+    """Columns and joins producing one entity's serialized rows."""
+
+    def __init__(self, model, columns, joins=()):
+        self.model = model
+        self.columns = dict(columns)
+        self.joins = joins
+        self.date_keys = {
+            key for key, column in self.columns.items()
+            if isinstance(getattr(column, 'type', None), (Date, DateTime))
+        }
+
+
+SHAPES = {shape.model: shape for shape in (
+    RowShape(Department, [
+        ('department_id', Department.department_id),
+        ('name', Department.name),
+        ('acronym', Department.acronym),
+        ('tier', Department.tier),
+        ('status', Department.status),
+        ('owner_team', Department.owner_team),
+        ('created_at', Department.created_at),
+        ('updated_at', Department.updated_at),
+        ('app_count', _APP_COUNT),
+    ]),
+    RowShape(Application, [
+        ('app_id', Application.app_id),
+        ('department_id', Application.department_id),
+        ('department_name', _dept.name),
+        ('app_name', Application.app_name),
+        ('environment', Application.environment),
+        ('auth_type', Application.auth_type),
+        ('go_live_date', Application.go_live_date),
+        ('status', Application.status),
+        ('created_at', Application.created_at),
+        ('updated_at', Application.updated_at),
+    ], joins=[(_dept, Application.department_id == _dept.department_id)]),
+    RowShape(IntegrationStatus, [
+        ('integration_id', IntegrationStatus.integration_id),
+        ('app_id', IntegrationStatus.app_id),
+        ('app_name', _app.app_name),
+        ('department_name', _dept.name),
+        ('stage', IntegrationStatus.stage),
+        ('status', IntegrationStatus.status),
+        ('risk_level', IntegrationStatus.risk_level),
+        ('last_updated', IntegrationStatus.last_updated),
+        ('notes', IntegrationStatus.notes),
+    ], joins=[(_app, IntegrationStatus.app_id == _app.app_id),
+              (_dept, _app.department_id == _dept.department_id)]),
+    RowShape(Contact, [
+        ('contact_id', Contact.contact_id),
+        ('department_id', Contact.department_id),
+        ('department_name', _dept.name),
+        ('name', Contact.name),
+        ('role', Contact.role),
+        ('email', Contact.email),
+        ('phone', Contact.phone),
+        ('active_flag', Contact.active_flag),
+        ('created_at', Contact.created_at),
+    ], joins=[(_dept, Contact.department_id == _dept.department_id)]),
+    RowShape(EngagementActivity, [
+        ('activity_id', EngagementActivity.activity_id),
+        ('department_id', EngagementActivity.department_id),
+        ('department_name', _dept.name),
+        ('app_id', EngagementActivity.app_id),
+        ('app_name', _app.app_name),
+        ('type', EngagementActivity.type),
+        ('date', EngagementActivity.date),
+        ('summary', EngagementActivity.summary),
+        ('next_action', EngagementActivity.next_action),
+        ('owner', EngagementActivity.owner),
+        ('created_at', EngagementActivity.created_at),
+    ], joins=[(_dept, EngagementActivity.department_id == _dept.department_id),
+              (_app, EngagementActivity.app_id == _app.app_id)]),
+    RowShape(Incident, [
+        ('incident_id', Incident.incident_id),
+        ('app_id', Incident.app_id),
+        ('app_name', _app.app_name),
+        ('department_name', _dept.name),
+        ('severity', Incident.severity),
+        ('status', Incident.status),
+        ('description', Incident.description),
+        ('root_cause', Incident.root_cause),
+        ('created_at', Incident.created_at),
+        ('resolved_at', Incident.resolved_at),
+    ], joins=[(_app, Incident.app_id == _app.app_id),
+              (_dept, _app.department_id == _dept.department_id)]),
+)}
+
+
+def row_query(session, model, fields=None):
+    """Column query for a list entity in its list order; returns (query, keys).
+
+    With fields, only those keys are selected, plus the sort keys that keyset
+    pagination needs. Filters from queries.filtered_query apply unchanged.
+    """
+    shape = SHAPES[model]
+    order = LIST_ORDER[model]
+    keys = list(shape.columns)
+    if fields is not None:
+        wanted = set(fields) | {column.key for column, _ in order}
+        keys = [key for key in keys if key in wanted]
+
+    query = session.query(*[shape.columns[key].label(key) for key in keys]).select_from(model)
+    for target, onclause in shape.joins:
+        query = query.outerjoin(target, onclause)
+    return query.order_by(*[column.desc() if descending else column for column, descending in order]), keys
+
+
+def serialize_rows(model, rows, keys, iso_dates=False):
+    """Rows from row_query() as dicts with the same values as the model's to_dict().
+
+    Dates are left as date/datetime objects for JSONProvider to format, unless
+    iso_dates is set (for encoders that need strings, such as CSV).
+    """
+    if not iso_dates:
+        return [dict(zip(keys, row)) for row in rows]
+    date_keys = SHAPES[model].date_keys
+    return [
+        {key: value.isoformat() if value is not None and key in date_keys else value
+         for key, value in zip(keys, row)}
+        for row in rows
+    ]
+
+
+# ==================== JSON ====================
+
+def _default(o):
+    """Types the encoders do not handle natively (dates only reach here without orjson)."""
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+
+    def dumps(obj):
+        """Compact JSON text, as used for NDJSON lines."""
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    def dumps(obj):
+        """Compact JSON text, as used for NDJSON lines."""
+        return json.dumps(obj, default=_default, separators=(',', ':'))
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that writes dates as ISO 8601, encoding with orjson when installed.
+
+    Output matches the default provider (sorted keys, indented in debug mode)
+    except that non-ASCII text is written as UTF-8 rather than escaped.
+    """
+
+    default = staticmethod(_default)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        option = _ORJSON_OPTIONS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(orjson.dumps(obj, default=_default, option=option), mimetype=self.mimetype)
@@ -57,6 +57,32 @@ function switchView(viewName) {
     }
 }
 
+// ==================== LIST TABLES ====================
+// List views render through a VirtualTable (static/virtual_table.js), so only the
+// rows in view are in the DOM however long the filtered list is
+const virtualTables = {};
+
+function listTable(tableId, renderRow) {
+    if (!virtualTables[tableId]) {
+        virtualTables[tableId] = new VirtualTable(document.getElementById(tableId), renderRow);
+    }
+    return virtualTables[tableId];
+}
+
+function showRows(tableId, rows, renderRow) {
+    listTable(tableId, renderRow).setRows(rows);
+}
+
+// Pages through a list endpoint (?limit=&after=) as the table scrolls
+function showPages(tableId, endpoint, params, renderRow) {
+    listTable(tableId, renderRow).setSource(new PagedSource(endpoint, params), { scrollToTop: true });
+}
+
+// Search boxes re-filter once typing pauses instead of on every keystroke
+const searchDepartments = debounce(renderDepartments);
+const searchApplications = debounce(renderApplications);
+const searchContacts = debounce(renderContacts);
+
 // ==================== API CALLS ====================
 async function apiCall(endpoint, method = 'GET', data = null) {
     const options = {
@@ -71,14 +97,12 @@ async function apiCall(endpoint, method = 'GET', data = null) {
 
 async function loadAllData() {
     try {
-        [departments, applications, integrations, contacts, activities, incidents] = await Promise.all([
-            apiCall('departments'),
-            apiCall('applications'),
-            apiCall('integrations'),
-            apiCall('contacts'),
-            apiCall('activities'),
-            apiCall('incidents')
-        ]);
+        const firstSync = syncToken === null;
+        await syncData();
+        // A list opened before the first sync was paging from the server
+        if (firstSync && document.getElementById('view-activities')?.classList.contains('active')) {
+            renderActivities();
+        }
         await loadTagColors(); // Load tag colors for rendering
         populateDynamicFilters();
     } catch (error) {
@@ -86,6 +110,80 @@ async function loadAllData() {
     }
 }
 
+// ==================== DATA SYNC ====================
+// The first load fetches every row; after that /api/sync returns only the rows
+// inserted or updated since the last token, plus the ids of deleted rows. Each
+// entity's rows live in a DataStore (static/data_store.js), which applies the
+// changes and keeps the filter indexes; the arrays above are its rows. Sort
+// orders match the list endpoints, and indexes cover the filter bar fields.
+let syncToken = null;
+
+const SYNC_ENTITIES = {
+    departments: {
+        key: 'department_id',
+        order: [['name', 1], ['department_id', 1]],
+        indexes: ['tier', 'status', 'owner_team'],
+        search: ['name', 'acronym'],
+        set: rows => { departments = rows; }
+    },
+    applications: {
+        key: 'app_id',
+        order: [['app_name', 1], ['app_id', 1]],
+        indexes: ['department_id', 'environment', 'auth_type', 'status'],
+        // auth_type holds a comma-separated list; index each type
+        indexValues: { auth_type: a => (a.auth_type || '').split(',').map(t => t.trim()).filter(t => t) },
+        search: ['app_name'],
+        set: rows => { applications = rows; }
+    },
+    integrations: {
+        key: 'integration_id',
+        order: [['integration_id', 1]],
+        indexes: ['department_id', 'stage', 'status', 'risk_level'],
+        set: rows => { integrations = rows; }
+    },
+    contacts: {
+        key: 'contact_id',
+        order: [['name', 1], ['contact_id', 1]],
+        indexes: ['department_id', 'role', 'active_flag'],
+        indexValues: { active_flag: c => (c.active_flag ? 1 : 0) },
+        search: ['name', 'email'],
+        set: rows => { contacts = rows; }
+    },
+    activities: {
+        key: 'activity_id',
+        order: [['date', -1], ['activity_id', -1]],
+        indexes: ['department_id', 'type', 'owner'],
+        set: rows => { activities = rows; }
+    },
+    incidents: {
+        key: 'incident_id',
+        order: [['created_at', -1], ['incident_id', -1]],
+        indexes: ['severity', 'status', 'app_id'],
+        set: rows => { incidents = rows; }
+    }
+};
+
+const stores = Object.fromEntries(
+    Object.entries(SYNC_ENTITIES).map(([entity, spec]) => [entity, new DataStore(spec)])
+);
+
+async function syncData() {
+    const result = await apiCall(syncToken === null ? 'sync' : `sync?since=${syncToken}`);
+    // A slower, older response must not overwrite a newer one
+    if (syncToken !== null && result.token < syncToken) return;
+
+    Object.entries(SYNC_ENTITIES).forEach(([entity, spec]) => {
+        const { upserts, deletes } = result.changes[entity];
+        if (result.reset) {
+            stores[entity].replace(upserts);
+        } else if (upserts.length || deletes.length) {
+            stores[entity].apply(upserts, deletes);
+        }
+        spec.set(stores[entity].rows);
+    });
+    syncToken = result.token;
+}
+
 // ==================== TAG COLOR MAPPING ====================
 let tagColorMap = {}; // Cache for tag colors
 
@@ -144,11 +242,28 @@ async function loadDashboard() {
         document.getElementById('stat-delayed').textContent = data.risk.delayed;
 
         document.getElementById('stat-open-incidents').textContent = data.incidents.open;
+
+        renderPipeline(data.pipeline);
     } catch (error) {
         console.error('Error loading dashboard:', error);
     }
 }
 
+// Integration funnel: one row per stage, with a bar scaled to the largest stage
+function renderPipeline(stages) {
+    const largest = Math.max(1, ...stages.map(s => s.count));
+    document.querySelector('#pipeline-table tbody').innerHTML = stages.map(s => `
+        <tr>
+            <td>${renderTagBadge('integration_stage', s.stage)}</td>
+            <td><span class="pipeline-bar" style="width: ${Math.round(s.count / largest * 120)}px"></span>${s.count}</td>
+            <td>${s.critical}</td>
+            <td>${s.blocked}</td>
+            <td>${s.delayed}</td>
+            <td>${s.high_risk}</td>
+        </tr>
+    `).join('');
+}
+
 // ==================== DEPARTMENTS ====================
 function renderDepartments() {
     const tierFilter = document.getElementById('filter-dept-tier')?.value || '';
@@ -156,29 +271,22 @@ function renderDepartments() {
     const ownerFilter = document.getElementById('filter-dept-owner')?.value || '';
     const searchFilter = (document.getElementById('filter-dept-search')?.value || '').toLowerCase();
 
-    let filtered = departments.filter(d => {
-        if (tierFilter && d.tier !== tierFilter) return false;
-        if (statusFilter && d.status !== statusFilter) return false;
-        if (ownerFilter && d.owner_team !== ownerFilter) return false;
-        if (searchFilter && !(d.name || '').toLowerCase().includes(searchFilter) && !(d.acronym || '').toLowerCase().includes(searchFilter)) return false;
-        return true;
-    });
-
-    const tbody = document.querySelector('#departments-table tbody');
-    tbody.innerHTML = filtered.map(d => `
-        <tr>
-            <td><strong>${d.name}</strong></td>
-            <td>${d.acronym || '-'}</td>
-            <td>${renderTagBadge('department_tier', d.tier)}</td>
-            <td>${renderTagBadge('department_status', d.status)}</td>
-            <td>${renderTagBadge('department_owner_team', d.owner_team)}</td>
-            <td>${d.app_count || 0}</td>
-            <td class="action-btns">
-                <button class="btn btn-secondary btn-sm" onclick="editDepartment(${d.department_id})">Edit</button>
-                <button class="btn btn-danger btn-sm" onclick="deleteDepartment(${d.department_id})">Delete</button>
-            </td>
-        </tr>
-    `).join('');
+    const filtered = stores.departments.filter(
+        { tier: tierFilter, status: statusFilter, owner_team: ownerFilter }, searchFilter
+    );
+
+    showRows('departments-table', filtered, d => `
+        <td><strong>${d.name}</strong></td>
+        <td>${d.acronym || '-'}</td>
+        <td>${renderTagBadge('department_tier', d.tier)}</td>
+        <td>${renderTagBadge('department_status', d.status)}</td>
+        <td>${renderTagBadge('department_owner_team', d.owner_team)}</td>
+        <td>${d.app_count || 0}</td>
+        <td class="action-btns">
+            <button class="btn btn-secondary btn-sm" onclick="editDepartment(${d.department_id})">Edit</button>
+            <button class="btn btn-danger btn-sm" onclick="deleteDepartment(${d.department_id})">Delete</button>
+        </td>
+    `);
 }
 
 // Helper function to build dropdown options from tags
@@ -257,7 +365,7 @@ async function showAddDepartmentModal() {
 }
 
 async function editDepartment(id) {
-    const dept = departments.find(d => d.department_id === id);
+    const dept = stores.departments.get(id);
     if (!dept) return;
 
     // Load tag options with current values selected
@@ -328,36 +436,28 @@ function renderApplications() {
     const statusFilter = document.getElementById('filter-app-status')?.value || '';
     const searchFilter = (document.getElementById('filter-app-search')?.value || '').toLowerCase();
 
-    let filtered = applications.filter(a => {
-        if (deptFilter && String(a.department_id) !== deptFilter) return false;
-        if (envFilter && a.environment !== envFilter) return false;
-        // Filter logical check for multiple auth types: checks if the filter value is IN the application's auth types
-        if (authFilter && !(a.auth_type || '').includes(authFilter)) return false;
-        if (statusFilter && a.status !== statusFilter) return false;
-        if (searchFilter && !(a.app_name || '').toLowerCase().includes(searchFilter)) return false;
-        return true;
-    });
+    // An application matches an auth type filter if the type is one of its auth types
+    const filtered = stores.applications.filter(
+        { department_id: deptFilter, environment: envFilter, auth_type: authFilter, status: statusFilter }, searchFilter
+    );
 
-    const tbody = document.querySelector('#applications-table tbody');
-    tbody.innerHTML = filtered.map(a => {
+    showRows('applications-table', filtered, a => {
         // Render multiple auth types
         const authTypes = (a.auth_type || '').split(',').map(t => t.trim()).filter(t => t);
         const authBadges = authTypes.map(type => renderTagBadge('application_auth_type', type)).join(' ');
 
         return `
-        <tr>
-            <td><strong>${a.app_name}</strong></td>
-            <td>${a.department_name || '-'}</td>
-            <td>${renderTagBadge('application_environment', a.environment)}</td>
-            <td>${authBadges || '-'}</td>
-            <td>${renderTagBadge('application_status', a.status)}</td>
-            <td>${a.go_live_date || '-'}</td>
-            <td class="action-btns">
-                <button class="btn btn-secondary btn-sm" onclick="editApplication(${a.app_id})">Edit</button>
-                <button class="btn btn-danger btn-sm" onclick="deleteApplication(${a.app_id})">Delete</button>
-            </td>
-        </tr>
-    `}).join('');
+        <td><strong>${a.app_name}</strong></td>
+        <td>${a.department_name || '-'}</td>
+        <td>${renderTagBadge('application_environment', a.environment)}</td>
+        <td>${authBadges || '-'}</td>
+        <td>${renderTagBadge('application_status', a.status)}</td>
+        <td>${a.go_live_date || '-'}</td>
+        <td class="action-btns">
+            <button class="btn btn-secondary btn-sm" onclick="editApplication(${a.app_id})">Edit</button>
+            <button class="btn btn-danger btn-sm" onclick="deleteApplication(${a.app_id})">Delete</button>
+        </td>
+    `});
 }
 
 async function showAddApplicationModal() {
@@ -438,7 +538,7 @@ async function showAddApplicationModal() {
 }
 
 async function editApplication(id) {
-    const app = applications.find(a => a.app_id === id);
+    const app = stores.applications.get(id);
     if (!app) return;
 
     const deptOptions = departments.map(d =>
@@ -535,33 +635,26 @@ function renderIntegrations() {
     const statusFilter = document.getElementById('filter-int-status')?.value || '';
     const riskFilter = document.getElementById('filter-int-risk')?.value || '';
 
-    let filtered = integrations.filter(i => {
-        if (deptFilter && String(i.department_id) !== deptFilter) return false;
-        if (stageFilter && i.stage !== stageFilter) return false;
-        if (statusFilter && i.status !== statusFilter) return false;
-        if (riskFilter && i.risk_level !== riskFilter) return false;
-        return true;
-    });
-
-    const tbody = document.querySelector('#integrations-table tbody');
-    tbody.innerHTML = filtered.map(i => `
-        <tr>
-            <td><strong>${i.app_name || '-'}</strong></td>
-            <td>${i.department_name || '-'}</td>
-            <td>${renderTagBadge('integration_stage', i.stage)}</td>
-            <td><span class="badge badge-${i.status}">${i.status.replace('_', ' ')}</span></td>
-            <td><span class="badge badge-${i.risk_level}">${i.risk_level}</span></td>
-            <td>${i.last_updated ? new Date(i.last_updated).toLocaleDateString() : '-'}</td>
-            <td>${i.notes || '-'}</td>
-            <td class="action-btns">
-                <button class="btn btn-secondary btn-sm" onclick="editIntegration(${i.integration_id})">Update</button>
-            </td>
-        </tr>
-    `).join('');
+    const filtered = stores.integrations.filter(
+        { department_id: deptFilter, stage: stageFilter, status: statusFilter, risk_level: riskFilter }
+    );
+
+    showRows('integrations-table', filtered, i => `
+        <td><strong>${i.app_name || '-'}</strong></td>
+        <td>${i.department_name || '-'}</td>
+        <td>${renderTagBadge('integration_stage', i.stage)}</td>
+        <td><span class="badge badge-${i.status}">${i.status.replace('_', ' ')}</span></td>
+        <td><span class="badge badge-${i.risk_level}">${i.risk_level}</span></td>
+        <td>${i.last_updated ? new Date(i.last_updated).toLocaleDateString() : '-'}</td>
+        <td>${i.notes || '-'}</td>
+        <td class="action-btns">
+            <button class="btn btn-secondary btn-sm" onclick="editIntegration(${i.integration_id})">Update</button>
+        </td>
+    `);
 }
 
 async function editIntegration(id) {
-    const integ = integrations.find(i => i.integration_id === id);
+    const integ = stores.integrations.get(id);
     if (!integ) return;
 
     // Load tag options with current value selected
@@ -624,29 +717,22 @@ function renderContacts() {
     const activeFilter = document.getElementById('filter-con-active')?.value || '';
     const searchFilter = (document.getElementById('filter-con-search')?.value || '').toLowerCase();
 
-    let filtered = contacts.filter(c => {
-        if (deptFilter && String(c.department_id) !== deptFilter) return false;
-        if (roleFilter && c.role !== roleFilter) return false;
-        if (activeFilter !== '' && String(c.active_flag ? 1 : 0) !== activeFilter) return false;
-        if (searchFilter && !(c.name || '').toLowerCase().includes(searchFilter) && !(c.email || '').toLowerCase().includes(searchFilter)) return false;
-        return true;
-    });
-
-    const tbody = document.querySelector('#contacts-table tbody');
-    tbody.innerHTML = filtered.map(c => `
-        <tr>
-            <td><strong>${c.name}</strong></td>
-            <td>${c.department_name || '-'}</td>
-            <td>${renderTagBadge('contact_role', c.role)}</td>
-            <td><a href="mailto:${c.email}">${c.email || '-'}</a></td>
-            <td>${c.phone || '-'}</td>
-            <td><span class="badge badge-${c.active_flag ? 'active' : 'inactive'}">${c.active_flag ? 'Yes' : 'No'}</span></td>
-            <td class="action-btns">
-                <button class="btn btn-secondary btn-sm" onclick="editContact(${c.contact_id})">Edit</button>
-                <button class="btn btn-danger btn-sm" onclick="deleteContact(${c.contact_id})">Delete</button>
-            </td>
-        </tr>
-    `).join('');
+    const filtered = stores.contacts.filter(
+        { department_id: deptFilter, role: roleFilter, active_flag: activeFilter }, searchFilter
+    );
+
+    showRows('contacts-table', filtered, c => `
+        <td><strong>${c.name}</strong></td>
+        <td>${c.department_name || '-'}</td>
+        <td>${renderTagBadge('contact_role', c.role)}</td>
+        <td><a href="mailto:${c.email}">${c.email || '-'}</a></td>
+        <td>${c.phone || '-'}</td>
+        <td><span class="badge badge-${c.active_flag ? 'active' : 'inactive'}">${c.active_flag ? 'Yes' : 'No'}</span></td>
+        <td class="action-btns">
+            <button class="btn btn-secondary btn-sm" onclick="editContact(${c.contact_id})">Edit</button>
+            <button class="btn btn-danger btn-sm" onclick="deleteContact(${c.contact_id})">Delete</button>
+        </td>
+    `);
 }
 
 async function showAddContactModal() {
@@ -699,7 +785,7 @@ async function showAddContactModal() {
 }
 
 async function editContact(id) {
-    const contact = contacts.find(c => c.contact_id === id);
+    const contact = stores.contacts.get(id);
     if (!contact) return;
 
     const deptOptions = departments.map(d =>
@@ -767,35 +853,42 @@ function renderActivities() {
     const dateFrom = document.getElementById('filter-act-date-from')?.value || '';
     const dateTo = document.getElementById('filter-act-date-to')?.value || '';
 
-    let filtered = activities.filter(a => {
-        if (deptFilter && String(a.department_id) !== deptFilter) return false;
-        if (typeFilter && a.type !== typeFilter) return false;
-        if (ownerFilter && a.owner !== ownerFilter) return false;
-        if (dateFrom && a.date && a.date < dateFrom) return false;
-        if (dateTo && a.date && a.date > dateTo) return false;
-        return true;
-    });
+    // Until the first sync has loaded every activity, page through the list
+    // endpoint with the same filters so the view does not wait for the whole table
+    if (syncToken === null) {
+        const params = Object.fromEntries(Object.entries({
+            department_id: deptFilter, type: typeFilter, owner: ownerFilter, date_from: dateFrom, date_to: dateTo
+        }).filter(([, value]) => value));
+        showPages('activities-table', 'activities', params, renderActivityRow);
+        return;
+    }
 
-    const tbody = document.querySelector('#activities-table tbody');
-    tbody.innerHTML = filtered.map(a => `
-        <tr>
-            <td>${a.date || '-'}</td>
-            <td>${renderTagBadge('activity_type', a.type)}</td>
-            <td><strong>${a.department_name || '-'}</strong></td>
-            <td>${a.app_name || '-'}</td>
-            <td>${a.summary || '-'}</td>
-            <td>${a.next_action || '-'}</td>
-            <td>${a.owner || '-'}</td>
-            <td class="action-btns">
-                <button class="btn btn-secondary btn-sm" onclick="editActivity(${a.activity_id})">Edit</button>
-                <button class="btn btn-danger btn-sm" onclick="deleteActivity(${a.activity_id})">Delete</button>
-            </td>
-        </tr>
-    `).join('');
+    const inDateRange = a => !(dateFrom && a.date && a.date < dateFrom) && !(dateTo && a.date && a.date > dateTo);
+    const filtered = stores.activities.filter(
+        { department_id: deptFilter, type: typeFilter, owner: ownerFilter }, '', dateFrom || dateTo ? inDateRange : null
+    );
+
+    showRows('activities-table', filtered, renderActivityRow);
+}
+
+function renderActivityRow(a) {
+    return `
+        <td>${a.date || '-'}</td>
+        <td>${renderTagBadge('activity_type', a.type)}</td>
+        <td><strong>${a.department_name || '-'}</strong></td>
+        <td>${a.app_name || '-'}</td>
+        <td>${a.summary || '-'}</td>
+        <td>${a.next_action || '-'}</td>
+        <td>${a.owner || '-'}</td>
+        <td class="action-btns">
+            <button class="btn btn-secondary btn-sm" onclick="editActivity(${a.activity_id})">Edit</button>
+            <button class="btn btn-danger btn-sm" onclick="deleteActivity(${a.activity_id})">Delete</button>
+        </td>
+    `;
 }
 
 async function editActivity(id) {
-    const activity = activities.find(a => a.activity_id === id);
+    const activity = stores.activities.get(id);
     if (!activity) return;
 
     const deptOptions = departments.map(d =>
@@ -938,30 +1031,26 @@ function renderIncidents() {
     const dateFrom = document.getElementById('filter-inc-date-from')?.value || '';
     const dateTo = document.getElementById('filter-inc-date-to')?.value || '';
 
-    let filtered = incidents.filter(i => {
-        if (severityFilter && i.severity !== severityFilter) return false;
-        if (statusFilter && i.status !== statusFilter) return false;
-        if (appFilter && String(i.app_id) !== appFilter) return false;
-        if (dateFrom && i.created_at && i.created_at.split('T')[0] < dateFrom) return false;
-        if (dateTo && i.created_at && i.created_at.split('T')[0] > dateTo) return false;
-        return true;
-    });
-
-    const tbody = document.querySelector('#incidents-table tbody');
-    tbody.innerHTML = filtered.map(i => `
-        <tr>
-            <td>#${i.incident_id}</td>
-            <td><strong>${i.app_name || '-'}</strong><br><small>${i.department_name || ''}</small></td>
-            <td><span class="badge badge-${i.severity}">${i.severity}</span></td>
-            <td><span class="badge badge-${i.status}">${i.status}</span></td>
-            <td>${i.description || '-'}</td>
-            <td>${i.created_at ? new Date(i.created_at).toLocaleDateString() : '-'}</td>
-            <td>${i.resolved_at ? new Date(i.resolved_at).toLocaleDateString() : '-'}</td>
-            <td class="action-btns">
-                <button class="btn btn-secondary btn-sm" onclick="editIncident(${i.incident_id})">Update</button>
-            </td>
-        </tr>
-    `).join('');
+    const inDateRange = i => {
+        const created = i.created_at ? i.created_at.split('T')[0] : null;
+        return !(dateFrom && created && created < dateFrom) && !(dateTo && created && created > dateTo);
+    };
+    const filtered = stores.incidents.filter(
+        { severity: severityFilter, status: statusFilter, app_id: appFilter }, '', dateFrom || dateTo ? inDateRange : null
+    );
+
+    showRows('incidents-table', filtered, i => `
+        <td>#${i.incident_id}</td>
+        <td><strong>${i.app_name || '-'}</strong><br><small>${i.department_name || ''}</small></td>
+        <td><span class="badge badge-${i.severity}">${i.severity}</span></td>
+        <td><span class="badge badge-${i.status}">${i.status}</span></td>
+        <td>${i.description || '-'}</td>
+        <td>${i.created_at ? new Date(i.created_at).toLocaleDateString() : '-'}</td>
+        <td>${i.resolved_at ? new Date(i.resolved_at).toLocaleDateString() : '-'}</td>
+        <td class="action-btns">
+            <button class="btn btn-secondary btn-sm" onclick="editIncident(${i.incident_id})">Update</button>
+        </td>
+    `);
 }
 
 function showAddIncidentModal() {
@@ -1006,7 +1095,7 @@ function showAddIncidentModal() {
 }
 
 async function editIncident(id) {
-    const incident = incidents.find(i => i.incident_id === id);
+    const incident = stores.incidents.get(id);
     if (!incident) return;
 
     showModal('Update Incident', `
@@ -1060,8 +1149,10 @@ async function editIncident(id) {
 }
 
 // ==================== CHAT ====================
-// Chat history for multi-turn conversations
+// Chat history shown in the panel; the server keeps the conversation itself
+// under chatSessionId, so each request sends only the new message
 let chatHistory = [];
+let chatSessionId = null;
 let chartInstances = {};  // Store chart instances to destroy before creating new ones
 
 function initChatButtons() {
@@ -1079,6 +1170,10 @@ function initChatButtons() {
 
 function clearChatHistory() {
     chatHistory = [];
+    if (chatSessionId) {
+        apiCall(`chat/sessions/${chatSessionId}`, 'DELETE').catch(() => {});
+        chatSessionId = null;
+    }
     // Destroy all chart instances
     Object.values(chartInstances).forEach(chart => chart.destroy());
     chartInstances = {};
@@ -1132,36 +1227,33 @@ async function sendChatMessage() {
     `;
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
 
+    let streamState = null;
+
     try {
-        const response = await apiCall('chat', 'POST', {
-            message,
-            history: chatHistory.slice(0, -1)  // Send history without the current message
+        const reply = await streamChatResponse(message, (text) => {
+            // First chunk replaces the thinking indicator with the message being written
+            if (!streamState) {
+                document.getElementById('thinking')?.remove();
+                streamState = createStreamingMessage(messagesContainer);
+            }
+            updateStreamingMessage(streamState, text);
+            messagesContainer.scrollTop = messagesContainer.scrollHeight;
         });
 
-        // Remove thinking indicator
         document.getElementById('thinking')?.remove();
+        if (!streamState) streamState = createStreamingMessage(messagesContainer);
+        updateStreamingMessage(streamState, reply, true);
 
-        if (response.error) {
-            messagesContainer.innerHTML += `
-                <div class="chat-message assistant error">
-                    <p>Error: ${escapeHtml(response.error)}</p>
-                </div>
-            `;
-            // Remove failed message from history
-            chatHistory.pop();
-        } else {
-            const formattedResponse = formatChatResponse(response.response, messagesContainer);
-
-            // Add assistant message to history
-            chatHistory.push({ role: 'assistant', content: response.response });
-        }
+        // Add assistant message to history
+        chatHistory.push({ role: 'assistant', content: reply });
     } catch (error) {
         document.getElementById('thinking')?.remove();
-        messagesContainer.innerHTML += `
+        const errorText = error.serverMessage || 'Failed to get response. Please try again.';
+        messagesContainer.insertAdjacentHTML('beforeend', `
             <div class="chat-message assistant error">
-                <p>Error: Failed to get response. Please try again.</p>
+                <p>Error: ${escapeHtml(errorText)}</p>
             </div>
-        `;
+        `);
         // Remove failed message from history
         chatHistory.pop();
     }
@@ -1173,68 +1265,163 @@ async function sendChatMessage() {
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
 }
 
+// Returns the full reply text. Chunks are delivered to onText as the accumulated
+// text so far; falls back to the non-streaming endpoint when the browser cannot
+// read the response body as a stream. Adopts the session id the server answers
+// with (a new one when the conversation had expired).
+async function streamChatResponse(message, onText) {
+    const body = { message, session_id: chatSessionId };
+    const headers = { 'Content-Type': 'application/json' };
+
+    if (!window.ReadableStream || !window.TextDecoder) {
+        const response = await apiCall('chat', 'POST', body);
+        if (response.error) throw chatError(response.error);
+        chatSessionId = response.session_id;
+        return response.response;
+    }
+
+    const response = await fetch('/api/chat/stream', { method: 'POST', headers, body: JSON.stringify(body) });
+    if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        throw chatError(data.error);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line; keep any partial event for the next read
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const event = parseSseEvent(buffer.substring(0, boundary));
+            buffer = buffer.substring(boundary + 2);
+            if (!event) continue;
+
+            if (event.type === 'error') throw chatError(event.data.error);
+            if (event.type === 'done') {
+                chatSessionId = event.data.session_id;
+                return text;
+            }
+            if (event.data.text) {
+                text += event.data.text;
+                onText(text);
+            }
+        }
+    }
+
+    // Stream closed without a done event
+    throw chatError(null);
+}
+
+function parseSseEvent(raw) {
+    let type = 'message';
+    const dataLines = [];
+    raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) type = line.substring(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.substring(5).trim());
+    });
+    // Comment-only events (": ...") carry no data
+    if (!dataLines.length) return null;
+    return { type, data: JSON.parse(dataLines.join('\n')) };
+}
+
+function chatError(serverMessage) {
+    const error = new Error(serverMessage || 'Chat request failed');
+    error.serverMessage = serverMessage;
+    return error;
+}
+
 function formatChatResponse(text, container) {
+    const state = createStreamingMessage(container);
+    updateStreamingMessage(state, text, true);
+    return state.messageDiv;
+}
+
+// Incremental rendering of an assistant message. Text before a chart block and the
+// chart itself are final once the block's closing fence arrives; only the trailing
+// text paragraph is rewritten as more tokens come in, so charts are drawn once.
+function createStreamingMessage(container) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'chat-message assistant';
+    container.appendChild(messageDiv);
+    return { messageDiv, chartsRendered: 0, tail: null, pending: null };
+}
+
+function updateStreamingMessage(state, text, final = false) {
     // Check for chart blocks
     const chartRegex = /```chart\s*\n?([\s\S]*?)```/g;
     let lastIndex = 0;
-    let hasChart = false;
+    let blockIndex = 0;
     let match;
 
-    // Create a message container div
-    const messageDiv = document.createElement('div');
-    messageDiv.className = 'chat-message assistant';
-
     while ((match = chartRegex.exec(text)) !== null) {
-        hasChart = true;
-
-        // Add text before chart
-        const textBefore = text.substring(lastIndex, match.index);
-        if (textBefore.trim()) {
-            const textP = document.createElement('p');
-            textP.innerHTML = formatMarkdownText(textBefore);
-            messageDiv.appendChild(textP);
+        if (blockIndex >= state.chartsRendered) {
+            // Newly completed chart: settle the text before it, then draw it
+            setStreamingText(state, text.substring(lastIndex, match.index));
+            state.tail = null;
+            appendChartBlock(state.messageDiv, match[1]);
+            state.chartsRendered++;
         }
-
-        // Create chart container
-        try {
-            const chartData = JSON.parse(match[1]);
-            const chartContainer = createChartElement(chartData);
-            messageDiv.appendChild(chartContainer);
-        } catch (e) {
-            console.error('Failed to parse chart data:', e);
-            const errorP = document.createElement('p');
-            errorP.style.color = '#e74c3c';
-            errorP.textContent = 'Failed to render chart';
-            messageDiv.appendChild(errorP);
-        }
-
+        blockIndex++;
         lastIndex = match.index + match[0].length;
     }
 
-    // Add remaining text after last chart (or all text if no chart)
-    const remainingText = text.substring(lastIndex);
-    if (remainingText.trim()) {
-        const textP = document.createElement('p');
-        textP.innerHTML = formatMarkdownText(remainingText);
-        messageDiv.appendChild(textP);
+    let remainingText = text.substring(lastIndex);
+    let chartPending = false;
+    if (!final) {
+        // Hold back an unterminated chart block, or the start of its opening fence
+        const fenceStart = remainingText.indexOf('```chart');
+        if (fenceStart !== -1) {
+            remainingText = remainingText.substring(0, fenceStart);
+            chartPending = true;
+        } else {
+            remainingText = remainingText.replace(/`{1,3}(c(h(a(r)?)?)?)?$/, '');
+        }
     }
+    setStreamingText(state, remainingText);
 
-    container.appendChild(messageDiv);
+    if (chartPending && !state.pending) {
+        state.pending = document.createElement('p');
+        state.pending.innerHTML = '<span class="thinking-dots">Preparing chart</span>';
+    }
+    if (state.pending) {
+        if (chartPending) state.messageDiv.appendChild(state.pending);  // keep it last
+        else state.pending.remove();
+    }
+}
 
-    // Initialize any charts
-    messageDiv.querySelectorAll('.chart-canvas').forEach(canvas => {
-        const chartDataStr = canvas.dataset.chart;
-        if (chartDataStr) {
-            try {
-                const chartData = JSON.parse(chartDataStr);
-                renderChart(canvas, chartData);
-            } catch (e) {
-                console.error('Failed to render chart:', e);
-            }
-        }
-    });
+function setStreamingText(state, text) {
+    if (!text.trim()) {
+        state.tail?.remove();
+        state.tail = null;
+        return;
+    }
+    if (!state.tail) {
+        state.tail = document.createElement('p');
+        state.messageDiv.appendChild(state.tail);
+    }
+    state.tail.innerHTML = formatMarkdownText(text);
+}
 
-    return messageDiv;
+function appendChartBlock(messageDiv, chartJson) {
+    try {
+        const chartData = JSON.parse(chartJson);
+        const chartContainer = createChartElement(chartData);
+        messageDiv.appendChild(chartContainer);
+        renderChart(chartContainer.querySelector('.chart-canvas'), chartData);
+    } catch (e) {
+        console.error('Failed to parse chart data:', e);
+        const errorP = document.createElement('p');
+        errorP.style.color = '#e74c3c';
+        errorP.textContent = 'Failed to render chart';
+        messageDiv.appendChild(errorP);
+    }
 }
 
 function formatMarkdownText(text) {
@@ -1359,7 +1546,7 @@ function populateDynamicFilters() {
     }
 
     // Departments tab: Owner Team (dynamic from data)
-    populateSelect('filter-dept-owner', departments, d => d.owner_team, d => d.owner_team);
+    populateSelect('filter-dept-owner', stores.departments.values('owner_team'), o => o, o => o);
 
     // Applications tab: Department dropdown
     populateSelect('filter-app-dept', departments, d => String(d.department_id), d => d.name);
@@ -1372,7 +1559,7 @@ function populateDynamicFilters() {
 
     // Activities tab: Department + Owner (dynamic)
     populateSelect('filter-act-dept', departments, d => String(d.department_id), d => d.name);
-    populateSelect('filter-act-owner', activities, a => a.owner, a => a.owner);
+    populateSelect('filter-act-owner', stores.activities.values('owner'), o => o, o => o);
 
     // Incidents tab: Application dropdown
     populateSelect('filter-inc-app', applications, a => String(a.app_id), a => a.app_name);
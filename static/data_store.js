@@ -0,0 +1,225 @@
+// ==================== DATA STORES ====================
+// A DataStore holds one synced entity's rows in list order, an inverted index
+// per filter field (value -> the rows having it) and a lowercase search key per
+// row, so list views and filter dropdowns do not scan every row. Sync deltas
+// update the indexes and move only the changed rows within the list. Search
+// text is still matched row by row, but only against the rows the indexed
+// filters left, and typing more of a search narrows the previous matches.
+
+const POSITION = Symbol('position');
+const SEARCH_KEY = Symbol('searchKey');
+
+// Deltas larger than this re-sort the list instead of moving rows one at a time
+const BULK_DELTA_ROWS = 1000;
+
+const NO_ROWS = new Set();
+
+// Comparator for [[field, 1 | -1], ...]; nulls sort first ascending, as in SQLite
+function compareRows(order) {
+    return (a, b) => {
+        for (const [field, direction] of order) {
+            const x = a[field] ?? null;
+            const y = b[field] ?? null;
+            if (x === y) continue;
+            if (x === null) return -direction;
+            if (y === null) return direction;
+            return (x < y ? -1 : 1) * direction;
+        }
+        return 0;
+    };
+}
+
+class DataStore {
+    // key: id field; order: list sort order for compareRows(); indexes: fields to
+    // index, with indexValues[field](row) overriding the value (or list of values)
+    // a row is indexed under; search: fields matched by the search text
+    constructor({ key, order, indexes = [], indexValues = {}, search = [] }) {
+        this.key = key;
+        this.compare = compareRows(order);
+        this.indexed = indexes.map(field => [field, indexValues[field] || (row => row[field])]);
+        this.indexes = new Map(indexes.map(field => [field, new Map()]));
+        this.searchFields = search;
+        this.rows = [];
+        this.byId = new Map();
+        this.positionsStale = false;
+        this.searchKeys = [];         // by list position
+        this.ordered = new Map();     // 'field\0value' -> its rows in list order
+        this.marks = new Uint8Array(0);
+        this.lastSearch = null;
+    }
+
+    get(id) {
+        return this.byId.get(id);
+    }
+
+    // Replace every row (a full sync); rows arrive in list order
+    replace(rows) {
+        this.rows = rows;
+        this.byId = new Map();
+        this.indexes.forEach(index => index.clear());
+        rows.forEach(row => this.add(row));
+        this.changed();
+    }
+
+    // Apply a sync delta: upserted rows replace or join the list in sort order
+    apply(upserts, deletes) {
+        this.refreshPositions();
+        const removed = [];
+        deletes.forEach(id => {
+            const row = this.byId.get(id);
+            if (row) removed.push(this.remove(row));
+        });
+        upserts.forEach(row => {
+            const old = this.byId.get(row[this.key]);
+            if (old) removed.push(this.remove(old));
+            this.add(row);
+        });
+
+        if (removed.length + upserts.length > BULK_DELTA_ROWS) {
+            this.rows = this.rows.filter(row => this.byId.get(row[this.key]) === row);
+            this.rows.push(...upserts);
+            this.rows.sort(this.compare);
+        } else {
+            // Remove from the end first so the remaining positions stay valid
+            removed.map(row => row[POSITION]).sort((a, b) => b - a).forEach(position => this.rows.splice(position, 1));
+            upserts.forEach(row => this.rows.splice(this.insertionPoint(row), 0, row));
+        }
+        this.changed();
+    }
+
+    add(row) {
+        this.byId.set(row[this.key], row);
+        for (const [field, valuesOf] of this.indexed) {
+            const index = this.indexes.get(field);
+            for (const value of this.indexKeys(valuesOf(row))) {
+                if (!index.has(value)) index.set(value, new Set());
+                index.get(value).add(row);
+            }
+        }
+        row[SEARCH_KEY] = this.searchFields.map(field => row[field] ?? '').join('\u0000').toLowerCase();
+    }
+
+    remove(row) {
+        this.byId.delete(row[this.key]);
+        for (const [field, valuesOf] of this.indexed) {
+            const index = this.indexes.get(field);
+            for (const value of this.indexKeys(valuesOf(row))) {
+                const rows = index.get(value);
+                rows.delete(row);
+                if (!rows.size) index.delete(value);
+            }
+        }
+        return row;
+    }
+
+    // Index keys are strings, like the values of the filter dropdowns
+    indexKeys(value) {
+        return (Array.isArray(value) ? value : [value]).map(v => (v === null || v === undefined ? '' : String(v)));
+    }
+
+    changed() {
+        this.positionsStale = true;
+        this.ordered.clear();
+        this.lastSearch = null;
+    }
+
+    refreshPositions() {
+        if (!this.positionsStale) return;
+        this.searchKeys = new Array(this.rows.length);
+        this.rows.forEach((row, position) => {
+            row[POSITION] = position;
+            this.searchKeys[position] = row[SEARCH_KEY];
+        });
+        this.positionsStale = false;
+    }
+
+    insertionPoint(row) {
+        let low = 0;
+        let high = this.rows.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (this.compare(this.rows[middle], row) <= 0) low = middle + 1;
+            else high = middle;
+        }
+        return low;
+    }
+
+    // Distinct non-empty values of an indexed field, sorted
+    values(field) {
+        return [...this.indexes.get(field).keys()].filter(value => value !== '').sort();
+    }
+
+    // Rows in list order whose indexed fields equal criteria ({field: value}, ''
+    // for any), whose search fields contain the search text, and that pass where.
+    // The result may be shared with the store, so callers must not modify it.
+    filter(criteria = {}, search = '', where = null) {
+        const terms = Object.entries(criteria)
+            .filter(([, value]) => value !== '' && value !== null && value !== undefined)
+            .map(([field, value]) => [field, String(value)]);
+        const text = search.toLowerCase();
+        const signature = JSON.stringify(terms);
+        this.refreshPositions();
+
+        // Typing more of the same search only narrows the previous matches
+        const last = this.lastSearch;
+        let rows;
+        if (text && last && last.signature === signature && text.includes(last.text)) {
+            rows = last.rows;
+        } else {
+            rows = this.matching(terms);
+        }
+        if (text) {
+            rows = this.search(rows, text);
+            this.lastSearch = { signature, text, rows };
+        }
+        return where ? rows.filter(where) : rows;
+    }
+
+    // Rows having every [field, value] term, starting from the rarest value
+    matching(terms) {
+        if (!terms.length) return this.rows;
+        const sets = terms
+            .map(([field, value]) => [field, value, this.indexes.get(field).get(value) || NO_ROWS])
+            .sort((a, b) => a[2].size - b[2].size);
+        const [[field, value], ...others] = sets;
+        const rows = this.rowsWith(field, value);
+        return others.length ? rows.filter(row => others.every(([, , set]) => set.has(row))) : rows;
+    }
+
+    search(rows, text) {
+        const keys = this.searchKeys;
+        if (rows === this.rows) {
+            const result = [];
+            for (let position = 0; position < keys.length; position++) {
+                if (keys[position].includes(text)) result.push(rows[position]);
+            }
+            return result;
+        }
+        return rows.filter(row => keys[row[POSITION]].includes(text));
+    }
+
+    // The rows indexed under one value, in list order; cached until the rows change
+    rowsWith(field, value) {
+        const cacheKey = `${field}\u0000${value}`;
+        if (!this.ordered.has(cacheKey)) {
+            this.ordered.set(cacheKey, this.inListOrder(this.indexes.get(field).get(value) || NO_ROWS));
+        }
+        return this.ordered.get(cacheKey);
+    }
+
+    inListOrder(set) {
+        if (set.size * 16 < this.rows.length) {
+            return [...set].sort((a, b) => a[POSITION] - b[POSITION]);
+        }
+        // A large set: mark its positions, then collect them in one ordered pass
+        if (this.marks.length < this.rows.length) this.marks = new Uint8Array(this.rows.length);
+        set.forEach(row => { this.marks[row[POSITION]] = 1; });
+        const result = [];
+        for (let position = 0; position < this.rows.length; position++) {
+            if (!this.marks[position]) continue;
+            this.marks[position] = 0;
+            result.push(this.rows[position]);
+        }
+        return result;
+    }
+}
@@ -0,0 +1,201 @@
+// ==================== VIRTUAL TABLES ====================
+// A VirtualTable keeps only the rows inside its scroll viewport (plus a few
+// either side) in the DOM. Rows have a fixed height, so the rows above and below
+// the window are replaced by two spacer rows, and the <tr> elements that scroll
+// out of the window are reused for the rows scrolling in.
+//
+// Rows come from a source: { length, hasMore, get(index), ensure(count) }.
+// ArraySource wraps an array already in memory; PagedSource reads a paginated
+// list endpoint (?limit=&after=) and fetches the next page as the table nears
+// the end of what it has loaded.
+
+const FILTER_DEBOUNCE_MS = 150;
+
+// Delay fn until calls have stopped for `wait` ms (for filters typed into)
+function debounce(fn, wait = FILTER_DEBOUNCE_MS) {
+    let timer = null;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), wait);
+    };
+}
+
+class ArraySource {
+    constructor(rows = []) {
+        this.rows = rows;
+        this.hasMore = false;
+    }
+
+    get length() {
+        return this.rows.length;
+    }
+
+    get(index) {
+        return this.rows[index];
+    }
+
+    ensure() {
+        return Promise.resolve();
+    }
+}
+
+class PagedSource {
+    constructor(endpoint, params = {}, pageSize = 200) {
+        this.endpoint = endpoint;
+        this.params = params;
+        this.pageSize = pageSize;
+        this.rows = [];
+        this.cursor = null;
+        this.hasMore = true;
+        this.pending = null;
+    }
+
+    get length() {
+        return this.rows.length;
+    }
+
+    get(index) {
+        return this.rows[index];
+    }
+
+    // Load pages until `count` rows are available or the endpoint runs out
+    ensure(count) {
+        if (count <= this.rows.length || !this.hasMore) return Promise.resolve();
+        if (!this.pending) {
+            this.pending = this.loadPage().finally(() => { this.pending = null; });
+        }
+        return this.pending.then(() => this.ensure(count));
+    }
+
+    async loadPage() {
+        const query = new URLSearchParams({ ...this.params, limit: this.pageSize });
+        if (this.cursor) query.set('after', this.cursor);
+        const response = await fetch(`/api/${this.endpoint}?${query}`);
+        if (!response.ok) {
+            this.hasMore = false;
+            throw new Error(`Failed to load ${this.endpoint}: ${response.status}`);
+        }
+        const page = await response.json();
+        this.rows.push(...page.items);
+        this.cursor = page.next_cursor;
+        this.hasMore = Boolean(page.next_cursor) && page.items.length > 0;
+    }
+}
+
+class VirtualTable {
+    // renderRow(row) returns the cells of one row as HTML
+    constructor(table, renderRow, { rowHeight = 49, overscan = 10 } = {}) {
+        this.table = table;
+        this.container = table.parentElement;
+        this.tbody = table.tBodies[0];
+        this.renderRow = renderRow;
+        this.rowHeight = rowHeight;
+        this.measured = false;
+        this.overscan = overscan;
+        this.source = new ArraySource();
+        this.visible = new Map();  // row index -> <tr> showing it
+        this.spare = [];           // detached <tr> elements ready for reuse
+        this.frame = null;
+
+        this.topSpacer = this.createSpacer();
+        this.bottomSpacer = this.createSpacer();
+        this.tbody.replaceChildren(this.topSpacer, this.bottomSpacer);
+        this.container.classList.add('virtual-scroll');
+        this.container.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        window.addEventListener('resize', () => this.scheduleRender());
+    }
+
+    // A row holding one empty cell that stands in for the rows scrolled past
+    createSpacer() {
+        const tr = document.createElement('tr');
+        tr.className = 'virtual-spacer';
+        tr.setAttribute('aria-hidden', 'true');
+        tr.innerHTML = `<td colspan="${this.table.tHead ? this.table.tHead.rows[0].cells.length : 1}"></td>`;
+        return tr;
+    }
+
+    // Show an array of rows, re-rendering the visible ones (their data may have changed)
+    setRows(rows) {
+        this.setSource(new ArraySource(rows));
+    }
+
+    setSource(source, { scrollToTop = false } = {}) {
+        this.source = source;
+        [...this.visible.values(), ...this.spare].forEach(tr => { tr.row = undefined; });
+        if (scrollToTop) this.container.scrollTop = 0;
+        this.render();
+    }
+
+    scheduleRender() {
+        if (this.frame !== null) return;
+        this.frame = requestAnimationFrame(() => {
+            this.frame = null;
+            this.render();
+        });
+    }
+
+    // Rows [first, last) to keep in the DOM for the current scroll position, and the window size
+    visibleRange() {
+        const header = this.table.tHead ? this.table.tHead.offsetHeight : 0;
+        const viewport = this.container.clientHeight || window.innerHeight;
+        const top = Math.max(0, this.container.scrollTop - header);
+        const size = Math.ceil(viewport / this.rowHeight) + 2 * this.overscan;
+        // The scroll position can be past the end when the rows were just replaced by fewer
+        const first = Math.max(0, Math.min(Math.floor(top / this.rowHeight) - this.overscan, this.source.length - size));
+        return [first, Math.min(this.source.length, first + size), size];
+    }
+
+    render() {
+        const source = this.source;
+        const [first, last, size] = this.visibleRange();
+
+        // Release rows that left the window; keep the rest as they are
+        for (const [index, tr] of this.visible) {
+            if (index < first || index >= last) {
+                this.visible.delete(index);
+                tr.remove();
+                this.spare.push(tr);
+            }
+        }
+
+        // Fill the window in order, reusing released rows and re-rendering only rows whose data changed
+        let previous = this.topSpacer;
+        for (let index = first; index < last; index++) {
+            let tr = this.visible.get(index);
+            if (!tr) {
+                tr = this.spare.pop() || document.createElement('tr');
+                this.visible.set(index, tr);
+            }
+            const row = source.get(index);
+            if (tr.row !== row) {
+                tr.innerHTML = this.renderRow(row);
+                tr.row = row;
+            }
+            if (previous.nextSibling !== tr) previous.after(tr);
+            previous = tr;
+        }
+
+        this.topSpacer.firstChild.style.height = `${first * this.rowHeight}px`;
+        this.bottomSpacer.firstChild.style.height = `${(source.length - last) * this.rowHeight}px`;
+
+        // Row height comes from the stylesheet; measure it once rows exist
+        if (!this.measured && last > first) {
+            const height = this.visible.get(first).getBoundingClientRect().height;
+            if (height > 0) {
+                this.measured = true;
+                if (Math.abs(height - this.rowHeight) > 0.5) {
+                    this.rowHeight = height;
+                    this.render();
+                    return;
+                }
+            }
+        }
+
+        // A paged source fetches ahead once the window is within a screen of its end
+        if (source.hasMore && last + size > source.length) {
+            source.ensure(last + size)
+                .then(() => { if (source === this.source) this.scheduleRender(); })
+                .catch(error => console.error(error));
+        }
+    }
+}
@@ -0,0 +1,74 @@
+from sqlalchemy import delete, func, select, text
+
+from models import ChangeLog
+from queries import ENTITY_MODELS
+from serializers import row_query, serialize_rows
+
+
+# Delta sync over change_log, which SQLite triggers fill on every write to a list
+# entity (see migration 3 in database.py). A client's token is the highest seq it
+# has seen; it asks for everything logged after it. A logged row that no longer
+# exists is sent as a tombstone (its id under 'deletes').
+
+
+def current_token(session):
+    """Highest seq ever assigned in change_log (0 for none), including pruned entries."""
+    return session.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")).scalar() or 0
+
+
+def oldest_token(session):
+    """Lowest token that can still be synced from; older ones need a full reload."""
+    first = session.execute(select(func.min(ChangeLog.seq))).scalar()
+    return current_token(session) if first is None else first - 1
+
+
+def _rows(session, model, ids=None):
+    query, keys = row_query(session, model)
+    if ids is not None:
+        pk = model.__table__.primary_key.columns.values()[0]
+        query = query.filter(pk.in_(ids))
+    return serialize_rows(model, query.all(), keys)
+
+
+def snapshot(session):
+    """Every row of every list entity, in list order."""
+    return {entity: {'upserts': _rows(session, model), 'deletes': []} for entity, model in ENTITY_MODELS.items()}
+
+
+def changes_between(session, since, token):
+    """Rows of each list entity logged in (since, token], as upserts and tombstones."""
+    changes = {}
+    for entity, model in ENTITY_MODELS.items():
+        logged = (
+            select(ChangeLog.row_id)
+            .where(ChangeLog.seq > since, ChangeLog.seq <= token, ChangeLog.table_name == model.__tablename__)
+            .distinct()
+        )
+        ids = set(session.execute(logged).scalars())
+        upserts = _rows(session, model, logged) if ids else []
+        pk = model.__table__.primary_key.columns.values()[0].key
+        changes[entity] = {'upserts': upserts, 'deletes': sorted(ids - {row[pk] for row in upserts})}
+    return changes
+
+
+def sync(session, since=None):
+    """Changes since a token: {'token': ..., 'reset': bool, 'changes': {entity: {'upserts', 'deletes'}}}.
+
+    Without a token, or with one the pruned log no longer covers, every row is
+    returned with reset set, and the client replaces its data instead of merging.
+    The token is read before the rows, so a write that lands in between is sent
+    again on the next sync rather than missed.
+    """
+    token = current_token(session)
+    if since is None or since > token or since < oldest_token(session):
+        return {'token': token, 'reset': True, 'changes': snapshot(session)}
+    return {'token': token, 'reset': False, 'changes': changes_between(session, since, token)}
+
+
+def prune_change_log(session, max_age_days):
+    """Delete log entries older than max_age_days; returns the number removed."""
+    result = session.execute(
+        delete(ChangeLog).where(ChangeLog.changed_at < func.datetime('now', f'-{int(max_age_days)} days'))
+    )
+    session.commit()
+    return result.rowcount
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from models import Base
 
@@ -41,9 +41,13 @@ class Tag(Base):
     Each tag has a value (stored in database), label (displayed to users), and optional color.
     """
     __tablename__ = 'tags'
+    __table_args__ = (
+        # One tag per value in a category, enforced across processes
+        Index('ux_tags_category_value', 'category_id', 'value', unique=True),
+    )
     
     tag_id = Column(Integer, primary_key=True, autoincrement=True)
-    category_id = Column(Integer, ForeignKey('tag_categories.category_id'), nullable=False)
+    category_id = Column(Integer, ForeignKey('tag_categories.category_id'), nullable=False, index=True)
     value = Column(String(50), nullable=False)  # Internal value stored in records
     label = Column(String(100), nullable=False)  # Display label for users
     color = Column(String(20))  # Hex color code for UI (e.g., '#3498DB')
@@ -68,3 +72,24 @@ class Tag(Base):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class TagUsage(Base):
+    """
+    Number of records holding each value of a tag-backed field.
+    Maintained by tag_usage.py on every write so "in use" checks are a key lookup.
+    """
+    __tablename__ = 'tag_usage'
+    
+    entity_type = Column(String(50), primary_key=True)  # e.g., 'department'
+    field_name = Column(String(50), primary_key=True)  # e.g., 'tier'
+    value = Column(String(100), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'entity_type': self.entity_type,
+            'field_name': self.field_name,
+            'value': self.value,
+            'count': self.count
+        }
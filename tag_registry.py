@@ -0,0 +1,162 @@
+import threading
+import time
+from types import MappingProxyType
+
+import versions
+from queries import list_query
+from tag_models import TagCategory
+
+
+# Tables the registry is built from; their versions decide when it is rebuilt
+TAG_TABLES = ('tag_categories', 'tags')
+
+# Fields holding several comma-separated tag values
+MULTI_VALUE_FIELDS = {('application', 'auth_type')}
+
+
+def split_values(entity_type, field_name, value):
+    """Tag values held by a field value (a list or comma-separated string for multi-value fields)."""
+    if value is None or value == '':
+        return []
+    if (entity_type, field_name) in MULTI_VALUE_FIELDS:
+        items = value if isinstance(value, list) else str(value).split(',')
+        return [str(item).strip() for item in items if str(item).strip()]
+    return [str(value)]
+
+
+class TagRegistry:
+    """Immutable snapshot of every tag category and tag at one data version.
+
+    Lookups by category name, (category, value), tag id and (entity_type, field)
+    are dictionary reads. The serialized payloads are shared between requests
+    and must be treated as read-only.
+    """
+
+    def __init__(self, version, categories):
+        self.version = version
+        self.built_at = time.monotonic()
+
+        by_name, by_value, by_id, by_field, payloads = {}, {}, {}, {}, []
+        for category, tags in categories:
+            active = tuple(tag for tag in tags if tag['is_active'])
+            by_name[category['name']] = {'category': category, 'tags': list(active), 'all_tags': tuple(tags)}
+            by_field[(category['entity_type'], category['field_name'])] = category['name']
+            for tag in tags:
+                by_value[(category['name'], tag['value'])] = tag
+                by_id[tag['tag_id']] = tag
+            payloads.append({**category, 'tags': list(active)})
+
+        self._categories = MappingProxyType(by_name)
+        self._by_value = MappingProxyType(by_value)
+        self._by_id = MappingProxyType(by_id)
+        self._by_field = MappingProxyType(by_field)
+        self._payload = tuple(payloads)
+
+    def all_categories(self):
+        """Every category with its active tags, as served by /api/tags."""
+        return list(self._payload)
+
+    def category(self, name, include_inactive=False):
+        """{'category': ..., 'tags': [...]} for a category name, or None."""
+        entry = self._categories.get(name)
+        if entry is None:
+            return None
+        tags = list(entry['all_tags']) if include_inactive else entry['tags']
+        return {'category': entry['category'], 'tags': tags}
+
+    def tag(self, category_name, value):
+        """Tag with the given value in a category (active or not), or None."""
+        return self._by_value.get((category_name, value))
+
+    def tag_by_id(self, tag_id):
+        return self._by_id.get(tag_id)
+
+    def active_count(self, category_name):
+        entry = self._categories.get(category_name)
+        return len(entry['tags']) if entry else 0
+
+    def max_sort_order(self, category_name):
+        entry = self._categories.get(category_name)
+        return max((tag['sort_order'] or 0 for tag in entry['all_tags']), default=0) if entry else 0
+
+    def category_for(self, entity_type, field_name):
+        """Name of the category backing an entity field, or None."""
+        return self._by_field.get((entity_type, field_name))
+
+    def validate(self, entity_type, values, current=None, session=None):
+        """Errors for tag-backed fields whose values are not active tags.
+
+        Only fields present in values are checked, and empty values are allowed.
+        When updating, values the record already holds are accepted even if
+        their tag has since been deactivated. With a session, fields rejected
+        here are rechecked against the database, which may hold tags another
+        process created since this registry was built.
+        """
+        errors = self._errors(entity_type, values, current)
+        if errors and session is not None:
+            fields = [field_name for field_entity, field_name in self._by_field
+                      if field_entity == entity_type and field_name in values]
+            errors = build_registry(session, None, entity_type, fields)._errors(entity_type, values, current)
+        return errors
+
+    def _errors(self, entity_type, values, current):
+        errors = []
+        for (field_entity, field_name), category_name in self._by_field.items():
+            if field_entity != entity_type or field_name not in values:
+                continue
+            existing = set()
+            if current is not None:
+                existing = set(split_values(entity_type, field_name, getattr(current, field_name, None)))
+            for item in split_values(entity_type, field_name, values[field_name]):
+                tag = self._by_value.get((category_name, item))
+                if item not in existing and (tag is None or not tag['is_active']):
+                    display_name = self._categories[category_name]['category']['display_name']
+                    errors.append(f'{field_name}: "{item}" is not a valid {display_name}')
+        return errors
+
+
+def build_registry(session, version, entity_type=None, field_names=None):
+    """Load the categories (only those backing entity_type's field_names, if given) and their tags in two queries."""
+    query = list_query(session, TagCategory)
+    if entity_type is not None:
+        query = query.filter(TagCategory.entity_type == entity_type)
+    if field_names is not None:
+        query = query.filter(TagCategory.field_name.in_(field_names))
+    categories = []
+    for category in query.all():
+        tags = sorted(category.tags, key=lambda tag: tag.tag_id)
+        categories.append((category.to_dict(), [tag.to_dict() for tag in tags]))
+    return TagRegistry(version, categories)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def _is_fresh(registry, version, ttl):
+    if registry is None or registry.version != version:
+        return False
+    return ttl is None or time.monotonic() - registry.built_at < ttl
+
+
+def get_registry(session, ttl=None):
+    """Return the current registry, rebuilding it once a tag write has committed.
+
+    The new registry replaces the old one in a single assignment, so readers
+    see either the old or the new snapshot, never a partial one. ttl bounds
+    how long tag writes made by other processes can go unseen.
+    """
+    global _registry
+    version = versions.snapshot(TAG_TABLES)
+    if _is_fresh(_registry, version, ttl):
+        return _registry
+    with _registry_lock:
+        if not _is_fresh(_registry, version, ttl):
+            _registry = build_registry(session, version)
+        return _registry
+
+
+def invalidate():
+    """Drop the current registry."""
+    global _registry
+    _registry = None
@@ -0,0 +1,145 @@
+from collections import defaultdict
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from counters import _old_value
+from models import Department, Application, IntegrationStatus, Contact, EngagementActivity
+from tag_models import TagUsage
+from tag_registry import split_values
+
+
+# Entity types used by tag categories, and the fields whose values are counted
+ENTITY_TYPES = {
+    'department': Department,
+    'application': Application,
+    'integration': IntegrationStatus,
+    'contact': Contact,
+    'activity': EngagementActivity,
+}
+
+TRACKED_FIELDS = {
+    Department: ('department', ('tier', 'status', 'owner_team')),
+    Application: ('application', ('environment', 'auth_type', 'status')),
+    IntegrationStatus: ('integration', ('stage',)),
+    Contact: ('contact', ('role',)),
+    EngagementActivity: ('activity', ('type',)),
+}
+
+
+def is_tracked(entity_type, field_name):
+    model = ENTITY_TYPES.get(entity_type)
+    return model is not None and field_name in TRACKED_FIELDS[model][1]
+
+
+def _values(entity_type, field_name, value):
+    # A record counts once per distinct value, even if a multi-value field repeats it
+    return set(split_values(entity_type, field_name, value))
+
+
+def count_rows(session, model, condition=None):
+    """Count the tracked values of one model (optionally of just the rows matching a condition)."""
+    counts = defaultdict(int)
+    entity_type, fields = TRACKED_FIELDS.get(model, (None, ()))
+    for field_name in fields:
+        column = getattr(model, field_name)
+        query = select(column, func.count()).where(column.isnot(None))
+        if condition is not None:
+            query = query.where(condition)
+        for raw, count in session.execute(query.group_by(column)):
+            for value in _values(entity_type, field_name, raw):
+                counts[(entity_type, field_name, value)] += count
+    return counts
+
+
+def count_usage(session, models=None):
+    """Count every tracked value with one GROUP BY per field."""
+    counts = {}
+    for model in TRACKED_FIELDS:
+        if models is None or model in models:
+            counts.update(count_rows(session, model))
+    return counts
+
+
+def rebuild_usage(session, models=None):
+    """Recompute the usage table from the entity tables (all, or just the given models)."""
+    counts = count_usage(session, models)
+    query = session.query(TagUsage)
+    if models is not None:
+        query = query.filter(TagUsage.entity_type.in_([TRACKED_FIELDS[m][0] for m in models]))
+    query.delete(synchronize_session=False)
+    session.add_all([
+        TagUsage(entity_type=entity_type, field_name=field_name, value=value, count=count)
+        for (entity_type, field_name, value), count in counts.items()
+    ])
+    session.commit()
+    return counts
+
+
+def usage_count(session, entity_type, field_name, value):
+    """Records holding a value, by primary-key lookup for tracked fields."""
+    if not is_tracked(entity_type, field_name):
+        # Fields without a maintained count fall back to scanning the entity table
+        model = ENTITY_TYPES.get(entity_type)
+        if model is None or not hasattr(model, field_name):
+            return 0
+        return session.query(model).filter(getattr(model, field_name) == value).count()
+    usage = session.get(TagUsage, (entity_type, field_name, value))
+    return usage.count if usage else 0
+
+
+def usage_by_value(session, entity_type, field_name):
+    """{value: count} for every value of a field in use."""
+    if not is_tracked(entity_type, field_name):
+        model = ENTITY_TYPES.get(entity_type)
+        if model is None or not hasattr(model, field_name):
+            return {}
+        column = getattr(model, field_name)
+        return dict(session.execute(select(column, func.count()).where(column.isnot(None)).group_by(column)).all())
+    rows = session.query(TagUsage.value, TagUsage.count).filter_by(entity_type=entity_type, field_name=field_name)
+    return {value: count for value, count in rows if count}
+
+
+def apply_deltas(connection, deltas):
+    """Add per-value deltas to the usage table on the given connection."""
+    rows = [
+        {'entity_type': entity_type, 'field_name': field_name, 'value': value, 'count': delta}
+        for (entity_type, field_name, value), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    table = TagUsage.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['entity_type', 'field_name', 'value'],
+        set_={'count': table.c['count'] + stmt.excluded['count']}
+    )
+    connection.execute(stmt, rows)
+
+
+def _after_flush(session, flush_context):
+    deltas = defaultdict(int)
+    for objects, sign in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            entity_type, fields = TRACKED_FIELDS.get(type(obj), (None, ()))
+            for field_name in fields:
+                value = getattr(obj, field_name) if sign > 0 else _old_value(obj, field_name)
+                for item in _values(entity_type, field_name, value):
+                    deltas[(entity_type, field_name, item)] += sign
+    for obj in session.dirty:
+        entity_type, fields = TRACKED_FIELDS.get(type(obj), (None, ()))
+        for field_name in fields:
+            old = _values(entity_type, field_name, _old_value(obj, field_name))
+            new = _values(entity_type, field_name, getattr(obj, field_name))
+            for item in new - old:
+                deltas[(entity_type, field_name, item)] += 1
+            for item in old - new:
+                deltas[(entity_type, field_name, item)] -= 1
+    # Runs inside the flush transaction, so counts commit or roll back with the write
+    apply_deltas(session.connection(), deltas)
+
+
+def install_usage(session_factory):
+    """Keep the usage table in sync with writes made through a sessionmaker."""
+    if not event.contains(session_factory, 'after_flush', _after_flush):
+        event.listen(session_factory, 'after_flush', _after_flush)
@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as crm
+import chat_context
+import config
+import tag_registry
+from benchmarks import datagen
+
+# A small generated database; tests that compare sizes pass their own
+SMALL = {
+    'departments': 3,
+    'apps_per_department': 2,
+    'contacts_per_department': 2,
+    'activities': 20,
+    'incidents': 10,
+}
+
+
+def open_app(path):
+    """Point the app module at the database file at path, with every process-wide cache emptied."""
+    app = crm.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    crm.response_cache.clear()
+    crm.chat_answers.clear()
+    chat_context.invalidate()
+    tag_registry.invalidate()
+    return app
+
+
+def generated_app(path, **sizes):
+    """App over a datagen database of the given sizes."""
+    datagen.generate(f'sqlite:///{path}', seed=1, verbose=False, **{**SMALL, **sizes})
+    return open_app(path)
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App over a new database holding the sample data."""
+    app = open_app(tmp_path / 'crm.db')
+    crm.init_database(sample_data=True)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# ==================== FAKE MODEL ====================
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    """A non-streaming reply; usage_metadata is left out, as when the model reports none."""
+
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = history
+
+    def send_message(self, message, stream=False, **kwargs):
+        self.model.calls.append((self.history, message))
+        if stream:
+            return self.model.stream()
+        return FakeResponse(''.join(self.model.chunks))
+
+
+class FakeModel:
+    """Stand-in for a Gemini GenerativeModel.
+
+    Replies with chunks; with a gate, a stream waits for gate.set() after its
+    first chunk, and error is raised after the first chunk instead of finishing.
+    """
+
+    def __init__(self, chunks=('Hello ', 'world'), gate=None, error=None):
+        self.chunks = list(chunks)
+        self.gate = gate
+        self.error = error
+        self.calls = []
+        self.summaries = []
+        self.finished = threading.Event()
+
+    def start_chat(self, history):
+        return FakeChat(self, history)
+
+    def stream(self):
+        for position, text in enumerate(self.chunks):
+            yield FakeChunk(text)
+            if position == 0:
+                if self.gate is not None:
+                    assert self.gate.wait(5), 'the test never opened the gate'
+                if self.error is not None:
+                    raise self.error
+        self.finished.set()
+
+    def generate_content(self, prompt, **kwargs):
+        self.summaries.append(prompt)
+        return FakeResponse('Summary of the earlier turns.')
+
+
+@pytest.fixture
+def fake_model(app, monkeypatch):
+    """Route the chat endpoints to a FakeModel, without provider context caching."""
+    model = FakeModel()
+    monkeypatch.setattr(config, 'GEMINI_API_KEY', 'test')
+    monkeypatch.setattr(crm, 'get_chat_model', lambda prefix=None: model)
+    monkeypatch.setattr(crm.chat_prefix, 'create', None)
+    return model
@@ -0,0 +1,111 @@
+import pytest
+
+import app as crm
+import bulk
+import config
+from integration_summary import DIMENSIONS, count_cells
+from models import Department, IntegrationSummary
+from tag_models import TagUsage
+from tag_usage import count_usage
+
+
+def import_rows(client, entity, rows):
+    response = client.post(f'/api/bulk/{entity}', json=rows)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def department(department_id):
+    with crm.Session() as session:
+        return session.get(Department, department_id)
+
+
+def test_null_in_not_null_field_is_a_row_error(client):
+    name = department(1).name
+    result = import_rows(client, 'departments', [{'department_id': 1, 'name': None}, {'department_id': 1, 'tier': 'critical'}])
+    assert result['results'][0] == {'index': 0, 'status': 'error', 'errors': ['name: cannot be null']}
+    assert result['results'][1]['status'] == 'updated'
+    assert department(1).name == name
+
+
+def test_null_in_nullable_field_clears_it(client):
+    result = import_rows(client, 'departments', [{'department_id': 1, 'acronym': None}])
+    assert result['summary'] == {'created': 0, 'updated': 1, 'error': 0}
+    assert department(1).acronym is None
+
+
+def test_repeated_id_in_a_chunk(client):
+    result = import_rows(client, 'departments', [
+        {'department_id': 900, 'name': 'First'},
+        {'department_id': 900, 'name': 'Second'},
+        {'department_id': 901, 'name': 'Partial later'},
+        {'department_id': 901, 'tier': 'critical'},
+    ])
+    assert [row['status'] for row in result['results']] == ['created', 'updated', 'created', 'updated']
+    assert department(900).name == 'Second'
+    assert department(901).tier == 'critical'
+
+
+def test_failed_import_still_refreshes_derived_data(client, monkeypatch):
+    monkeypatch.setattr(config, 'BULK_CHUNK_SIZE', 1)
+    before = client.get('/api/dashboard').get_json()
+    names = [d['name'] for d in client.get('/api/departments').get_json()]
+
+    calls = []
+    upsert_chunk = bulk._upsert_chunk
+
+    def fail_second_chunk(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError('disk full')
+        return upsert_chunk(*args)
+
+    monkeypatch.setattr(bulk, '_upsert_chunk', fail_second_chunk)
+    with pytest.raises(RuntimeError):
+        client.post('/api/bulk/departments', json=[
+            {'name': 'Committed department', 'tier': 'critical'},
+            {'name': 'Lost department'},
+        ])
+
+    # The first chunk was committed: the counters and cached lists must show it
+    after = client.get('/api/dashboard').get_json()
+    assert after['departments']['total'] == before['departments']['total'] + 1
+    assert after['departments']['critical'] == before['departments']['critical'] + 1
+    assert [d['name'] for d in client.get('/api/departments').get_json()] == sorted(names + ['Committed department'])
+
+
+def test_application_import_counts_its_integration_rows(client):
+    def intake():
+        usage = client.get('/api/tags/integration_stage/usage').get_json()['usage']
+        return next(tag['count'] for tag in usage if tag['value'] == 'intake')
+
+    before = intake()
+    result = import_rows(client, 'applications', [
+        {'department_id': 1, 'app_name': 'Imported One'},
+        {'department_id': 1, 'app_name': 'Imported Two'},
+    ])
+    assert result['summary'] == {'created': 2, 'updated': 0, 'error': 0}
+    # The import also inserts an intake integration row per new application
+    assert intake() == before + 2
+
+
+def test_import_updates_derived_data_for_its_rows(client):
+    # Updates move rows between counters, usage values and summary cells; the new
+    # department's applications are inserted with it in the same chunk
+    import_rows(client, 'departments', [
+        {'department_id': 1, 'tier': 'critical', 'status': 'inactive'},
+        {'department_id': 950, 'name': 'Imported Department', 'tier': 'standard'},
+    ])
+    import_rows(client, 'applications', [
+        {'department_id': 950, 'app_name': 'Imported App'},
+        {'app_id': 1, 'department_id': 950, 'status': 'live'},
+    ])
+
+    # Each chunk applied its own differences; they add up to a full recount
+    with crm.Session() as session:
+        assert crm.read_counters(session) == crm.aggregate_counts(session)
+        maintained = {(u.entity_type, u.field_name, u.value): u.count for u in session.query(TagUsage) if u.count}
+        assert maintained == dict(count_usage(session))
+        summary = {tuple(getattr(s, name) for name in DIMENSIONS): s.count
+                   for s in session.query(IntegrationSummary) if s.count}
+        assert summary == dict(count_cells(session))
@@ -0,0 +1,28 @@
+import sqlite3
+
+import app as crm
+
+QUESTION = 'Which departments need attention this quarter?'
+
+
+def ask(client):
+    response = client.post('/api/chat', json={'message': QUESTION})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['source']
+
+
+def test_repeated_question_is_answered_from_the_cache(client, fake_model):
+    assert ask(client) == 'model'
+    assert ask(client) == 'cache'
+    assert len(fake_model.calls) == 1
+
+
+def test_write_by_another_process_empties_the_cache(client, fake_model):
+    assert ask(client) == 'model'
+    # A separate connection, as another worker would write: this process's table versions do not move
+    connection = sqlite3.connect(crm.engine.url.database)
+    with connection:
+        connection.execute("UPDATE departments SET status = 'inactive' WHERE department_id = 1")
+    connection.close()
+    assert ask(client) == 'model'
+    assert ask(client) == 'cache'
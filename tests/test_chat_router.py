@@ -0,0 +1,46 @@
+import pytest
+
+import app as crm
+import chat_context
+from chat_router import parse
+
+
+@pytest.fixture
+def ask(app):
+    """ask(question) is the Query the router reads from a question, or None if it leaves it to the model."""
+    with crm.Session() as session:
+        snapshot = chat_context.get_snapshot(session)
+        vocabulary = crm.chat_router.vocabulary(snapshot, crm.get_tag_registry(session))
+    return lambda question: parse(question, snapshot, vocabulary)
+
+
+@pytest.mark.parametrize('question, entity, filters', [
+    ('How many incidents are open?', 'incidents', {'status': ['open']}),
+    ('How many active departments are there?', 'departments', {'status': ['active']}),
+    ('How many applications are live?', 'applications', {'status': ['live']}),
+    ('Which departments are critical?', 'departments', {'tier': ['critical']}),
+])
+def test_answered(ask, question, entity, filters):
+    query = ask(question)
+    assert query is not None
+    assert query.entity.name == entity
+    assert {name: values for name, (_, values) in query.filters.items()} == filters
+
+
+@pytest.mark.parametrize('question', [
+    # Time: the router would count every row, not the recent ones
+    'How many recent incidents?',
+    'List the latest activities',
+    'How many applications are currently live?',
+    'How many departments are there right now?',
+    'How many incidents are open now?',
+    'What is the current number of departments?',
+    # Earlier turns: the router would answer over all rows, not the ones discussed
+    'How many of those are critical?',
+    'Which of these applications are live?',
+    'How many incidents does that application have?',
+    # The asker
+    'Show my departments',
+])
+def test_narrowed_questions_go_to_the_model(ask, question):
+    assert ask(question) is None
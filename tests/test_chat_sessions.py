@@ -0,0 +1,162 @@
+import pytest
+
+import app as crm
+import config
+from chat_sessions import PrefixCache
+
+# Not understood by the chat router, so the model answers
+QUESTIONS = [
+    'Which departments need attention this quarter?',
+    'What should we raise with them next?',
+    'Anything else to prepare?',
+    'And after that?',
+]
+
+SUMMARY_NOTE = '[Summary of the conversation so far]'
+
+
+@pytest.fixture
+def conversation(client, fake_model):
+    """ask(message) sends the next message of one conversation and returns the session's state."""
+    state = {'session_id': None}
+
+    def ask(message):
+        response = client.post('/api/chat', json={'message': message, 'session_id': state['session_id']})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        assert response.get_json()['source'] == 'model'
+        state['session_id'] = response.get_json()['session_id']
+        return client.get(f"/api/chat/sessions/{state['session_id']}").get_json()
+
+    return ask
+
+
+def history_texts(call):
+    history, _ = call
+    return [message['parts'][0] for message in history]
+
+
+# ==================== COMPACTION ====================
+
+@pytest.fixture
+def small_budget(fake_model, monkeypatch):
+    # Each answer alone is over the budget; one exchange is kept verbatim
+    monkeypatch.setattr(config, 'CHAT_HISTORY_TOKEN_BUDGET', 50)
+    monkeypatch.setattr(config, 'CHAT_KEEP_RECENT_EXCHANGES', 1)
+    fake_model.chunks = ['word ' * 100]
+
+
+def test_history_over_budget_is_summarized(conversation, fake_model, small_budget):
+    conversation(QUESTIONS[0])
+    state = conversation(QUESTIONS[1])
+    assert not state['summarized'] and state['usage']['compactions'] == 0
+
+    state = conversation(QUESTIONS[2])
+    assert state['summarized'] and state['dropped_messages'] == 0
+    assert state['messages'] == 4
+    assert state['usage']['compactions'] == 1
+    # One summary call (of the first exchange) besides the three answers
+    assert state['usage']['model_calls'] == 4
+    assert len(fake_model.summaries) == 1 and QUESTIONS[0] in fake_model.summaries[0]
+
+    texts = history_texts(fake_model.calls[-1])
+    assert f'{SUMMARY_NOTE}\nSummary of the earlier turns.' in texts
+    assert QUESTIONS[0] not in texts and QUESTIONS[1] in texts
+
+
+def test_failed_summary_drops_old_turns(conversation, fake_model, small_budget, monkeypatch):
+    def fail(prompt, **kwargs):
+        raise RuntimeError('summary unavailable')
+
+    monkeypatch.setattr(fake_model, 'generate_content', fail)
+    conversation(QUESTIONS[0])
+    conversation(QUESTIONS[1])
+    state = conversation(QUESTIONS[2])
+    assert not state['summarized'] and state['dropped_messages'] == 2
+    assert state['messages'] == 4
+    assert state['usage']['compactions'] == 1
+
+    texts = history_texts(fake_model.calls[-1])
+    assert f'{SUMMARY_NOTE}\n2 earlier messages were dropped to save space.' in texts
+    assert QUESTIONS[0] not in texts
+
+
+# ==================== SHARED PREFIX ====================
+
+class Provider:
+    """Stand-in for Gemini context caching: numbered handles, the ones deleted, and the prefix of each model call."""
+
+    def __init__(self):
+        self.created = []
+        self.released = []
+        self.prefixes = []
+        self.error = None
+
+    def create(self, text):
+        if self.error is not None:
+            raise self.error
+        self.created.append(text)
+        return len(self.created)
+
+    def release(self, handle):
+        self.released.append(handle)
+
+
+@pytest.fixture
+def provider(fake_model, monkeypatch):
+    """A provider-cached PrefixCache; records the prefix each model call was made with."""
+    provider = Provider()
+    monkeypatch.setattr(crm, 'chat_prefix', PrefixCache(provider.create, provider.release, ttl=3600))
+
+    def get_chat_model(prefix=None):
+        if prefix is not None:
+            provider.prefixes.append(prefix)
+        return fake_model
+
+    monkeypatch.setattr(crm, 'get_chat_model', get_chat_model)
+    return provider
+
+
+def test_prefix_is_reused_within_its_ttl(conversation, fake_model, provider):
+    for question in QUESTIONS:
+        conversation(question)
+    assert len(provider.created) == 1 and provider.released == []
+    assert {prefix.cached for prefix in provider.prefixes} == {1}
+    stats = crm.chat_prefix.stats()
+    assert stats['builds'] == 1 and stats['hits'] == len(QUESTIONS) - 1
+    # The provider holds the prefix, so it is not resent with the history
+    assert provider.created[0] not in history_texts(fake_model.calls[-1])
+
+
+def test_expiring_prefix_is_replaced(conversation, provider):
+    conversation(QUESTIONS[0])
+    # Provider caches are replaced a little before their ttl
+    provider.prefixes[-1].created_at -= crm.chat_prefix.ttl * 0.9
+    conversation(QUESTIONS[1])
+    assert len(provider.created) == 2 and provider.released == [1]
+    assert provider.prefixes[-1].cached == 2
+
+    conversation(QUESTIONS[2])
+    assert len(provider.created) == 2
+
+
+def test_data_change_replaces_prefix(client, conversation, provider):
+    conversation(QUESTIONS[0])
+    assert client.post('/api/departments', json={'name': 'Department of Prefixes'}).status_code == 201
+    conversation(QUESTIONS[1])
+    assert len(provider.created) == 2 and provider.released == [1]
+    assert 'Department of Prefixes' in provider.created[1]
+    assert 'Department of Prefixes' not in provider.created[0]
+
+
+def test_failed_provider_cache_resends_prefix(conversation, fake_model, provider):
+    provider.error = RuntimeError('content too small to cache')
+    conversation(QUESTIONS[0])
+    state = conversation(QUESTIONS[1])
+    assert state['usage']['model_calls'] == 2
+
+    prefix = provider.prefixes[-1]
+    assert prefix.cached is None
+    # Sent verbatim at the start of the history instead
+    assert history_texts(fake_model.calls[-1])[:2] == [prefix.text, crm.PREFIX_REPLY]
+    stats = crm.chat_prefix.stats()
+    assert stats['provider_failures'] == 1 and stats['provider_caches'] == 0 and stats['builds'] == 1
@@ -0,0 +1,125 @@
+import json
+import threading
+
+import app as crm
+import config
+from chat_worker import ChatPool
+
+# Not understood by the chat router, so the model answers
+QUESTION = 'Which departments need attention this quarter?'
+
+
+def parse_events(body):
+    """[(event, data)] from a Server-Sent Events body; comments are skipped."""
+    events = []
+    for block in body.split('\n\n'):
+        event, data = 'message', None
+        for line in block.splitlines():
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                data = json.loads(line[len('data: '):])
+        if data is not None:
+            events.append((event, data))
+    return events
+
+
+def stream(client, message=QUESTION):
+    return client.post('/api/chat/stream', json={'message': message})
+
+
+def read(chunks):
+    return ''.join(chunk.decode() for chunk in chunks)
+
+
+def test_sse_framing(client, fake_model):
+    response = stream(client)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+
+    body = response.get_data(as_text=True)
+    assert body.startswith(': stream open\n\n')
+    assert body.endswith('\n\n')
+    events = parse_events(body)
+    assert events[:2] == [('message', {'text': 'Hello '}), ('message', {'text': 'world'})]
+    event, data = events[2]
+    assert event == 'done'
+    assert data['status'] == 'success' and data['source'] == 'model' and data['session_id']
+    assert len(events) == 3
+
+
+def test_error_event(client, fake_model):
+    fake_model.error = RuntimeError('model exploded')
+    events = parse_events(stream(client).get_data(as_text=True))
+    assert events == [
+        ('message', {'text': 'Hello '}),
+        ('error', {'error': 'model exploded', 'status': 'error'}),
+    ]
+
+
+def test_timeout_event(client, fake_model, monkeypatch):
+    fake_model.gate = threading.Event()
+    monkeypatch.setattr(config, 'CHAT_TIMEOUT_SECONDS', 0.2)
+    try:
+        events = parse_events(stream(client).get_data(as_text=True))
+    finally:
+        fake_model.gate.set()
+    assert events[0] == ('message', {'text': 'Hello '})
+    assert events[-1] == ('error', {'error': 'The assistant took too long to respond.', 'status': 'error'})
+
+
+def test_first_chunk_is_sent_before_generation_finishes(client, fake_model):
+    fake_model.gate = threading.Event()
+    response = stream(client)
+    chunks = iter(response.response)
+    try:
+        assert read([next(chunks)]) == ': stream open\n\n'
+        first = read([next(chunks)])
+        assert parse_events(first) == [('message', {'text': 'Hello '})]
+        assert not fake_model.finished.is_set()
+    finally:
+        fake_model.gate.set()
+    rest = parse_events(read(chunks))
+    assert [event for event, _ in rest] == ['message', 'done']
+    assert fake_model.finished.is_set()
+
+
+def test_saturated_pool_refuses_with_429(client, fake_model, monkeypatch):
+    pool = ChatPool(max_workers=1, max_queue=0, per_user_limit=2)
+    monkeypatch.setattr(crm, 'chat_pool', pool)
+    fake_model.gate = threading.Event()
+    try:
+        busy = stream(client)
+        chunks = iter(busy.response)
+        next(chunks), next(chunks)  # the worker is now inside the model call
+
+        for path in ('/api/chat/stream', '/api/chat'):
+            response = client.post(path, json={'message': 'Which teams should we meet next?'})
+            assert response.status_code == 429
+            assert response.headers['Retry-After'] == str(config.CHAT_RETRY_AFTER)
+            assert response.get_json()['status'] == 'error'
+    finally:
+        fake_model.gate.set()
+    assert [event for event, _ in parse_events(read(chunks))] == ['message', 'done']
+    pool.shutdown()
+
+
+def test_chat_limit_is_per_client_behind_a_proxy(app, fake_model, monkeypatch):
+    users = []
+    submit = crm.chat_pool.submit
+
+    def record_user(user, *args):
+        users.append(user)
+        return submit(user, *args)
+
+    monkeypatch.setattr(crm.chat_pool, 'submit', record_user)
+    proxy = {'environ_base': {'REMOTE_ADDR': '10.0.0.1'}, 'headers': {'X-Forwarded-For': '203.0.113.7'}}
+
+    # Without trusted proxies the header is ignored, since a client could send it
+    app.test_client().post('/api/chat', json={'message': QUESTION}, **proxy)
+    monkeypatch.setattr(config, 'TRUSTED_PROXIES', 1)
+    proxied = crm.create_app({'SQLALCHEMY_DATABASE_URI': str(crm.engine.url)})
+    proxied.test_client().post('/api/chat', json={'message': 'Which teams should we meet next?'}, **proxy)
+    assert users == ['10.0.0.1', '203.0.113.7']
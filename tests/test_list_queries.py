@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+import app as crm
+from conftest import generated_app
+
+LIST_ROUTES = [
+    '/api/departments',
+    '/api/applications',
+    '/api/integrations',
+    '/api/contacts',
+    '/api/activities',
+    '/api/incidents',
+]
+
+
+@contextmanager
+def count_queries():
+    """Count the statements both engines run inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (crm.engine, crm.read_engine)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def queries_per_route(app, paths):
+    """{path: statements run by a GET of it}, measured after a first request warms the registries."""
+    client = app.test_client()
+    counts = {}
+    for path in paths:
+        assert client.get(path).status_code == 200
+        crm.response_cache.clear()
+        with count_queries() as statements:
+            response = client.get(path)
+        assert response.status_code == 200
+        counts[path] = len(statements)
+    return counts
+
+
+@pytest.mark.parametrize('suffix', ['', '?limit=5', '?fields=name'])
+def test_list_query_count_does_not_grow_with_rows(tmp_path, suffix):
+    paths = [path + suffix for path in LIST_ROUTES]
+    small = queries_per_route(generated_app(tmp_path / 'small.db'), paths)
+    large = queries_per_route(generated_app(
+        tmp_path / 'large.db', departments=12, apps_per_department=4, contacts_per_department=4,
+        activities=300, incidents=120
+    ), paths)
+    assert large == small
+    # One statement per list, two where a relationship is loaded separately
+    assert all(count <= 2 for count in small.values()), small
@@ -0,0 +1,156 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.schema import CreateTable
+
+import app as crm
+from conftest import open_app
+from models import Base
+from queries import LIST_FILTERS, ENTITY_MODELS
+from tag_models import TagCategory
+from tag_usage import ENTITY_TYPES
+
+# Tables that grow with the data; the small derived tables (counters, summary) are read whole by design
+ENTITY_TABLES = {
+    'departments', 'applications', 'integration_status', 'contacts',
+    'engagement_activities', 'incidents', 'tag_categories', 'tags',
+}
+
+# The schema before any migration: tables with their primary keys and unique constraints only
+BASELINE_TABLES = (
+    'departments', 'applications', 'integration_status', 'contacts',
+    'engagement_activities', 'incidents', 'tag_categories', 'tags',
+)
+
+LIST_ROUTES = {
+    'departments': '/api/departments',
+    'applications': '/api/applications',
+    'integrations': '/api/integrations',
+    'contacts': '/api/contacts',
+    'activities': '/api/activities',
+    'incidents': '/api/incidents',
+}
+
+# One value per filter; any value exercises the same plan
+FILTER_VALUES = {
+    'tier': 'critical', 'status': 'active', 'owner_team': 'Client Success Alpha', 'department_id': '1',
+    'environment': 'prod', 'app_id': '1', 'stage': 'testing', 'risk_level': 'high', 'role': 'technical',
+    'active_flag': 'true', 'type': 'meeting', 'owner': 'Sarah Chen', 'severity': 'high',
+}
+
+
+def create_baseline(path):
+    """An empty database with the original schema, as created before the migration runner existed."""
+    engine = crm.create_db_engine(f'sqlite:///{path}')
+    with engine.begin() as connection:
+        for name in BASELINE_TABLES:
+            connection.execute(CreateTable(Base.metadata.tables[name]))
+    engine.dispose()
+
+
+@pytest.fixture(params=['fresh', 'upgraded'])
+def app(request, tmp_path):
+    path = tmp_path / 'crm.db'
+    if request.param == 'upgraded':
+        create_baseline(path)
+    app = open_app(path)
+    crm.init_database(sample_data=True)
+    return app
+
+
+def capture(run):
+    """(statement, parameters) pairs executed by a second call of run().
+
+    The first call loads the tag registry and other per-process caches, which
+    read their small tables whole once.
+    """
+    run()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    engines = (crm.engine, crm.read_engine)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        run()
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def full_scans(statements, index_scans=True):
+    """Plan steps that read a whole entity table.
+
+    A scan in primary-key order under a LIMIT, with no sort step, stops after
+    the page and is not counted. With index_scans, neither is a walk of an
+    index (e.g. a full list read in its sort order).
+    """
+    scans = []
+    with crm.engine.connect() as connection:
+        for statement, parameters in statements:
+            details = [row[3] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+            if ' LIMIT ' in statement and not any('TEMP B-TREE' in detail for detail in details):
+                continue
+            for detail in details:
+                words = detail.split()
+                if words[:1] == ['SCAN'] and words[1] in ENTITY_TABLES and not (index_scans and 'INDEX' in words):
+                    scans.append((detail, ' '.join(statement.split())))
+    return scans
+
+
+def get(client, path):
+    crm.response_cache.clear()
+    response = client.get(path)
+    assert response.status_code == 200, (path, response.get_data(as_text=True))
+    return response.get_json()
+
+
+def test_dashboard(app):
+    # Served from the maintained counters; aggregate_counts() rebuilds them and counts every row by design
+    client = app.test_client()
+    assert full_scans(capture(lambda: get(client, '/api/dashboard'))) == []
+
+
+def test_filters(app):
+    client = app.test_client()
+    paths = []
+    for route, path in LIST_ROUTES.items():
+        model = ENTITY_MODELS[route]
+        paths += [f'{path}?{name}={FILTER_VALUES[name]}' for name in LIST_FILTERS.get(model, {})]
+    paths += ['/api/integrations?department_id=1', '/api/incidents?department_id=1',
+              '/api/activities?date_from=2024-01-01', '/api/incidents?date_from=2024-01-01']
+    # Each filter must narrow the rows through an index, not be checked row by row
+    assert full_scans(capture(lambda: [get(client, path) for path in paths]), index_scans=False) == []
+
+
+def test_keyset_pages(app):
+    client = app.test_client()
+
+    def pages():
+        for path in LIST_ROUTES.values():
+            cursor = get(client, f'{path}?limit=2')['next_cursor']
+            assert cursor, path
+            get(client, f'{path}?limit=2&after={cursor}')
+
+    assert full_scans(capture(pages)) == []
+
+
+def test_tag_in_use(app):
+    client = app.test_client()
+    with crm.Session() as session:
+        fields = [(ENTITY_TYPES[category.entity_type], category.field_name)
+                  for category in session.query(TagCategory).all()]
+
+    def checks():
+        # The usage check for fields without a maintained count
+        with crm.Session() as session:
+            for model, field_name in fields:
+                session.query(model).filter(getattr(model, field_name) == 'x').count()
+        # Deleting a tag that is in use is refused after the usage check
+        tag = get(client, '/api/tags/department_tier')['tags'][0]
+        assert client.delete(f"/api/tags/{tag['tag_id']}").status_code == 400
+
+    assert full_scans(capture(checks)) == []
@@ -0,0 +1,33 @@
+import pytest
+
+from benchmarks import tables
+from conftest import generated_app
+
+sync_api = pytest.importorskip('playwright.sync_api')
+
+
+@pytest.fixture(scope='module')
+def browser():
+    with sync_api.sync_playwright() as playwright:
+        try:
+            browser = playwright.chromium.launch()
+        except sync_api.Error as error:
+            pytest.skip(f"Chromium is not available: {error.message.splitlines()[0]}")
+        yield browser
+        browser.close()
+
+
+def test_virtual_tables(tmp_path, browser):
+    app = generated_app(tmp_path / 'crm.db', activities=5000, contacts_per_department=200)
+    results = tables.measure(browser, app.test_client(), repeat=3)
+
+    rows = results['activity rows in the DOM']
+    assert rows['previous'] > 1000
+    assert rows['virtual'] < 100
+    renders = results[f'contact renders typing "{tables.TYPED}"']
+    assert renders['virtual'] < renders['previous'] == len(tables.TYPED)
+    # Writing a few dozen rows instead of thousands
+    for name in ('render all activities (ms)', 'filter activities by type (ms)'):
+        assert results[name]['virtual'] < results[name]['previous'], (name, results[name])
+    # PagedSource fetches 200-row pages from the list endpoint as the table scrolls
+    assert results['paged: requests to load 2000 rows']['virtual'] == 10
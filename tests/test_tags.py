@@ -0,0 +1,100 @@
+import sqlite3
+
+from sqlalchemy import inspect
+
+import app as crm
+from conftest import open_app
+from test_list_queries import count_queries
+from test_query_plans import create_baseline
+
+
+def other_worker(sql, *parameters):
+    """Write through a separate connection, unseen by this process's versions and tag registry."""
+    connection = sqlite3.connect(crm.engine.url.database)
+    with connection:
+        connection.execute(sql, parameters)
+    connection.close()
+
+
+def test_tag_created_by_another_worker_is_seen_by_writes(client):
+    tiers = client.get('/api/tags/department_tier').get_json()['tags']
+    other_worker(
+        "INSERT INTO tags (category_id, value, label, color, is_active, sort_order) VALUES (?, 'gold', 'Gold', '#FFD700', 1, 9)",
+        tiers[0]['category_id'],
+    )
+
+    response = client.post('/api/tags/department_tier', json={'value': 'gold', 'label': 'Gold'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Tag value already exists in this category'
+
+    # Validation accepts the new tag although the cached registry has not seen it
+    response = client.post('/api/departments', json={'name': 'Gold Department', 'tier': 'gold'})
+    assert response.status_code == 201, response.get_data(as_text=True)
+    result = client.post('/api/bulk/departments', json=[{'name': 'Bulk Gold', 'tier': 'gold'}]).get_json()
+    assert result['summary'] == {'created': 1, 'updated': 0, 'error': 0}
+
+
+def test_renaming_onto_another_workers_value_is_refused(client):
+    tag = client.post('/api/tags/department_tier', json={'value': 'bronze', 'label': 'Bronze'}).get_json()
+    other_worker(
+        "INSERT INTO tags (category_id, value, label, color, is_active, sort_order) VALUES (?, 'silver', 'Silver', '#C0C0C0', 1, 9)",
+        tag['category_id'],
+    )
+    response = client.put(f"/api/tags/{tag['tag_id']}", json={'value': 'silver'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Tag value already exists in this category'
+
+
+def test_new_tags_are_sorted_last(client):
+    tiers = client.get('/api/tags/department_tier').get_json()['tags']
+    tag = client.post('/api/tags/department_tier', json={'value': 'bronze', 'label': 'Bronze'}).get_json()
+    assert tag['sort_order'] == max(t['sort_order'] for t in tiers) + 1
+
+
+def test_tag_writes_run_no_separate_checks(client):
+    client.get('/api/tags/department_tier')
+    with count_queries() as statements:
+        assert client.post('/api/tags/department_tier', json={'value': 'bronze', 'label': 'Bronze'}).status_code == 201
+    # No duplicate or sort order queries first: the INSERT computes the sort order,
+    # and the unique index refuses duplicates (then come the reads for the response)
+    assert statements[0].split()[0] == 'INSERT'
+
+    # Once the registry has been rebuilt after the tag write, validation reads no tags
+    client.get('/api/tags/department_tier')
+    with count_queries() as statements:
+        assert client.post('/api/departments', json={'name': 'Bronze Department', 'tier': 'bronze'}).status_code == 201
+    assert not any('tag_categories' in s for s in statements)
+
+
+def test_last_tag_check_reads_the_database(client):
+    tags = client.post('/api/tags/department_tier', json={'value': 'spare', 'label': 'Spare'}).get_json()
+    spare = tags['tag_id']
+    # Another worker deactivates every other tier while this process's registry still counts them
+    other_worker('UPDATE tags SET is_active = 0 WHERE category_id = ? AND tag_id != ?', tags['category_id'], spare)
+    response = client.delete(f'/api/tags/{spare}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Cannot delete the last tag in a category'
+
+    other_worker('UPDATE tags SET is_active = 1 WHERE category_id = ?', tags['category_id'])
+    assert client.delete(f'/api/tags/{spare}').status_code == 200
+
+
+def test_migration_removes_duplicate_values(tmp_path, caplog):
+    path = tmp_path / 'crm.db'
+    create_baseline(path)
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("INSERT INTO tag_categories (category_id, name, display_name, entity_type, field_name) "
+                           "VALUES (1, 'department_tier', 'Department Tier', 'department', 'tier')")
+        connection.executemany("INSERT INTO tags (category_id, value, label, is_active, sort_order) VALUES (1, ?, ?, 1, ?)",
+                               [('critical', 'Critical', 1), ('critical', 'Critical again', 2), ('standard', 'Standard', 3)])
+    connection.close()
+
+    open_app(path)
+    crm.init_database(sample_data=False)
+    with crm.Session() as session:
+        tags = crm.get_tag_registry(session).category('department_tier')['tags']
+    assert [(tag['value'], tag['label']) for tag in tags] == [('critical', 'Critical'), ('standard', 'Standard')]
+    assert "Removing tag 2: category 1 already has a tag with value 'critical'" in caplog.messages
+    indexes = {index['name']: index['unique'] for index in inspect(crm.engine).get_indexes('tags')}
+    assert indexes['ux_tags_category_value']
@@ -0,0 +1,60 @@
+import threading
+from collections import defaultdict
+
+from sqlalchemy import event
+
+
+# Per-table data versions for this process. A table's version increases each
+# time a transaction that wrote to it commits, so caches can key on the versions
+# of the tables they read and never serve data older than the last commit.
+# Writes made by other processes are not observed; caches that can be shared
+# across processes should also bound entry lifetime.
+_versions = defaultdict(int)
+_lock = threading.Lock()
+
+_CHANGED_KEY = 'changed_tables'
+
+
+def bump(*tables):
+    """Advance the version of each named table."""
+    with _lock:
+        for table in tables:
+            _versions[table] += 1
+
+
+def get_version(table):
+    """Current version of a table."""
+    return _versions[table]
+
+
+def snapshot(tables):
+    """Versions of several tables as a hashable tuple."""
+    with _lock:
+        return tuple(_versions[table] for table in tables)
+
+
+def _after_flush(session, flush_context):
+    changed = session.info.setdefault(_CHANGED_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            changed.add(table.name)
+
+
+def _after_commit(session):
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if changed:
+        bump(*changed)
+
+
+def _after_rollback(session):
+    session.info.pop(_CHANGED_KEY, None)
+
+
+def install_versions(session_factory):
+    """Bump table versions when sessions from a sessionmaker commit writes."""
+    for name, listener in (('after_flush', _after_flush),
+                           ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(session_factory, name, listener):
+            event.listen(session_factory, name, listener)